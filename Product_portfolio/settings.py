@@ -37,10 +37,12 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'product_app.middleware.MetricsMiddleware',  # Первым после security: учитывает всю цепочку
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'product_app.middleware.ReplicaRoutingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -69,13 +71,104 @@ WSGI_APPLICATION = 'Product_portfolio.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
+# DB_ENGINE: sqlite (по умолчанию) или postgresql. Реплика для чтения включается
+# переменной DB_REPLICA_NAME, остальные её параметры (DB_REPLICA_HOST и т.д.)
+# по умолчанию совпадают с основной БД.
+
+DB_ENGINES = {
+    'sqlite': 'django.db.backends.sqlite3',
+    'postgresql': 'django.db.backends.postgresql',
+}
+
+
+# Режим производительности SQLite (SQLITE_TUNING=True). WAL: читатели не ждут писателя;
+# IMMEDIATE берёт блокировку записи в начале транзакции, поэтому конкуренты ждут
+# timeout (busy_timeout), а не падают с database is locked при повышении блокировки
+SQLITE_TUNED_OPTIONS = {
+    'init_command': (
+        'PRAGMA journal_mode=WAL;'
+        'PRAGMA synchronous=NORMAL;'
+        f'PRAGMA mmap_size={int(os.getenv("SQLITE_MMAP_SIZE", 256 * 1024 * 1024))};'
+        f'PRAGMA cache_size=-{int(os.getenv("SQLITE_CACHE_SIZE_KB", 64 * 1024))};'
+        'PRAGMA temp_store=MEMORY;'
+    ),
+    'transaction_mode': 'IMMEDIATE',
+    'timeout': int(os.getenv('SQLITE_BUSY_TIMEOUT', 20)),  # Секунды
+}
+
+
+def database_config(prefix, default_name):
+    def env(name, default=None):
+        return os.getenv(f'{prefix}{name}') or os.getenv(f'DB_{name}') or default
+
+    engine = env('ENGINE', 'sqlite')
+    config = {
+        'ENGINE': DB_ENGINES[engine],
+        'NAME': os.getenv(f'{prefix}NAME') or default_name,
+        # Постоянные соединения с проверкой перед повторным использованием
+        'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', 60)),
+        'CONN_HEALTH_CHECKS': os.getenv('DB_CONN_HEALTH_CHECKS', 'True') == 'True',
+    }
+    if engine == 'sqlite' and os.getenv('SQLITE_TUNING', 'False') == 'True':
+        config['OPTIONS'] = SQLITE_TUNED_OPTIONS
+    if engine == 'postgresql':
+        config.update({
+            'USER': env('USER', ''),
+            'PASSWORD': env('PASSWORD', ''),
+            'HOST': env('HOST', 'localhost'),
+            'PORT': env('PORT', '5432'),
+        })
+        if os.getenv('DB_POOL', 'False') == 'True':
+            # Пул psycopg (нужен пакет psycopg[pool]) несовместим с CONN_MAX_AGE
+            config['CONN_MAX_AGE'] = 0
+            config['OPTIONS'] = {'pool': {
+                'min_size': int(os.getenv('DB_POOL_MIN_SIZE', 2)),
+                'max_size': int(os.getenv('DB_POOL_MAX_SIZE', 10)),
+                'timeout': int(os.getenv('DB_POOL_TIMEOUT', 10)),
+            }}
+    return config
+
+
 DATABASES = {
+    'default': database_config('DB_', BASE_DIR / 'db.sqlite3'),
+}
+
+if os.getenv('DB_REPLICA_NAME'):
+    DATABASES['replica'] = database_config('DB_REPLICA_', None)
+    DATABASES['replica']['TEST'] = {'MIRROR': 'default'}
+
+DATABASE_ROUTERS = ['product_app.db_routers.PrimaryReplicaRouter']
+
+# Повторы записи при database is locked (SQLite) с экспоненциальной задержкой
+DB_WRITE_RETRIES = int(os.getenv('DB_WRITE_RETRIES', 5))
+DB_WRITE_RETRY_DELAY = float(os.getenv('DB_WRITE_RETRY_DELAY', 0.05))
+
+# Сколько секунд после записи клиент читает из основной БД (read-your-writes),
+# пока изменения доезжают до реплики
+DB_REPLICA_STICKY_SECONDS = int(os.getenv('DB_REPLICA_STICKY_SECONDS', 5))
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+# CACHE_BACKEND: locmem (по умолчанию), file или redis. Для нескольких процессов
+# используйте file или redis: locmem у каждого процесса свой.
+
+CACHE_BACKENDS = {
+    'locmem': 'django.core.cache.backends.locmem.LocMemCache',
+    'file': 'django.core.cache.backends.filebased.FileBasedCache',
+    'redis': 'django.core.cache.backends.redis.RedisCache',
+}
+
+CACHES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'BACKEND': CACHE_BACKENDS[os.getenv('CACHE_BACKEND', 'locmem')],
+        'LOCATION': os.getenv('CACHE_LOCATION') or 'product-portfolio',
     }
 }
 
+# Время жизни закэшированных ответов API в секундах (инвалидация идёт через версии моделей)
+API_CACHE_TIMEOUT = int(os.getenv('API_CACHE_TIMEOUT', 600))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
@@ -119,6 +212,21 @@ STATIC_URL = 'static/'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Обработка логотипов: миниатюры и WebP создаются в фоновом пуле потоков
+LOGO_PROCESSING_ASYNC = os.getenv('LOGO_PROCESSING_ASYNC', 'True') == 'True'
+LOGO_WORKERS = int(os.getenv('LOGO_WORKERS', 2))
+
+# Токен для /metrics (Authorization: Bearer <токен>); пустой — доступ без токена
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+
+# Лента изменений /api/changes/: записи моложе этого времени (с) придерживаются,
+# чтобы курсор не перескочил изменения ещё не зафиксированных транзакций
+CHANGES_SETTLE_SECONDS = float(os.getenv('CHANGES_SETTLE_SECONDS', 2))
+
+# Собранная схема OpenAPI (manage.py build_openapi_schema); пустое значение —
+# схема строится в памяти при первом запросе к /api/schema/
+OPENAPI_SCHEMA_FILE = os.getenv('OPENAPI_SCHEMA_FILE', '')
+
 
 
 # Default primary key field type
@@ -135,6 +243,16 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.AllowAny',  # Разрешить доступ для всех (по умолчанию)
     ],
+    # Фильтры из filter_params/date_range_fields и ?ordering= по белому списку ordering_fields вьюсета
+    'DEFAULT_FILTER_BACKENDS': [
+        'product_app.filters.PortfolioFilterBackend',
+        'product_app.filters.KeysetOrderingFilter',
+    ],
+    # Курсорная пагинация по индексируемому ключу для всех коллекций
+    'DEFAULT_PAGINATION_CLASS': 'product_app.pagination.KeysetPagination',
+    'PAGE_SIZE': int(os.getenv('API_PAGE_SIZE', 50)),
+    'MAX_PAGE_SIZE': int(os.getenv('API_MAX_PAGE_SIZE', 200)),  # Верхняя граница для ?page_size=
+    'EXPORT_CHUNK_SIZE': int(os.getenv('API_EXPORT_CHUNK_SIZE', 1000)),  # Размер порции для /export/
 }
 
 SPECTACULAR_SETTINGS = {
@@ -2,14 +2,17 @@ from django.conf import settings
 from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import path, include
-from drf_spectacular.views import SpectacularAPIView, SpectacularSwaggerView, SpectacularRedocView
+from product_app.schema import SchemaView, lazy_view
+from product_app.views import metrics
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include('product_app.urls')),  # Маршруты API приложения product_app
-    path('api/schema/', SpectacularAPIView.as_view(), name='schema'),
-    path('api/docs/', SpectacularSwaggerView.as_view(url_name='schema'), name='swagger-ui'),
-    path('api/redoc/', SpectacularRedocView.as_view(url_name='schema'), name='redoc'),
+    # Схема отдаётся из собранного артефакта, drf_spectacular импортируется только при открытии документации
+    path('api/schema/', SchemaView.as_view(), name='schema'),
+    path('api/docs/', lazy_view('drf_spectacular.views.SpectacularSwaggerView', url_name='schema'), name='swagger-ui'),
+    path('api/redoc/', lazy_view('drf_spectacular.views.SpectacularRedocView', url_name='schema'), name='redoc'),
+    path('metrics', metrics, name='metrics'),  # Метрики для Prometheus
 ]
 
 # Обслуживание медиафайлов в режиме разработки
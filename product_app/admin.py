@@ -1,14 +1,118 @@
+from django import forms
 from django.contrib import admin
-from .models import *
+from django.contrib.admin.widgets import AutocompleteSelect
+from django.core.exceptions import PermissionDenied
+from django.template.response import TemplateResponse
+from django.urls import path
+from .logos import logo_variant_url
+from .models import (
+    Partner, Product, ProductStatus, Project, ProjectRole, ProjectStage, ProjectStatus, Role, SalesModel, Sphere,
+)
 from django.utils.html import format_html
 
 
-class ProductAdmin(admin.ModelAdmin):
+class PreloadedAutocompleteSelect(AutocompleteSelect):
+    """
+    AutocompleteSelect, который берёт выбранные объекты из заранее загруженного
+    словаря {pk: объект} вместо отдельного запроса на каждую строку инлайна.
+    """
+    preloaded = None
+
+    def optgroups(self, name, value, attr=None):
+        selected = [str(v) for v in value if str(v) not in self.choices.field.empty_values]
+        if self.preloaded is None or any(pk not in self.preloaded for pk in selected):
+            return super().optgroups(name, value, attr)
+        default = (None, [], 0)
+        if not self.is_required:
+            default[1].append(self.create_option(name, '', '', False, 0))
+        for pk in selected:
+            label = self.choices.field.label_from_instance(self.preloaded[pk])
+            default[1].append(self.create_option(name, pk, label, set(selected), len(default[1])))
+        return [default]
+
+
+class CachedChoicesMixin:
+    """
+    Кэширует варианты выбора небольших справочников (например, ролей) на время запроса:
+    все строки инлайна используют один список вместо запроса на каждую строку.
+    """
+    cached_choice_fields = ()
+
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        formfield = super().formfield_for_foreignkey(db_field, request, **kwargs)
+        if formfield is not None and db_field.name in self.cached_choice_fields:
+            cache = request.__dict__.setdefault('_admin_choices_cache', {})
+            key = (db_field.model, db_field.name)
+            if key not in cache:
+                cache[key] = list(formfield.choices)
+            formfield.choices = cache[key]
+        return formfield
+
+
+class ImportForm(forms.Form):
+    file = forms.FileField(label='Файл CSV или XLSX')
+    dry_run = forms.BooleanField(label='Пробный прогон: проверить и ничего не сохранять', required=False, initial=True)
+
+
+class ImportMixin:
+    """
+    Кнопка «Импорт» над списком объектов и страница загрузки CSV/XLSX.
+    Файл обрабатывается тем же PortfolioImporter, что и manage.py import_portfolio;
+    на странице показываются итог и первые ошибки по строкам.
+    """
+    import_kind = None
+    import_shown_errors = 100
+    change_list_template = 'admin/product_app/change_list_import.html'
+
+    def get_urls(self):
+        info = self.model._meta.app_label, self.model._meta.model_name
+        return [
+            path('import/', self.admin_site.admin_view(self.import_view), name='%s_%s_import' % info),
+        ] + super().get_urls()
+
+    def import_view(self, request):
+        if not self.has_add_permission(request):
+            raise PermissionDenied
+        # Импорт нужен редко: модуль не загружается при старте воркера вместе с админкой
+        from .importing import IMPORT_COLUMNS, ImportFileError, PortfolioImporter, read_rows
+
+        form = ImportForm(request.POST or None, request.FILES or None)
+        result = None
+        if request.method == 'POST' and form.is_valid():
+            upload, dry_run = form.cleaned_data['file'], form.cleaned_data['dry_run']
+            errors = []
+
+            def on_error(line, message):
+                if len(errors) < self.import_shown_errors:
+                    errors.append((line, message))
+
+            importer = PortfolioImporter(self.import_kind, dry_run=dry_run, on_error=on_error)
+            try:
+                created, error_count = importer.run(read_rows(upload, upload.name, sheet=self.import_kind))
+            except ImportFileError as error:
+                form.add_error('file', str(error))
+            else:
+                result = {'dry_run': dry_run, 'created': created, 'error_count': error_count, 'errors': errors}
+        context = {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'title': f'Импорт: {self.model._meta.verbose_name_plural}',
+            'form': form,
+            'columns': IMPORT_COLUMNS[self.import_kind],
+            'result': result,
+        }
+        return TemplateResponse(request, 'admin/product_app/import.html', context)
+
+
+class ProductAdmin(ImportMixin, admin.ModelAdmin):
+    import_kind = 'products'
     list_display = ('display_logo', 'name', 'formatted_created_at')
     list_display_links = ('display_logo', 'name')
     search_fields = ('name', 'created_at')
     list_filter = ('created_at',)
-    filter_horizontal = ('owners', 'curators', 'partners', 'spheres')
+    # Пользователи и партнёры подгружаются поиском, а не всей таблицей в форме
+    autocomplete_fields = ('owners', 'curators', 'partners')
+    filter_horizontal = ('spheres',)
     readonly_fields = ('get_projects', 'display_logo')
     fieldsets = (
         ('Основные сведения', {
@@ -32,7 +136,7 @@ class ProductAdmin(admin.ModelAdmin):
 
     def get_projects(self, obj):
         """Возвращает список связанных проектов с ссылками на редактирование"""
-        projects = obj.projects.all()
+        projects = obj.projects.only('id', 'name', 'product')
         if not projects:
             return "Нет связанных проектов"
         return format_html(
@@ -48,7 +152,11 @@ class ProductAdmin(admin.ModelAdmin):
     def display_logo(self, obj):
         """Отображает логотип в админке"""
         if obj.logo and obj.logo.url:
-            return format_html('<img src="{}" style="width: 100px; height: 60px;" alt="Логотип">', obj.logo.url)
+            # Миниатюра вместо исходного файла, если фоновая обработка уже завершилась
+            return format_html(
+                '<img src="{}" style="max-width: 100px; max-height: 60px;" alt="Логотип">',
+                logo_variant_url(obj)
+            )
         return "Логотип отсутствует"
 
     display_logo.short_description = 'Логотип'
@@ -58,20 +166,48 @@ class ProjectStageInline(admin.TabularInline):
     model = ProjectStage
     extra = 0
 
+    def get_queryset(self, request):
+        # __str__ этапа выводит название проекта
+        return super().get_queryset(request).select_related('project')
+
 
-class ProjectRoleInline(admin.TabularInline):
+class ProjectRoleInline(CachedChoicesMixin, admin.TabularInline):
     model = ProjectRole
     extra = 0
     verbose_name = 'Роль участника'
     verbose_name_plural = 'Роли участников'
-
-
-class ProjectAdmin(admin.ModelAdmin):
+    autocomplete_fields = ('member',)
+    cached_choice_fields = ('role',)
+
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        if db_field.name == 'member':
+            kwargs['widget'] = PreloadedAutocompleteSelect(db_field, self.admin_site)
+        return super().formfield_for_foreignkey(db_field, request, **kwargs)
+
+    def get_queryset(self, request):
+        # __str__ роли выводит участника и название роли
+        return super().get_queryset(request).select_related('member', 'role')
+
+    def get_formset(self, request, obj=None, **kwargs):
+        formset = super().get_formset(request, obj, **kwargs)
+        if obj is not None:
+            # Участники всех строк загружаются одним запросом
+            widget = formset.form.base_fields['member'].widget
+            widget = getattr(widget, 'widget', widget)
+            widget.preloaded = {
+                str(role.member_id): role.member for role in obj.project_roles.select_related('member')
+            }
+        return formset
+
+
+class ProjectAdmin(ImportMixin, admin.ModelAdmin):
+    import_kind = 'projects'
     list_display = ('display_logo', 'name', 'product')
     list_display_links = ('display_logo', 'name', 'product')
-    search_fields = ('name', 'product')
+    list_select_related = ('product',)
+    search_fields = ('name', 'product__name')
     list_filter = ('start_date', 'end_date', 'product')
-    filter_horizontal = ('curators', 'members', 'partners')
+    autocomplete_fields = ('product', 'curators', 'members', 'partners')
     readonly_fields = ('stages_list', 'display_logo', 'members_and_roles_list')
     inlines = [ProjectStageInline, ProjectRoleInline]
 
@@ -93,17 +229,21 @@ class ProjectAdmin(admin.ModelAdmin):
     def display_logo(self, obj):
         """Отображает логотип в админке"""
         if obj.logo and obj.logo.url:
-            return format_html('<img src="{}" style="width: 100px; height: 60px;" alt="Логотип">', obj.logo.url)
+            # Миниатюра вместо исходного файла, если фоновая обработка уже завершилась
+            return format_html(
+                '<img src="{}" style="max-width: 100px; max-height: 60px;" alt="Логотип">',
+                logo_variant_url(obj)
+            )
         return "Логотип отсутствует"
 
     display_logo.short_description = 'Логотип'
 
     def stages_list(self, obj):
         # Получаем связанные этапы для проекта
-        stages = obj.stages.all()
+        stages = obj.stages.only('project', 'name', 'start_date').order_by('start_date')
         # Форматируем вывод: дата начала и окончания этапа, если end_date существует
         return format_html('<br>'.join([
-            f'{stage.start_date.strftime("%d.%m.%Y")}   –   {stage.name}'
+            f'{stage.start_date.strftime("%d.%m.%Y") if stage.start_date else "—"}   –   {stage.name}'
             for stage in stages
         ]))
 
@@ -128,7 +268,8 @@ class ProductStatusAdmin(admin.ModelAdmin):
     list_display = ('name',)
 
 
-class PartnerAdmin(admin.ModelAdmin):
+class PartnerAdmin(ImportMixin, admin.ModelAdmin):
+    import_kind = 'partners'
     list_display = ('display_logo', 'name')
     list_display_links = ('display_logo', 'name')
     search_fields = ('name',)
@@ -142,7 +283,11 @@ class PartnerAdmin(admin.ModelAdmin):
     def display_logo(self, obj):
         """Отображает логотип в админке"""
         if obj.logo and obj.logo.url:
-            return format_html('<img src="{}" style="width: 100px; height: 60px;" alt="Логотип">', obj.logo.url)
+            # Миниатюра вместо исходного файла, если фоновая обработка уже завершилась
+            return format_html(
+                '<img src="{}" style="max-width: 100px; max-height: 60px;" alt="Логотип">',
+                logo_variant_url(obj)
+            )
         return "Логотип отсутствует"
 
     display_logo.short_description = 'Логотип'
@@ -159,7 +304,8 @@ class SalesModelAdmin(admin.ModelAdmin):
 class ProjectStageAdmin(admin.ModelAdmin):
     list_display = ('name', 'project')
     list_display_links = ('name', 'project')
-    search_fields = ('name', 'product')
+    list_select_related = ('project',)
+    search_fields = ('name', 'project__name')
     list_filter = ('project',)
 
 
@@ -170,6 +316,7 @@ class RoleAdmin(admin.ModelAdmin):
 
 class ProjectRoleAdmin(admin.ModelAdmin):
     list_display = ('member', 'role', 'project')
+    list_select_related = ('member', 'role', 'project')
     search_fields = ('member__username', 'role__name', 'project__name')
     list_filter = ('role', 'project')
     autocomplete_fields = ('member', 'role', 'project')
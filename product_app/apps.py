@@ -5,3 +5,7 @@ class ProductAppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'product_app'
     verbose_name = 'Продукты и проекты'
+
+    def ready(self):
+        # Подключаем обработчики сигналов (инвалидация кэша ответов)
+        from . import signals  # noqa: F401
@@ -0,0 +1,139 @@
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.http import JsonResponse
+from django.views import View
+from rest_framework.request import Request
+from rest_framework.utils.encoders import JSONEncoder
+
+from .mixins import build_query_plan, get_query_plan
+from .models import Partner, Product, ProductStatus, Project, ProjectStage, ProjectStatus, Role, SalesModel, Sphere
+from .serializers import (
+    PartnerSerializer, ProductSerializer, ProductStatusSerializer, ProjectSerializer, ProjectStageSerializer,
+    ProjectStatusSerializer, RoleSerializer, SalesModelSerializer, SphereSerializer,
+)
+
+
+class AsyncReadView(View):
+    """
+    Асинхронное чтение коллекции и объекта для ASGI (/api/async/...).
+    Строки выбираются асинхронным ORM (async for, aget) вместе со всеми связями
+    по плану сериализатора, поэтому сериализация идёт в памяти и не обращается
+    к БД: обработчик не занимает поток, пока медленный клиент читает ответ.
+    Пагинация по ключу: ?after=<id последней строки>&page_size=.
+    """
+    queryset = None
+    serializer_class = None
+    filter_params = {}  # Параметр запроса -> поле фильтра
+
+    def get_queryset(self, request):
+        queryset = self.queryset.all()
+        params = request.query_params
+        for param, lookup in self.filter_params.items():
+            value = params.get(param)
+            if value:
+                queryset = queryset.filter(**{lookup: value})
+        if 'fields' in params or 'expand' in params:
+            plan = build_query_plan(self.get_serializer(request))
+        else:
+            plan = get_query_plan(self.serializer_class)
+        return plan.apply(queryset)
+
+    def get_serializer(self, request, *args, **kwargs):
+        return self.serializer_class(*args, context={'request': request}, **kwargs)
+
+    def get_page_size(self, request):
+        page_size = settings.REST_FRAMEWORK.get('PAGE_SIZE', 50)
+        max_page_size = settings.REST_FRAMEWORK.get('MAX_PAGE_SIZE', 100)
+        try:
+            page_size = int(request.query_params.get('page_size', page_size))
+        except ValueError:
+            pass
+        return min(max(page_size, 1), max_page_size)
+
+    def render(self, data, status=200):
+        return JsonResponse(data, status=status, safe=False, encoder=JSONEncoder)
+
+    async def get(self, request, pk=None):
+        # Request из DRF нужен сериализаторам ради query_params (?fields=, ?expand=)
+        request = Request(request)
+        try:
+            if pk is not None:
+                return await self.retrieve(request, pk)
+            return await self.list(request)
+        except (ValueError, ValidationError):
+            return self.render({'error': 'Invalid query parameter'}, status=400)
+
+    async def retrieve(self, request, pk):
+        try:
+            instance = await self.get_queryset(request).aget(pk=pk)
+        except self.queryset.model.DoesNotExist:
+            return self.render({'detail': 'Not found.'}, status=404)
+        return self.render(self.get_serializer(request, instance).data)
+
+    async def list(self, request):
+        queryset = self.get_queryset(request).order_by('pk')
+        after = request.query_params.get('after')
+        if after:
+            queryset = queryset.filter(pk__gt=int(after))
+        page_size = self.get_page_size(request)
+        # Лишняя строка показывает, есть ли следующая страница
+        rows = [obj async for obj in queryset[:page_size + 1]]
+        page = rows[:page_size]
+        next_url = None
+        if len(rows) > page_size:
+            params = request.query_params.copy()
+            params['after'] = page[-1].pk
+            next_url = request.build_absolute_uri(f'{request.path}?{params.urlencode()}')
+        return self.render({
+            'next': next_url,
+            'results': self.get_serializer(request, page, many=True).data,
+        })
+
+
+class AsyncProductView(AsyncReadView):
+    queryset = Product.objects.all()
+    serializer_class = ProductSerializer
+    filter_params = {'status': 'status'}
+
+
+class AsyncProjectView(AsyncReadView):
+    queryset = Project.objects.all()
+    serializer_class = ProjectSerializer
+    filter_params = {'status': 'status', 'product_id': 'product_id'}
+
+
+class AsyncProjectStageView(AsyncReadView):
+    queryset = ProjectStage.objects.all()
+    serializer_class = ProjectStageSerializer
+    filter_params = {'project': 'project_id'}
+
+
+class AsyncPartnerView(AsyncReadView):
+    queryset = Partner.objects.all()
+    serializer_class = PartnerSerializer
+
+
+class AsyncSphereView(AsyncReadView):
+    queryset = Sphere.objects.all()
+    serializer_class = SphereSerializer
+
+
+class AsyncProductStatusView(AsyncReadView):
+    queryset = ProductStatus.objects.all()
+    serializer_class = ProductStatusSerializer
+
+
+class AsyncProjectStatusView(AsyncReadView):
+    queryset = ProjectStatus.objects.all()
+    serializer_class = ProjectStatusSerializer
+
+
+class AsyncSalesModelView(AsyncReadView):
+    queryset = SalesModel.objects.all()
+    serializer_class = SalesModelSerializer
+
+
+class AsyncRoleView(AsyncReadView):
+    queryset = Role.objects.all()
+    serializer_class = RoleSerializer
+
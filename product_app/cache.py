@@ -0,0 +1,66 @@
+import hashlib
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+
+VERSION_KEY = 'product_app:version:{}'
+RESPONSE_KEY = 'product_app:response:{}'
+WRITTEN_KEY = 'product_app:written:{}'
+
+
+def _version_key(model):
+    return VERSION_KEY.format(model._meta.label_lower)
+
+
+def get_versions(models):
+    """
+    Возвращает текущие версии моделей одним обращением к кэшу.
+    Отсутствующая версия инициализируется временем, а не единицей, чтобы после
+    вытеснения ключа не совпасть со старыми закэшированными ответами.
+    """
+    keys = [_version_key(model) for model in models]
+    versions = cache.get_many(keys)
+    missing = {key: time.time_ns() for key in keys if key not in versions}
+    if missing:
+        cache.set_many(missing, timeout=None)
+        versions.update(missing)
+    return [versions[key] for key in keys]
+
+
+def bump_version(model):
+    """
+    Инвалидирует все закэшированные ответы, зависящие от модели, после фиксации
+    текущей транзакции. Если поднять версию раньше, параллельный GET успеет прочитать
+    ещё старые строки и закэшировать их под новой версией.
+    """
+    transaction.on_commit(lambda: _bump(model))
+
+
+def _bump(model):
+    key = _version_key(model)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, time.time_ns(), timeout=None)
+
+
+def mark_written(model):
+    """
+    Запоминает время последней записи в таблицу модели (создание, изменение, удаление,
+    изменение связей) для Last-Modified списков: MAX(updated_at) по фильтру уменьшается,
+    когда строка выходит из выборки. Как и версия, время ставится после фиксации транзакции.
+    """
+    key = WRITTEN_KEY.format(model._meta.label_lower)
+    transaction.on_commit(lambda: cache.set(key, time.time(), timeout=None))
+
+
+def get_written_at(model):
+    """Время последней записи в таблицу модели (timestamp) или None."""
+    return cache.get(WRITTEN_KEY.format(model._meta.label_lower))
+
+
+def make_response_key(*parts):
+    """Ключ ответа: хэш от версий моделей, представления и строки запроса."""
+    digest = hashlib.sha1('|'.join(str(part) for part in parts).encode()).hexdigest()
+    return RESPONSE_KEY.format(digest)
@@ -0,0 +1,100 @@
+import threading
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Count
+
+from .models import Partner, Product, ProductCard, ProductStatus, Project, SalesModel, Sphere
+
+# Справочник -> поле продукта, через которое его название попадает в карточку
+CARD_SOURCES = {
+    ProductStatus: 'status',
+    SalesModel: 'sales_model',
+    Sphere: 'spheres',
+    Partner: 'partners',
+}
+
+CARD_FIELDS = [
+    'name', 'logo', 'logo_variants', 'status_name', 'sales_model_name', 'spheres', 'partners',
+    'project_count', 'updated_at',
+]
+
+_pending = threading.local()
+
+
+def _names(field, product_ids):
+    """Названия связанных объектов по продуктам одним запросом к промежуточной таблице."""
+    through = Product._meta.get_field(field).remote_field.through
+    target = Product._meta.get_field(field).m2m_reverse_field_name()
+    names = defaultdict(list)
+    for product_id, name in (
+        through.objects.filter(product_id__in=product_ids)
+        .order_by(f'{target}__name')
+        .values_list('product_id', f'{target}__name')
+    ):
+        names[product_id].append(name)
+    return names
+
+
+def refresh_product_cards(product_ids):
+    """Пересобирает карточки указанных продуктов четырьмя запросами и одним upsert."""
+    product_ids = set(product_ids) - {None}
+    if not product_ids:
+        return
+    spheres = _names('spheres', product_ids)
+    partners = _names('partners', product_ids)
+    project_counts = dict(
+        Project.objects.filter(product_id__in=product_ids)
+        .values('product_id')
+        .annotate(total=Count('id'))
+        .values_list('product_id', 'total')
+    )
+    products = Product.objects.filter(pk__in=product_ids).values_list(
+        'pk', 'name', 'logo', 'logo_variants', 'status__name', 'sales_model__name',
+    )
+    ProductCard.objects.bulk_create(
+        [
+            ProductCard(
+                product_id=pk,
+                name=name,
+                logo=logo,
+                logo_variants=logo_variants,
+                status_name=status_name or '',
+                sales_model_name=sales_model_name or '',
+                spheres=spheres[pk],
+                partners=partners[pk],
+                project_count=project_counts.get(pk, 0),
+            )
+            for pk, name, logo, logo_variants, status_name, sales_model_name in products
+        ],
+        update_conflicts=True,
+        unique_fields=['product'],
+        update_fields=CARD_FIELDS,
+    )
+
+
+def rebuild_cards(batch_size=1000):
+    """Полная пересборка карточек всех продуктов."""
+    ids = list(Product.objects.values_list('pk', flat=True).order_by('pk'))
+    for start in range(0, len(ids), batch_size):
+        refresh_product_cards(ids[start:start + batch_size])
+
+
+def products_using(model, pks):
+    """id продуктов, в карточках которых показано название объектов справочника model."""
+    field = CARD_SOURCES[model]
+    return Product.objects.filter(**{f'{field}__in': pks}).values_list('pk', flat=True).distinct()
+
+
+def _flush_pending():
+    product_ids = getattr(_pending, 'ids', set())
+    _pending.ids = set()
+    refresh_product_cards(product_ids)
+
+
+def schedule_card_refresh(product_ids):
+    """Откладывает пересборку карточек до фиксации транзакции (как schedule_stats_refresh)."""
+    if not hasattr(_pending, 'ids'):
+        _pending.ids = set()
+    _pending.ids.update(product_ids)
+    transaction.on_commit(_flush_pending)
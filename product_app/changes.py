@@ -0,0 +1,40 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import ChangeLog, Membership, ProductCard, ProductStats, ProjectStats, SearchDocument
+
+# Производные таблицы не синхронизируются: они пересчитываются из основных
+DERIVED_MODELS = (ChangeLog, SearchDocument, ProductStats, ProjectStats, ProductCard, Membership)
+
+
+def is_logged(model):
+    return model._meta.app_label == 'product_app' and model not in DERIVED_MODELS
+
+
+def log_changes(model, pks, action, field=''):
+    """Записывает в журнал изменение объектов модели одним INSERT."""
+    rows = [
+        ChangeLog(model=model._meta.model_name, object_id=pk, action=action, field=field)
+        for pk in pks if pk is not None
+    ]
+    if rows:
+        ChangeLog.objects.bulk_create(rows)
+
+
+def read_changes(since, limit, models=None):
+    """
+    Возвращает (записи, есть_ещё) после курсора since в порядке id.
+    Самые свежие записи придерживаются на CHANGES_SETTLE_SECONDS: id выдаются
+    при вставке, а транзакции фиксируются в другом порядке, и без задержки
+    потребитель мог бы перескочить запись ещё не зафиксированной транзакции.
+    """
+    queryset = ChangeLog.objects.filter(id__gt=since)
+    settle = settings.CHANGES_SETTLE_SECONDS
+    if settle:
+        queryset = queryset.filter(changed_at__lte=timezone.now() - timedelta(seconds=settle))
+    if models:
+        queryset = queryset.filter(model__in=models)
+    rows = list(queryset.order_by('id')[:limit + 1])
+    return rows[:limit], len(rows) > limit
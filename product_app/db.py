@@ -0,0 +1,55 @@
+import random
+import time
+
+from django.conf import settings
+from django.db import OperationalError, connections, router, transaction
+from django.db.models.constants import OnConflict
+
+# Верхняя граница id (BIGINT): большее значение SQLite не примет как параметр запроса
+MAX_ID = 2 ** 63 - 1
+
+
+def is_locked_error(exc):
+    return 'database is locked' in str(exc) or 'database table is locked' in str(exc)
+
+
+def atomic_with_retry(func, *args, using='default', **kwargs):
+    """
+    Выполняет func в транзакции и при блокировке SQLite повторяет её
+    с экспоненциальной задержкой и случайным разбросом (DB_WRITE_RETRIES раз).
+    Внутри внешней транзакции повтор невозможен, и ошибка пробрасывается сразу.
+    """
+    connection = connections[using]
+    retries = settings.DB_WRITE_RETRIES if connection.vendor == 'sqlite' else 0
+    for attempt in range(retries + 1):
+        try:
+            with transaction.atomic(using=using):
+                return func(*args, **kwargs)
+        except OperationalError as exc:
+            if attempt == retries or connection.in_atomic_block or not is_locked_error(exc):
+                raise
+        time.sleep(settings.DB_WRITE_RETRY_DELAY * 2 ** attempt * random.uniform(0.5, 1.5))
+
+
+def insert_rows(model, fields, rows, ignore_conflicts=False, batch_size=1000):
+    """
+    Вставляет кортежи значений полей fields в таблицу модели через executemany,
+    не создавая экземпляров: для строк связей и производных таблиц это в разы
+    быстрее bulk_create. Сигналы не отправляются, значения должны быть готовыми
+    для БД (id, строки).
+    """
+    connection = connections[router.db_for_write(model)]
+    quote = connection.ops.quote_name
+    on_conflict = OnConflict.IGNORE if ignore_conflicts else None
+    columns = [model._meta.get_field(name).column for name in fields]
+    sql = '{} {} ({}) VALUES ({}) {}'.format(
+        connection.ops.insert_statement(on_conflict=on_conflict),
+        quote(model._meta.db_table),
+        ', '.join(quote(column) for column in columns),
+        ', '.join(['%s'] * len(columns)),
+        connection.ops.on_conflict_suffix_sql([], on_conflict, [], []),
+    )
+    rows = list(rows)
+    with connection.cursor() as cursor:
+        for start in range(0, len(rows), batch_size):
+            cursor.executemany(sql, rows[start:start + batch_size])
@@ -0,0 +1,46 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+
+REPLICA_ALIAS = 'replica'
+
+# Включается ReplicaRoutingMiddleware на время безопасных запросов к API
+read_from_replica = ContextVar('read_from_replica', default=False)
+
+
+def replica_configured():
+    return REPLICA_ALIAS in settings.DATABASES
+
+
+@contextmanager
+def use_replica(enabled=True):
+    """Направляет чтения внутри блока на реплику (если она настроена)."""
+    token = read_from_replica.set(enabled)
+    try:
+        yield
+    finally:
+        read_from_replica.reset(token)
+
+
+class PrimaryReplicaRouter:
+    """
+    Чтения в контексте use_replica() идут на реплику, всё остальное — в основную БД.
+    Связанные объекты, загруженные с реплики, дочитываются оттуда же
+    (Django использует БД исходного объекта), записи всегда идут в default.
+    """
+
+    def db_for_read(self, model, **hints):
+        if read_from_replica.get() and replica_configured():
+            return REPLICA_ALIAS
+        return 'default'
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплика содержит те же данные, что и основная БД
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return None
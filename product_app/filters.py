@@ -0,0 +1,114 @@
+from datetime import date
+
+from django.db.models import Exists, OuterRef, Q
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import BaseFilterBackend, OrderingFilter
+
+from .db import MAX_ID
+
+# Суффиксы параметров диапазона дат: ?end_date__gte=2025-01-01&end_date__lte=2025-03-31
+DATE_LOOKUPS = ('gte', 'lte')
+
+
+def parse_ids(param, value):
+    try:
+        ids = [int(item) for item in value.split(',') if item.strip()]
+    except ValueError:
+        raise ValidationError({param: 'Expected a comma-separated list of ids.'})
+    # Иначе id шире BIGINT дойдёт до условия __in и упадёт в БД с OverflowError
+    if any(not 1 <= pk <= MAX_ID for pk in ids):
+        raise ValidationError({param: f'Expected ids between 1 and {MAX_ID}.'})
+    return ids
+
+
+def parse_date(param, value):
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise ValidationError({param: 'Expected a date in YYYY-MM-DD format.'})
+
+
+def compile_filter(model, lookup, values):
+    """
+    Условие lookup IN values. Если путь заканчивается связью многие-ко-многим
+    (spheres, product__spheres), строится EXISTS по промежуточной таблице:
+    JOIN не размножает строки и не требует DISTINCT, а несколько таких
+    фильтров не добавляют друг к другу соединений.
+    """
+    *path, name = lookup.split('__')
+    owner = model
+    for part in path:
+        owner = owner._meta.get_field(part).related_model
+    field = owner._meta.get_field(name)
+    if not field.many_to_many or field.auto_created:
+        return Q(**{f'{lookup}__in': values})
+    through = field.remote_field.through
+    return Exists(through.objects.filter(**{
+        field.m2m_field_name(): OuterRef('__'.join(path) or 'pk'),
+        f'{field.m2m_reverse_field_name()}__in': values,
+    }))
+
+
+class PortfolioFilterBackend(BaseFilterBackend):
+    """
+    Фильтры списков, объявленные во вьюсете:
+    filter_params — параметр запроса -> путь к полю; значение — id через запятую
+    (?sphere=1,2 — хотя бы одна из сфер); date_range_fields — поля дат
+    с параметрами <поле>__gte и <поле>__lte. Все условия попадают в один запрос.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        params = request.query_params
+        conditions = []
+        for param, lookup in getattr(view, 'filter_params', {}).items():
+            value = params.get(param)
+            if value:
+                conditions.append(compile_filter(queryset.model, lookup, parse_ids(param, value)))
+        for field in getattr(view, 'date_range_fields', ()):
+            for suffix in DATE_LOOKUPS:
+                param = f'{field}__{suffix}'
+                value = params.get(param)
+                if value:
+                    conditions.append(Q(**{param: parse_date(param, value)}))
+        return queryset.filter(*conditions) if conditions else queryset
+
+    def get_schema_operation_parameters(self, view):
+        parameters = [
+            {
+                'name': param,
+                'required': False,
+                'in': 'query',
+                'description': f'id через запятую ({lookup})',
+                'schema': {'type': 'string'},
+            }
+            for param, lookup in getattr(view, 'filter_params', {}).items()
+        ]
+        parameters += [
+            {
+                'name': f'{field}__{suffix}',
+                'required': False,
+                'in': 'query',
+                'schema': {'type': 'string', 'format': 'date'},
+            }
+            for field in getattr(view, 'date_range_fields', ()) for suffix in DATE_LOOKUPS
+        ]
+        return parameters
+
+
+class KeysetOrderingFilter(OrderingFilter):
+    """
+    ?ordering= только по полям из ordering_fields вьюсета (по умолчанию — по id).
+    id добавляется последним ключом, чтобы порядок строк и курсоры страниц
+    были однозначными при одинаковых значениях.
+    """
+    ordering_fields = ('id',)
+
+    def get_valid_fields(self, queryset, view, context=None):
+        fields = getattr(view, 'ordering_fields', self.ordering_fields)
+        return [(field, field) for field in fields]
+
+    def get_ordering(self, request, queryset, view):
+        ordering = list(super().get_ordering(request, queryset, view) or ['id'])
+        if not {'id', '-id'} & set(ordering):
+            ordering.append('id')
+        return ordering
@@ -0,0 +1,344 @@
+import csv
+import io
+import zipfile
+from contextlib import nullcontext
+from datetime import date, datetime
+
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.core.validators import URLValidator
+from django.db import transaction
+
+from .models import Partner, Product, ProductStatus, Project, ProjectRole, ProjectStatus, Role, SalesModel, Sphere
+from .portfolio import add_memberships
+from .seeding import add_m2m
+from .signals import bulk_changed
+
+User = get_user_model()
+
+LIST_SEPARATOR = ';'  # Несколько значений в ячейке: «Финансы; Ритейл»
+ROLE_SEPARATOR = ':'  # Стажёр с ролью в колонке members: «ivanov:Дизайнер»
+DATE_FORMATS = ('%Y-%m-%d', '%d.%m.%Y')
+
+# Имя набора (аргумент команды, лист XLSX) -> модель
+IMPORT_MODELS = {
+    'partners': Partner,
+    'products': Product,
+    'projects': Project,
+}
+
+# Колонки файла по наборам; обязательные отмечены в описании команды
+IMPORT_COLUMNS = {
+    'partners': ('name', 'url'),
+    'products': (
+        'name', 'description', 'created_at', 'status', 'sales_model', 'spheres', 'partners', 'owners', 'curators',
+    ),
+    'projects': (
+        'name', 'product', 'description', 'status', 'start_date', 'end_date', 'partners', 'curators', 'members',
+    ),
+}
+
+
+class ImportFileError(Exception):
+    """Файл не удаётся прочитать: неизвестный формат или повреждённое содержимое."""
+
+
+class RowError(Exception):
+    """Ошибка в строке файла: строка пропускается и попадает в отчёт."""
+
+
+def read_rows(file, filename, sheet=None, delimiter=','):
+    """
+    Построчно читает CSV или XLSX из двоичного файла и отдаёт пары
+    (номер строки, {колонка: значение}). Файл не загружается в память целиком.
+    """
+    if filename.lower().endswith('.xlsx'):
+        return _read_xlsx(file, sheet)
+    if filename.lower().endswith('.csv'):
+        return _read_csv(file, delimiter)
+    raise ImportFileError('Поддерживаются файлы .csv и .xlsx')
+
+
+def _read_csv(file, delimiter):
+    reader = csv.reader(io.TextIOWrapper(file, encoding='utf-8-sig', newline=''), delimiter=delimiter)
+    try:
+        header = [column.strip().lower() for column in next(reader, [])]
+        for values in reader:
+            if any(value.strip() for value in values):
+                yield reader.line_num, dict(zip(header, values))
+    except UnicodeDecodeError:
+        raise ImportFileError(f'Строка {reader.line_num + 1}: файл CSV должен быть в кодировке UTF-8')
+    except csv.Error as error:
+        raise ImportFileError(f'Строка {reader.line_num}: {error}')
+
+
+def _read_xlsx(file, sheet):
+    from openpyxl import load_workbook  # openpyxl нужен только при импорте XLSX, а не при старте
+
+    # read_only: строки читаются потоком, без построения всей книги в памяти
+    try:
+        workbook = load_workbook(file, read_only=True, data_only=True)
+    except zipfile.BadZipFile:
+        raise ImportFileError('Файл XLSX повреждён или сохранён в другом формате')
+    try:
+        worksheet = workbook[sheet] if sheet in workbook.sheetnames else workbook.active
+        rows = worksheet.iter_rows(values_only=True)
+        header = [str(column or '').strip().lower() for column in next(rows, ())]
+        for line, values in enumerate(rows, start=2):
+            if any(value not in (None, '') for value in values):
+                yield line, dict(zip(header, values))
+    finally:
+        workbook.close()
+
+
+def text(row, column, required=False, max_length=None):
+    value = row.get(column)
+    value = '' if value is None else str(value).strip()
+    if required and not value:
+        raise RowError(f'{column}: обязательное поле')
+    if max_length and len(value) > max_length:
+        raise RowError(f'{column}: длиннее {max_length} символов')
+    return value
+
+
+def values(row, column):
+    return [value.strip() for value in text(row, column).split(LIST_SEPARATOR) if value.strip()]
+
+
+def parse_date(row, column):
+    value = row.get(column)
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    value = text(row, column)
+    if not value:
+        return None
+    for date_format in DATE_FORMATS:
+        try:
+            return datetime.strptime(value, date_format).date()
+        except ValueError:
+            pass
+    raise RowError(f'{column}: ожидается дата ГГГГ-ММ-ДД или ДД.ММ.ГГГГ, получено «{value}»')
+
+
+class LookupCache:
+    """
+    Справочник «название -> id» в памяти. Отсутствующее название не создаётся сразу:
+    get() возвращает None и запоминает его в missing, а create() вызывается только
+    для строк без ошибок, чтобы отклонённые строки не оставляли значений в справочниках.
+    """
+
+    def __init__(self, model):
+        self.model = model
+        self.max_length = model._meta.get_field('name').max_length
+        self.ids = dict(model.objects.order_by('-pk').values_list('name', 'pk'))
+        self.missing = set()  # Новые названия текущей строки
+
+    def get(self, name, column):
+        if name not in self.ids:
+            if len(name) > self.max_length:
+                raise RowError(f'{column}: длиннее {self.max_length} символов')
+            self.missing.add(name)
+        return self.ids.get(name)
+
+    def create(self, names):
+        for name in names:
+            if name not in self.ids:
+                self.ids[name] = self.model.objects.get_or_create(name=name)[0].pk
+
+
+class ReferenceCache:
+    """
+    Ссылки на существующие объекты по полю (логин, название). Значения
+    подгружаются одним запросом на пачку строк и запоминаются, включая
+    ненайденные; при совпадающих названиях берётся объект с меньшим id.
+    """
+
+    def __init__(self, model, field):
+        self.model = model
+        self.field = field
+        self.ids = {}
+
+    def load(self, keys):
+        missing = list({key for key in keys if key not in self.ids})
+        for start in range(0, len(missing), 500):
+            chunk = missing[start:start + 500]
+            self.ids.update(dict.fromkeys(chunk))
+            for key, pk in (
+                self.model.objects.filter(**{f'{self.field}__in': chunk})
+                .order_by('-pk')
+                .values_list(self.field, 'pk')
+            ):
+                self.ids[key] = pk
+
+    def get(self, key, column):
+        pk = self.ids.get(key)
+        if pk is None:
+            raise RowError(f'{column}: не найдено «{key}»')
+        return pk
+
+
+class PortfolioImporter:
+    """
+    Импорт партнёров, продуктов или проектов пачками по batch_size строк.
+    Строки проверяются до записи; ошибочные пропускаются и передаются
+    в on_error(номер строки, сообщение). Каждая пачка пишется в своей
+    транзакции через bulk_create вместе со строками связей M2M и ролями,
+    после чего сигнал bulk_changed обновляет кэш, поиск, сводки и карточки.
+    В режиме dry_run всё выполняется и откатывается в конце.
+    """
+
+    def __init__(self, kind, batch_size=1000, dry_run=False, on_error=None):
+        self.kind = kind
+        self.model = IMPORT_MODELS[kind]
+        self.batch_size = batch_size
+        self.dry_run = dry_run
+        self.on_error = on_error
+        self.created = 0
+        self.errors = 0
+        self.lookups = {
+            model: LookupCache(model) for model in (Sphere, ProductStatus, SalesModel, ProjectStatus, Role)
+        }
+        self.users = ReferenceCache(User, 'username')
+        self.partners = ReferenceCache(Partner, 'name')
+        self.products = ReferenceCache(Product, 'name')
+        self.url_validator = URLValidator()
+
+    def run(self, rows):
+        """Импортирует строки и возвращает (создано, ошибок)."""
+        # Пробный прогон идёт в одной транзакции, которая откатывается в конце
+        with transaction.atomic() if self.dry_run else nullcontext():
+            batch = []
+            for line, row in rows:
+                batch.append((line, row))
+                if len(batch) >= self.batch_size:
+                    self.import_batch(batch)
+                    batch = []
+            if batch:
+                self.import_batch(batch)
+            if self.dry_run:
+                transaction.set_rollback(True)
+        return self.created, self.errors
+
+    def error(self, line, message):
+        self.errors += 1
+        if self.on_error is not None:
+            self.on_error(line, message)
+
+    def import_batch(self, batch):
+        for column, cache in (
+            ('owners', self.users), ('curators', self.users), ('members', self.users),
+            ('partners', self.partners), ('product', self.products),
+        ):
+            if column in IMPORT_COLUMNS[self.kind]:
+                cache.load(
+                    value.split(ROLE_SEPARATOR)[0].strip() for _, row in batch for value in values(row, column)
+                )
+
+        build = getattr(self, f'build_{self.model._meta.model_name}')
+        built = []
+        for line, row in batch:
+            try:
+                built.append((row, *self.build_row(build, row)))
+            except RowError as error:
+                self.error(line, str(error))
+        if not built:
+            return
+        # Каждая пачка фиксируется отдельно: отложенные пересчёты сводок и карточек идут пачками
+        with transaction.atomic():
+            # Новые значения справочников создаются только для принятых строк,
+            # которые затем собираются заново уже с их id
+            for index, (row, obj, links, missing) in enumerate(built):
+                if missing:
+                    for cache, names in missing.items():
+                        cache.create(names)
+                    built[index] = (row, *build(row), {})
+            self.write([obj for _, obj, _, _ in built], [links for _, _, links, _ in built])
+        self.created += len(built)
+
+    def build_row(self, build, row):
+        """Собирает объект строки: (объект, связи, {справочник: названия, которых в нём ещё нет})."""
+        for cache in self.lookups.values():
+            cache.missing.clear()
+        obj, links = build(row)
+        return obj, links, {cache: set(cache.missing) for cache in self.lookups.values() if cache.missing}
+
+    def write(self, objs, relations):
+        model = self.model
+        objs = model.objects.bulk_create(objs, batch_size=self.batch_size)
+        roles = []
+        for field in model._meta.many_to_many:
+            pairs = [(obj.pk, pk) for obj, links in zip(objs, relations) for pk in links.get(field.name, ())]
+            if not pairs:
+                continue
+            add_m2m(model, field.name, pairs)
+            if field.related_model is User:
+                add_memberships(field.remote_field.through, pairs)
+        for obj, links in zip(objs, relations):
+            roles += [
+                ProjectRole(project_id=obj.pk, member_id=user_id, role_id=role_id)
+                for user_id, role_id in links.get('roles', ())
+            ]
+        bulk_changed.send(sender=model, pks=[obj.pk for obj in objs], instances=objs, created=True)
+        if roles:
+            roles = ProjectRole.objects.bulk_create(roles, batch_size=self.batch_size)
+            bulk_changed.send(sender=ProjectRole, pks=[role.pk for role in roles], instances=roles, created=True)
+
+    def lookup(self, model, row, column):
+        name = text(row, column)
+        return self.lookups[model].get(name, column) if name else None
+
+    def references(self, cache, row, column):
+        return list(dict.fromkeys(cache.get(value, column) for value in values(row, column)))
+
+    def build_partner(self, row):
+        url = text(row, 'url')
+        if url:
+            try:
+                self.url_validator(url)
+            except ValidationError:
+                raise RowError(f'url: некорректный адрес «{url}»')
+        return Partner(name=text(row, 'name', required=True, max_length=255), url=url or None), {}
+
+    def build_product(self, row):
+        product = Product(
+            name=text(row, 'name', required=True, max_length=255),
+            description=text(row, 'description') or None,
+            created_at=parse_date(row, 'created_at'),
+            status_id=self.lookup(ProductStatus, row, 'status'),
+            sales_model_id=self.lookup(SalesModel, row, 'sales_model'),
+        )
+        links = {
+            'spheres': list(dict.fromkeys(self.lookups[Sphere].get(name, 'spheres') for name in values(row, 'spheres'))),
+            'partners': self.references(self.partners, row, 'partners'),
+            'owners': self.references(self.users, row, 'owners'),
+            'curators': self.references(self.users, row, 'curators'),
+        }
+        return product, links
+
+    def build_project(self, row):
+        project = Project(
+            name=text(row, 'name', required=True, max_length=255),
+            product_id=self.products.get(text(row, 'product', required=True), 'product'),
+            description=text(row, 'description') or None,
+            status_id=self.lookup(ProjectStatus, row, 'status'),
+            start_date=parse_date(row, 'start_date'),
+            end_date=parse_date(row, 'end_date'),
+        )
+        if project.start_date and project.end_date and project.start_date > project.end_date:
+            raise RowError('start_date: дата начала позже даты завершения')
+        members, roles = [], []
+        for value in values(row, 'members'):
+            username, _, role = (part.strip() for part in value.partition(ROLE_SEPARATOR))
+            user_id = self.users.get(username, 'members')
+            members.append(user_id)
+            if role:
+                roles.append((user_id, self.lookups[Role].get(role, 'members')))
+        links = {
+            'partners': self.references(self.partners, row, 'partners'),
+            'curators': self.references(self.users, row, 'curators'),
+            'members': list(dict.fromkeys(members)),
+            'roles': list(dict(roles).items()),
+        }
+        return project, links
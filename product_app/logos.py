@@ -0,0 +1,105 @@
+import logging
+import posixpath
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connections, transaction
+from django.utils import timezone
+
+from .cache import bump_version
+from .cards import schedule_card_refresh
+from .changes import log_changes
+from .models import Partner, Product, Project
+from .storage import logo_storage
+
+logger = logging.getLogger(__name__)
+
+LOGO_MODELS = (Product, Project, Partner)
+
+# Вариант -> размер рамки (ширина, высота); пропорции логотипа сохраняются
+LOGO_VARIANT_SIZES = {
+    'thumb': (200, 120),  # Список в админке (100x60 на экранах с двойной плотностью)
+    'medium': (600, 360),
+}
+LOGO_VARIANT_FORMATS = (('webp', 'WEBP'), ('png', 'PNG'))
+
+_executor = None
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=settings.LOGO_WORKERS, thread_name_prefix='logo-variants')
+    return _executor
+
+
+def build_variants(name):
+    """
+    Создаёт миниатюры логотипа в WebP и PNG и возвращает словарь путей.
+    Векторные SVG не растрируются. Без Pillow возвращается только исходный файл.
+    """
+    variants = {'source': name}
+    if name.lower().endswith('.svg'):
+        return variants
+    try:
+        from PIL import Image
+    except ImportError:
+        logger.warning('Pillow не установлен, варианты логотипа %s не созданы', name)
+        return variants
+
+    with logo_storage.open(name) as file:
+        image = Image.open(file)
+        image.load()
+    image = image.convert('RGBA')
+    stem = posixpath.splitext(posixpath.basename(name))[0]
+
+    for variant, size in LOGO_VARIANT_SIZES.items():
+        resized = image.copy()
+        resized.thumbnail(size)
+        for ext, image_format in LOGO_VARIANT_FORMATS:
+            buffer = BytesIO()
+            resized.save(buffer, image_format)
+            path = logo_storage.save(f'logos/variants/{stem}_{variant}.{ext}', ContentFile(buffer.getvalue()))
+            variants[variant if ext == 'png' else f'{variant}_{ext}'] = path
+    return variants
+
+
+def process_logo(name):
+    """Создаёт варианты логотипа и записывает их во все объекты, использующие этот файл."""
+    try:
+        variants = build_variants(name)
+        for model in LOGO_MODELS:
+            pks = list(model.objects.filter(logo=name).values_list('pk', flat=True))
+            if model.objects.filter(pk__in=pks).update(logo_variants=variants, updated_at=timezone.now()):
+                bump_version(model)
+                log_changes(model, pks, 'update')
+                if model is Product:
+                    schedule_card_refresh(pks)
+    except Exception:
+        logger.exception('Не удалось обработать логотип %s', name)
+
+
+def _process_in_worker(name):
+    try:
+        process_logo(name)
+    finally:
+        # Поток пула живёт долго: не держим соединение с БД между задачами
+        connections.close_all()
+
+
+def schedule_logo_processing(name):
+    """Ставит обработку логотипа в фоновый пул после фиксации транзакции."""
+    if settings.LOGO_PROCESSING_ASYNC:
+        transaction.on_commit(lambda: get_executor().submit(_process_in_worker, name))
+    else:
+        transaction.on_commit(lambda: process_logo(name))
+
+
+def logo_variant_url(obj, variant='thumb_webp'):
+    """URL варианта логотипа, а пока он не готов — URL исходного файла."""
+    path = (obj.logo_variants or {}).get(variant)
+    if path:
+        return logo_storage.url(path)
+    return obj.logo.url if obj.logo else None
@@ -0,0 +1,175 @@
+import json
+import platform
+import statistics
+import time
+import tracemalloc
+
+import django
+from django.apps import apps
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, setup_test_environment, teardown_test_environment
+
+from product_app.cache import bump_version
+from product_app.urls import router
+
+# Эндпоинты вне роутера
+EXTRA_ENDPOINTS = (
+    '/api/search/?q=приложение',
+    '/api/stats/',
+    '/api/stats/deadlines/?days=30',
+    '/api/timeline/',
+    '/api/changes/?since=0',
+)
+
+# Метрики, по которым сравнивается с базовой линией
+COMPARED = ('p50_ms', 'p95_ms', 'p99_ms', 'queries', 'peak_kb')
+
+
+class Command(BaseCommand):
+    help = (
+        'Прогоняет list, retrieve и GET-действия всех вьюсетов через тестовый клиент на текущих данных '
+        '(см. seed_portfolio) и выводит p50/p95/p99, число SQL-запросов и пиковую память. '
+        'Результат сохраняется в JSON и сравнивается с сохранённой базовой линией.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=30, help='Замеров на эндпоинт')
+        parser.add_argument('--warmup', type=int, default=3, help='Прогревочных запросов на эндпоинт')
+        parser.add_argument('--page-size', type=int, default=50)
+        parser.add_argument(
+            '--warm-cache', action='store_true',
+            help='Не очищать кэш ответов перед каждым запросом (по умолчанию измеряется работа без кэша)',
+        )
+        parser.add_argument('--output', help='Файл для результатов в JSON')
+        parser.add_argument('--baseline', help='JSON предыдущего прогона для сравнения')
+        parser.add_argument(
+            '--max-regression', type=float, default=None,
+            help='Допустимое ухудшение в процентах; при превышении команда завершается с ошибкой',
+        )
+
+    def handle(self, *args, **options):
+        self.options = options
+        setup_test_environment()  # Разрешает хост testserver тестового клиента
+        try:
+            self.client = Client()
+            results = {}
+            for path in self.get_endpoints():
+                results[path] = self.measure(path)
+                self.report_line(path, results[path])
+        finally:
+            teardown_test_environment()
+
+        report = {
+            'meta': {
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'database': connection.vendor,
+                'repeat': options['repeat'],
+                'warm_cache': options['warm_cache'],
+            },
+            'endpoints': results,
+        }
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                json.dump(report, file, ensure_ascii=False, indent=2)
+            self.stdout.write(f'Результаты сохранены в {options["output"]}')
+        if options['baseline']:
+            self.compare(results)
+
+    def get_endpoints(self):
+        page = f'page_size={self.options["page_size"]}'
+        endpoints = []
+        for prefix, viewset, _ in router.registry:
+            base = f'/api/{prefix}/'
+            endpoints.append(f'{base}?{page}')
+            instance = viewset.queryset.order_by('pk').first()
+            if instance is not None:
+                endpoints.append(f'{base}{instance.pk}/')
+            for extra_action in viewset.get_extra_actions():
+                if 'get' not in extra_action.mapping:
+                    continue
+                if extra_action.detail and instance is not None:
+                    endpoints.append(f'{base}{instance.pk}/{extra_action.url_path}/')
+                elif not extra_action.detail:
+                    endpoints.append(f'{base}{extra_action.url_path}/')
+        return endpoints + list(EXTRA_ENDPOINTS)
+
+    def reset_response_cache(self):
+        # Новые версии моделей делают закэшированные ответы недостижимыми, не трогая
+        # остальные ключи общего кэша (сессии, чужие приложения), как сделал бы cache.clear()
+        if not self.options['warm_cache']:
+            for model in (*apps.get_app_config('product_app').get_models(), get_user_model()):
+                bump_version(model)
+
+    def request(self, path):
+        response = self.client.get(path)
+        if response.streaming:
+            # Потоковый экспорт: время включает чтение всего тела
+            b''.join(response.streaming_content)
+        return response
+
+    def measure(self, path):
+        for _ in range(self.options['warmup']):
+            self.reset_response_cache()
+            self.request(path)
+
+        timings, queries = [], []
+        for _ in range(self.options['repeat']):
+            self.reset_response_cache()  # Вне замера времени
+            with CaptureQueriesContext(connection) as context:
+                started = time.perf_counter()
+                response = self.request(path)
+                timings.append((time.perf_counter() - started) * 1000)
+            queries.append(len(context.captured_queries))
+
+        # Память меряется отдельным запросом: tracemalloc заметно замедляет код
+        self.reset_response_cache()
+        tracemalloc.start()
+        try:
+            self.request(path)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        percentiles = statistics.quantiles(timings, n=100, method='inclusive') if len(timings) > 1 else timings * 99
+        return {
+            'status': response.status_code,
+            'p50_ms': round(statistics.median(timings), 2),
+            'p95_ms': round(percentiles[94], 2),
+            'p99_ms': round(percentiles[98], 2),
+            'queries': max(queries),
+            'peak_kb': round(peak / 1024, 1),
+        }
+
+    def report_line(self, path, result):
+        self.stdout.write(
+            f'{path:<60} {result["status"]:>4} p50 {result["p50_ms"]:>8.2f} p95 {result["p95_ms"]:>8.2f} '
+            f'p99 {result["p99_ms"]:>8.2f} мс  SQL {result["queries"]:>3}  {result["peak_kb"]:>9.1f} КБ'
+        )
+
+    def compare(self, results):
+        with open(self.options['baseline'], encoding='utf-8') as file:
+            baseline = json.load(file)['endpoints']
+        limit = self.options['max_regression']
+        regressions = []
+        self.stdout.write('\nСравнение с базовой линией (изменение, %):')
+        for path, result in results.items():
+            previous = baseline.get(path)
+            if previous is None:
+                self.stdout.write(f'{path:<60} новый эндпоинт')
+                continue
+            changes = []
+            for metric in COMPARED:
+                before, after = previous.get(metric), result[metric]
+                if not before:
+                    continue
+                delta = (after - before) / before * 100
+                changes.append(f'{metric} {delta:+.0f}')
+                if limit is not None and delta > limit:
+                    regressions.append(f'{path} {metric}: {before} -> {after}')
+            self.stdout.write(f'{path:<60} {", ".join(changes)}')
+        if regressions:
+            raise CommandError('Регрессии производительности:\n' + '\n'.join(regressions))
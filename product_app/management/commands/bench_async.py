@@ -0,0 +1,65 @@
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.error import URLError
+from urllib.request import urlopen
+
+from django.core.management.base import BaseCommand
+
+# Синхронный эндпоинт DRF -> его асинхронный аналог
+ENDPOINTS = (
+    ('/api/products/', '/api/async/products/'),
+    ('/api/projects/', '/api/async/projects/'),
+    ('/api/project-stages/', '/api/async/project-stages/'),
+    ('/api/spheres/', '/api/async/spheres/'),
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагрузочное сравнение синхронных (WSGI) и асинхронных (ASGI) эндпоинтов чтения. '
+        'Серверы запускаются отдельно, например: gunicorn Product_portfolio.wsgi -w 1 --threads 4 '
+        '-b :8000 и uvicorn Product_portfolio.asgi:application --workers 1 --port 8001'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--wsgi-url', default='http://127.0.0.1:8000', help='Адрес WSGI-сервера')
+        parser.add_argument('--asgi-url', default='http://127.0.0.1:8001', help='Адрес ASGI-сервера')
+        parser.add_argument('--requests', type=int, default=500, help='Запросов на эндпоинт')
+        parser.add_argument('--concurrency', type=int, default=50, help='Одновременных клиентов')
+        parser.add_argument(
+            '--read-delay', type=float, default=0.0,
+            help='Пауза (с) между порциями чтения ответа: имитация медленного клиента',
+        )
+
+    def handle(self, *args, **options):
+        self.read_delay = options['read_delay']
+        header = f'{"эндпоинт":<48}{"запр/с":>10}{"p50, мс":>10}{"p95, мс":>10}{"ошибок":>8}'
+        self.stdout.write(header)
+        for sync_path, async_path in ENDPOINTS:
+            for url in (options['wsgi_url'] + sync_path, options['asgi_url'] + async_path):
+                rps, p50, p95, errors = self.run(url, options['requests'], options['concurrency'])
+                self.stdout.write(f'{url:<48}{rps:>10.1f}{p50:>10.1f}{p95:>10.1f}{errors:>8}')
+
+    def fetch(self, url):
+        started = time.perf_counter()
+        try:
+            with urlopen(url, timeout=30) as response:
+                while response.read(4096):
+                    if self.read_delay:
+                        time.sleep(self.read_delay)
+        except (URLError, OSError):
+            return None
+        return (time.perf_counter() - started) * 1000
+
+    def run(self, url, requests, concurrency):
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            timings = list(pool.map(self.fetch, [url] * requests))
+        elapsed = time.perf_counter() - started
+        ok = sorted(timing for timing in timings if timing is not None)
+        if len(ok) < 2:
+            return 0.0, 0.0, 0.0, len(timings) - len(ok)
+        p50 = statistics.median(ok)
+        p95 = statistics.quantiles(ok, n=20)[-1]
+        return len(ok) / elapsed, p50, p95, len(timings) - len(ok)
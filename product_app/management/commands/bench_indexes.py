@@ -0,0 +1,152 @@
+import random
+import time
+from datetime import date, timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from product_app.models import (
+    Partner, Product, ProductStatus, Project, ProjectRole, ProjectStage, ProjectStatus, Role,
+)
+
+User = get_user_model()
+
+
+class Rollback(Exception):
+    """Откатывает транзакцию с синтетическими данными."""
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет БД синтетическими данными и сравнивает планы EXPLAIN и время '
+        'запросов API с индексами из Meta.indexes и без них. Данные откатываются.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=2000, help='Количество продуктов')
+        parser.add_argument('--projects', type=int, default=5, help='Проектов на продукт')
+        parser.add_argument('--stages', type=int, default=4, help='Этапов на проект')
+        parser.add_argument('--repeat', type=int, default=20, help='Повторов каждого запроса')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        self.repeat = options['repeat']
+        random.seed(options['seed'])
+        try:
+            with transaction.atomic():
+                self.stdout.write('Генерация данных...')
+                self.seed(options['products'], options['projects'], options['stages'])
+                results = self.run_queries('indexed')
+                with transaction.atomic():
+                    self.drop_indexes()
+                    baseline = self.run_queries('baseline')
+                    transaction.set_rollback(True)
+                self.report(baseline, results)
+                raise Rollback
+        except Rollback:
+            pass
+
+    def seed(self, products, projects, stages):
+        product_statuses = ProductStatus.objects.bulk_create(
+            [ProductStatus(name=f'bench-status-{i}') for i in range(5)]
+        )
+        project_statuses = ProjectStatus.objects.bulk_create(
+            [ProjectStatus(name=f'bench-status-{i}') for i in range(5)]
+        )
+        roles = Role.objects.bulk_create([Role(name=f'bench-role-{i}') for i in range(5)])
+        users = User.objects.bulk_create([User(username=f'bench-user-{i}') for i in range(200)])
+        Partner.objects.bulk_create([Partner(name=f'Партнёр {i}') for i in range(products // 10 + 1)])
+
+        start = date(2020, 1, 1)
+        product_objs = Product.objects.bulk_create([
+            Product(
+                name=f'Продукт {i}',
+                status=random.choice(product_statuses),
+                created_at=start + timedelta(days=random.randint(0, 1800)),
+            )
+            for i in range(products)
+        ], batch_size=1000)
+        project_objs = Project.objects.bulk_create([
+            Project(
+                name=f'Проект {product.pk}-{i}',
+                product=product,
+                status=random.choice(project_statuses),
+                start_date=product.created_at + timedelta(days=random.randint(0, 90)),
+                end_date=product.created_at + timedelta(days=random.randint(90, 400)),
+            )
+            for product in product_objs for i in range(projects)
+        ], batch_size=1000)
+        ProjectStage.objects.bulk_create([
+            ProjectStage(
+                project=project,
+                name=f'Этап {i}',
+                start_date=project.start_date + timedelta(days=30 * i),
+                end_date=project.start_date + timedelta(days=30 * i + 29),
+            )
+            for project in project_objs for i in range(stages)
+        ], batch_size=1000)
+        ProjectRole.objects.bulk_create([
+            ProjectRole(project=project, member=member, role=random.choice(roles))
+            for project in project_objs for member in random.sample(users, 3)
+        ], batch_size=1000)
+        self.sample = {
+            'product_status': product_statuses[0],
+            'project_status': project_statuses[0],
+            'product': product_objs[len(product_objs) // 2],
+            'project': project_objs[len(project_objs) // 2],
+        }
+
+    def get_queries(self):
+        sample = self.sample
+        day = date(2022, 1, 1)
+        return {
+            'products ?status=': Product.objects.filter(status=sample['product_status']).order_by('created_at'),
+            'products created_at range': Product.objects.filter(
+                created_at__range=(day, day + timedelta(days=30))
+            ),
+            'products name=': Product.objects.filter(name=sample['product'].name),
+            'projects ?product_id=&status=': Project.objects.filter(
+                product=sample['product'], status=sample['project_status']
+            ),
+            'projects start_date range': Project.objects.filter(
+                start_date__range=(day, day + timedelta(days=30))
+            ),
+            'projects end_date >=': Project.objects.filter(end_date__gte=date(2025, 1, 1)),
+            'stages ?project=': ProjectStage.objects.filter(project=sample['project']).order_by('start_date'),
+            'project roles ?project_id=': ProjectRole.objects.filter(project=sample['project']),
+            'partners name=': Partner.objects.filter(name='Партнёр 1'),
+        }
+
+    def explain(self, queryset, phase):
+        # Комментарий с фазой делает текст запроса уникальным: SQLite кэширует
+        # подготовленные EXPLAIN и иначе вернул бы план до удаления индексов
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f'{connection.ops.explain_query_prefix()} {sql} /* {phase} */', params)
+            return '; '.join(str(row[-1]) for row in cursor.fetchall())
+
+    def run_queries(self, phase):
+        results = {}
+        for name, queryset in self.get_queries().items():
+            plan = self.explain(queryset, phase)
+            started = time.perf_counter()
+            for _ in range(self.repeat):
+                list(queryset.all())
+            elapsed = (time.perf_counter() - started) / self.repeat * 1000
+            results[name] = (elapsed, plan)
+        return results
+
+    def drop_indexes(self):
+        # DDL выполняется внутри транзакции и откатывается вместе с ней
+        with connection.cursor() as cursor:
+            for model in (Partner, Product, Project, ProjectStage, ProjectRole):
+                for index in model._meta.indexes:
+                    cursor.execute(f'DROP INDEX {connection.ops.quote_name(index.name)}')
+
+    def report(self, baseline, results):
+        for name, (elapsed, plan) in results.items():
+            before, before_plan = baseline[name]
+            self.stdout.write(self.style.MIGRATE_HEADING(name))
+            self.stdout.write(f'  без индексов: {before:8.3f} мс  | {before_plan}')
+            self.stdout.write(f'  с индексами:  {elapsed:8.3f} мс  | {plan}')
@@ -0,0 +1,105 @@
+import os
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connections, transaction
+
+from product_app.db import atomic_with_retry
+from product_app.models import Product
+
+MODES = (
+    ('baseline', {}, False),  # Настройки Django по умолчанию, без повторов
+    ('tuned', settings.SQLITE_TUNED_OPTIONS, True),  # SQLITE_TUNING=True и atomic_with_retry
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Многопоточный бенчмарк SQLite во временном файле: пропускная способность '
+        'чтения и записи и число ошибок database is locked без настроек и с SQLITE_TUNING'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--readers', type=int, default=8, help='Потоков чтения')
+        parser.add_argument('--writers', type=int, default=4, help='Потоков записи')
+        parser.add_argument('--duration', type=float, default=5.0, help='Длительность прогона, с')
+        parser.add_argument('--rows', type=int, default=5000, help='Строк перед прогоном')
+
+    def handle(self, *args, **options):
+        self.stdout.write(f'{"режим":<10}{"чтений/с":>12}{"записей/с":>12}{"ошибок":>10}')
+        with tempfile.TemporaryDirectory() as directory:
+            for name, db_options, retry in MODES:
+                alias = f'bench_{name}'
+                path = os.path.join(directory, f'{name}.sqlite3')
+                # configure_settings дополняет настройки значениями по умолчанию
+                connections.settings[alias] = connections.configure_settings(
+                    {'default': {'ENGINE': 'django.db.backends.sqlite3', 'NAME': path, 'OPTIONS': db_options}}
+                )['default']
+                try:
+                    self.prepare(alias, options['rows'])
+                    reads, writes, errors = self.run(alias, retry, options)
+                finally:
+                    connections[alias].close()
+                    del connections.settings[alias]
+                duration = options['duration']
+                self.stdout.write(f'{name:<10}{reads / duration:>12.1f}{writes / duration:>12.1f}{errors:>10}')
+
+    def prepare(self, alias, rows):
+        call_command('migrate', database=alias, verbosity=0)
+        Product.objects.using(alias).bulk_create(
+            [Product(name=f'Продукт {index}') for index in range(rows)], batch_size=1000
+        )
+        connections[alias].close()
+
+    def write(self, alias, index):
+        # Типичная запись: чтение, затем вставка в той же транзакции
+        Product.objects.using(alias).filter(name=f'Продукт {index}').exists()
+        Product.objects.using(alias).bulk_create([Product(name=f'Запись {index}')])
+
+    def run(self, alias, retry, options):
+        stop = threading.Event()
+        counters = {'reads': 0, 'writes': 0, 'errors': 0}
+        lock = threading.Lock()
+
+        def count(key):
+            with lock:
+                counters[key] += 1
+
+        def reader():
+            try:
+                while not stop.is_set():
+                    list(Product.objects.using(alias).only('id', 'name').order_by('-id')[:50])
+                    count('reads')
+            finally:
+                connections[alias].close()
+
+        def writer():
+            index = 0
+            try:
+                while not stop.is_set():
+                    index += 1
+                    try:
+                        if retry:
+                            atomic_with_retry(self.write, alias, index, using=alias)
+                        else:
+                            with transaction.atomic(using=alias):
+                                self.write(alias, index)
+                        count('writes')
+                    except OperationalError:
+                        count('errors')
+            finally:
+                connections[alias].close()
+
+        threads = [threading.Thread(target=reader) for _ in range(options['readers'])]
+        threads += [threading.Thread(target=writer) for _ in range(options['writers'])]
+        for thread in threads:
+            thread.start()
+        time.sleep(options['duration'])
+        stop.set()
+        for thread in threads:
+            thread.join()
+        return counters['reads'], counters['writes'], counters['errors']
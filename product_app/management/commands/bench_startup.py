@@ -0,0 +1,64 @@
+import os
+import statistics
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+# Холодный старт воркера: настройка Django, загрузка URLconf и цепочки middleware
+STARTUP_SCRIPT = '''
+import time
+started = time.perf_counter()
+import django
+django.setup()
+from django.core.handlers.wsgi import WSGIHandler
+from django.urls import get_resolver
+get_resolver().url_patterns
+WSGIHandler()
+print(time.perf_counter() - started)
+'''
+
+
+class Command(BaseCommand):
+    help = (
+        'Измеряет холодный старт воркера в отдельных процессах: django.setup(), URLconf '
+        'и middleware. С --imports выводит самые долгие импорты (python -X importtime).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=5, help='Число запусков')
+        parser.add_argument('--imports', type=int, default=0, help='Показать N самых долгих импортов')
+
+    def handle(self, *args, **options):
+        env = {**os.environ, 'DJANGO_SETTINGS_MODULE': settings.SETTINGS_MODULE}
+        cwd = settings.BASE_DIR
+        timings = []
+        for _ in range(options['repeat']):
+            result = subprocess.run(
+                [sys.executable, '-c', STARTUP_SCRIPT], env=env, cwd=cwd, capture_output=True, text=True, check=True,
+            )
+            timings.append(float(result.stdout.strip().splitlines()[-1]) * 1000)
+        self.stdout.write(
+            f'Старт воркера: медиана {statistics.median(timings):.0f} мс, '
+            f'мин {min(timings):.0f} мс, макс {max(timings):.0f} мс ({len(timings)} запусков)'
+        )
+        if options['imports']:
+            self.show_imports(env, cwd, options['imports'])
+
+    def show_imports(self, env, cwd, limit):
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', STARTUP_SCRIPT],
+            env=env, cwd=cwd, capture_output=True, text=True, check=True,
+        )
+        modules = []
+        for line in result.stderr.splitlines():
+            # import time: self [us] | cumulative | imported package
+            if not line.startswith('import time:') or 'imported package' in line:
+                continue
+            _, cumulative, name = line.split('|')
+            if not name.startswith('  '):  # только импорты верхнего уровня
+                modules.append((int(cumulative), name.strip()))
+        self.stdout.write(f'{"модуль":<50}{"мс":>8}')
+        for cumulative, name in sorted(modules, reverse=True)[:limit]:
+            self.stdout.write(f'{name:<50}{cumulative / 1000:>8.1f}')
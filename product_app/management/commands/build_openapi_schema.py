@@ -0,0 +1,36 @@
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from product_app.schema import generate_schema, render_schema, schema_etag, write_schema
+
+
+class Command(BaseCommand):
+    help = (
+        'Собирает схему OpenAPI в JSON-файл (OPENAPI_SCHEMA_FILE или --output), который '
+        '/api/schema/ отдаёт без повторного обхода вьюсетов. С --check только сверяет '
+        'файл с текущим кодом и завершается с ошибкой, если схема устарела.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', help='Путь к файлу схемы (по умолчанию OPENAPI_SCHEMA_FILE)')
+        parser.add_argument('--check', action='store_true', help='Проверить, что файл совпадает с текущей схемой')
+
+    def handle(self, *args, **options):
+        path = options['output'] or settings.OPENAPI_SCHEMA_FILE
+        if not path:
+            raise CommandError('Укажите --output или переменную окружения OPENAPI_SCHEMA_FILE')
+        started = time.perf_counter()
+        if options['check']:
+            content = render_schema(generate_schema())
+            if not Path(path).is_file() or Path(path).read_bytes() != content:
+                raise CommandError(f'Схема в {path} устарела: выполните manage.py build_openapi_schema')
+            self.stdout.write(self.style.SUCCESS(f'Схема актуальна, ETag {schema_etag(content)}'))
+            return
+        content = write_schema(path)
+        self.stdout.write(self.style.SUCCESS(
+            f'Схема записана в {path}: {len(content) / 1024:.0f} КБ, ETag {schema_etag(content)}, '
+            f'за {time.perf_counter() - started:.2f} с'
+        ))
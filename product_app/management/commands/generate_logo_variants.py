@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from product_app.logos import LOGO_MODELS, process_logo
+
+
+class Command(BaseCommand):
+    help = 'Создаёт миниатюры и WebP-версии для уже загруженных логотипов'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='Пересоздать варианты для всех логотипов')
+
+    def handle(self, *args, **options):
+        names = set()
+        for model in LOGO_MODELS:
+            for name, variants in model.objects.exclude(logo='').exclude(logo=None).values_list('logo', 'logo_variants'):
+                if options['force'] or (variants or {}).get('source') != name:
+                    names.add(name)
+        # Один файл может использоваться несколькими объектами — обрабатываем его один раз
+        for name in sorted(names):
+            process_logo(name)
+        self.stdout.write(self.style.SUCCESS(f'Обработано логотипов: {len(names)}'))
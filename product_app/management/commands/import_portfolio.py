@@ -0,0 +1,60 @@
+import csv
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from product_app.importing import IMPORT_COLUMNS, IMPORT_MODELS, ImportFileError, PortfolioImporter, read_rows
+
+
+class Command(BaseCommand):
+    help = (
+        'Импортирует партнёров, продукты или проекты из CSV (UTF-8, первая строка — заголовок) '
+        'или XLSX (лист с именем набора либо первый лист). Обязательные колонки: name, '
+        'у проектов ещё product (название продукта). Несколько значений в ячейке разделяются «;», '
+        'стажёр с ролью записывается как login:Роль. Справочники создаются по названиям, '
+        'пользователи, партнёры и продукты должны существовать.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=list(IMPORT_MODELS), help='Что импортировать')
+        parser.add_argument('path', help='Файл .csv или .xlsx')
+        parser.add_argument('--dry-run', action='store_true', help='Проверить и откатить, ничего не сохраняя')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Строк в одной пачке записи')
+        parser.add_argument('--delimiter', default=',', help='Разделитель колонок CSV')
+        parser.add_argument('--sheet', help='Лист XLSX (по умолчанию — лист с именем набора)')
+        parser.add_argument('--report', help='CSV-файл для отчёта об ошибках по строкам')
+
+    def handle(self, *args, **options):
+        kind = options['kind']
+        self.stdout.write(f'Колонки: {", ".join(IMPORT_COLUMNS[kind])}')
+        report_file = open(options['report'], 'w', encoding='utf-8', newline='') if options['report'] else None
+        report = csv.writer(report_file) if report_file else None
+        if report:
+            report.writerow(['line', 'error'])
+        shown = []
+
+        def on_error(line, message):
+            if report:
+                report.writerow([line, message])
+            if len(shown) < 20:
+                shown.append(f'  строка {line}: {message}')
+
+        importer = PortfolioImporter(
+            kind, batch_size=options['batch_size'], dry_run=options['dry_run'], on_error=on_error,
+        )
+        started = time.perf_counter()
+        try:
+            with open(options['path'], 'rb') as file:
+                rows = read_rows(file, options['path'], sheet=options['sheet'] or kind, delimiter=options['delimiter'])
+                created, errors = importer.run(rows)
+        except (OSError, ImportFileError) as error:
+            raise CommandError(error)
+        finally:
+            if report_file:
+                report_file.close()
+
+        for line in shown:
+            self.stdout.write(line)
+        verb = 'Пробный прогон, было бы создано' if options['dry_run'] else 'Создано'
+        summary = f'{verb}: {created}, строк с ошибками: {errors}, за {time.perf_counter() - started:.1f} с'
+        self.stdout.write(self.style.WARNING(summary) if errors else self.style.SUCCESS(summary))
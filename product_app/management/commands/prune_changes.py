@@ -0,0 +1,21 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from product_app.models import ChangeLog
+
+
+class Command(BaseCommand):
+    help = (
+        'Удаляет старые записи журнала изменений. Потребителям, чей курсор старше '
+        'удалённых записей, нужна полная повторная синхронизация.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=30, help='Сколько дней хранить записи')
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options['days'])
+        deleted, _ = ChangeLog.objects.filter(changed_at__lt=cutoff).delete()
+        self.stdout.write(self.style.SUCCESS(f'Удалено записей: {deleted}'))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from product_app.portfolio import rebuild_memberships
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает индекс участия пользователей в продуктах и проектах'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            rebuild_memberships()
+        self.stdout.write(self.style.SUCCESS('Индекс участия пересобран'))
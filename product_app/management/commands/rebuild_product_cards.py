@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from product_app.cards import rebuild_cards
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает денормализованные карточки продуктов для каталога'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        rebuild_cards(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS('Карточки продуктов пересобраны'))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from product_app.search import ensure_search_schema, rebuild_index
+
+
+class Command(BaseCommand):
+    help = 'Перестраивает полнотекстовый индекс продуктов, проектов, партнёров и сфер'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        ensure_search_schema()
+        rebuild_index(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS('Поисковый индекс перестроен'))
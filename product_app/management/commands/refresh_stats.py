@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from product_app.stats import rebuild_stats
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает материализованные сводки по продуктам и проектам'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        rebuild_stats(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS('Сводки пересчитаны'))
@@ -0,0 +1,34 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from product_app.seeding import seed_portfolio
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет БД синтетическим портфелем: продукты со сферами, партнёрами и заказчиками, '
+        'проекты с этапами, ролями и стажёрами. Данные добавляются к существующим.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=100, help='Количество продуктов')
+        parser.add_argument('--projects', type=int, default=3, help='Проектов на продукт')
+        parser.add_argument('--stages', type=int, default=4, help='Этапов на проект')
+        parser.add_argument('--interns', type=int, default=5, help='Стажёров на проект')
+        parser.add_argument('--users', type=int, default=200, help='Размер пула пользователей')
+        parser.add_argument('--seed', type=int, default=None, help='Зерно генератора для повторяемых данных')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        created = seed_portfolio(
+            products=options['products'],
+            projects=options['projects'],
+            stages=options['stages'],
+            interns=options['interns'],
+            users=options['users'],
+            seed=options['seed'],
+        )
+        for name, count in created.items():
+            self.stdout.write(f'{name}: {count}')
+        self.stdout.write(self.style.SUCCESS(f'Готово за {time.perf_counter() - started:.1f} с'))
@@ -0,0 +1,28 @@
+import sqlite3
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from product_app.db_routers import REPLICA_ALIAS, replica_configured
+
+
+class Command(BaseCommand):
+    help = (
+        'Копирует основную SQLite-базу в файл реплики (DB_REPLICA_NAME). '
+        'Имитирует репликацию при локальной проверке маршрутизации чтений.'
+    )
+
+    def handle(self, *args, **options):
+        if not replica_configured():
+            raise CommandError('Реплика не настроена: задайте DB_REPLICA_NAME')
+        primary, replica = connections['default'], connections[REPLICA_ALIAS]
+        if primary.vendor != 'sqlite' or replica.vendor != 'sqlite':
+            raise CommandError('Команда работает только с SQLite')
+        source = sqlite3.connect(primary.settings_dict['NAME'])
+        target = sqlite3.connect(replica.settings_dict['NAME'])
+        try:
+            source.backup(target)  # Согласованный снимок даже при активных записях
+        finally:
+            source.close()
+            target.close()
+        self.stdout.write(self.style.SUCCESS(f'Реплика обновлена: {replica.settings_dict["NAME"]}'))
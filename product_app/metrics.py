@@ -0,0 +1,135 @@
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# Границы корзин гистограмм (Prometheus le)
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (1, 2, 3, 5, 10, 20, 50, 100, 200)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+METRICS = {
+    # имя: (описание, корзины, ключ в RequestStats)
+    'http_request_duration_seconds': ('Полное время обработки запроса', DURATION_BUCKETS, 'wall'),
+    'db_queries_per_request': ('Число SQL-запросов за запрос', QUERY_BUCKETS, 'queries'),
+    'db_query_duration_seconds': ('Суммарное время SQL за запрос', DURATION_BUCKETS, 'db'),
+    'serializer_duration_seconds': ('Время сериализации за запрос', DURATION_BUCKETS, 'serialize'),
+    'http_response_size_bytes': ('Размер тела ответа', SIZE_BUCKETS, 'size'),
+}
+
+# Статистика текущего запроса; выставляется MetricsMiddleware
+current_stats = ContextVar('request_stats', default=None)
+
+
+class RequestStats:
+    __slots__ = ('wall', 'queries', 'db', 'serialize', 'size', 'serializer_depth')
+
+    def __init__(self):
+        self.wall = self.db = self.serialize = 0.0
+        self.queries = self.size = self.serializer_depth = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        # Обёртка connection.execute_wrapper: считает запросы и их время
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db += time.perf_counter() - started
+            self.queries += 1
+
+    def server_timing(self):
+        return (
+            f'app;dur={self.wall * 1000:.1f}, '
+            f'db;dur={self.db * 1000:.1f};desc="{self.queries} queries", '
+            f'serialize;dur={self.serialize * 1000:.1f}'
+        )
+
+
+def record_query(execute, sql, params, many, context):
+    """Обёртка execute_wrapper каждого соединения: учитывает запрос в статистике текущего запроса."""
+    stats = current_stats.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    return stats(execute, sql, params, many, context)
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.total = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+                break
+        self.total += 1
+        self.sum += value
+
+
+class Registry:
+    """Гистограммы в памяти процесса; у каждого воркера gunicorn/uvicorn свои."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.histograms = {}  # (метрика, метки) -> Histogram
+        self.responses = {}  # метки + status -> количество
+
+    def record(self, labels, status, stats):
+        with self.lock:
+            for name, (_, buckets, attr) in METRICS.items():
+                key = (name, labels)
+                if key not in self.histograms:
+                    self.histograms[key] = Histogram(buckets)
+                self.histograms[key].observe(getattr(stats, attr))
+            key = (*labels, str(status))
+            self.responses[key] = self.responses.get(key, 0) + 1
+
+    def render(self):
+        """Текстовый формат экспозиции Prometheus 0.0.4."""
+        lines = []
+        with self.lock:
+            lines += [
+                '# HELP http_responses_total Количество ответов',
+                '# TYPE http_responses_total counter',
+            ]
+            for (view, action, method, status), count in sorted(self.responses.items()):
+                lines.append(
+                    f'http_responses_total{{view="{view}",action="{action}",method="{method}",'
+                    f'status="{status}"}} {count}'
+                )
+            for name, (description, _, _) in METRICS.items():
+                lines += [f'# HELP {name} {description}', f'# TYPE {name} histogram']
+                for (metric, (view, action, method)), histogram in sorted(self.histograms.items()):
+                    if metric != name:
+                        continue
+                    labels = f'view="{view}",action="{action}",method="{method}"'
+                    cumulative = 0
+                    for bound, count in zip(histogram.buckets, histogram.counts):
+                        cumulative += count
+                        lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+                    lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {histogram.total}')
+                    lines.append(f'{name}_sum{{{labels}}} {histogram.sum}')
+                    lines.append(f'{name}_count{{{labels}}} {histogram.total}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+
+@contextmanager
+def time_serialization():
+    """Учитывает время сериализации; вложенные сериализаторы не считаются повторно."""
+    stats = current_stats.get()
+    if stats is None or stats.serializer_depth:
+        yield
+        return
+    stats.serializer_depth += 1
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        stats.serialize += time.perf_counter() - started
+        stats.serializer_depth -= 1
@@ -0,0 +1,183 @@
+import io
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.http import HttpResponse
+from rest_framework.permissions import SAFE_METHODS
+
+from .db_routers import read_from_replica, replica_configured
+from .metrics import RequestStats, current_stats, registry
+
+STICKY_COOKIE = 'db_primary_until'
+
+
+KNOWN_METHODS = {'GET', 'HEAD', 'OPTIONS', 'POST', 'PUT', 'PATCH', 'DELETE'}
+
+
+def get_view_class(view_func):
+    return getattr(view_func, 'cls', None) or getattr(view_func, 'view_class', None)
+
+
+def is_product_app_view(view_func):
+    view_class = get_view_class(view_func)
+    return view_class is not None and view_class.__module__.startswith('product_app.')
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Отправляет безопасные запросы (GET, HEAD, OPTIONS) к представлениям product_app
+    на реплику. После успешной записи клиент получает cookie и ещё
+    DB_REPLICA_STICKY_SECONDS читает из основной БД, чтобы видеть свои изменения,
+    пока они доезжают до реплики. Работает и под WSGI, и под ASGI.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not replica_configured():
+            return self.get_response(request)
+        # process_view включает реплику в этом контексте, reset возвращает прежнее значение
+        token = read_from_replica.set(False)
+        try:
+            response = self.get_response(request)
+        finally:
+            read_from_replica.reset(token)
+        return self.set_sticky_cookie(request, response)
+
+    async def __acall__(self, request):
+        if not replica_configured():
+            return await self.get_response(request)
+        # Синхронный process_view выполняется через sync_to_async, и asgiref
+        # переносит выставленное им значение обратно в контекст этой корутины
+        token = read_from_replica.set(False)
+        try:
+            response = await self.get_response(request)
+        finally:
+            read_from_replica.reset(token)
+        return self.set_sticky_cookie(request, response)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if not replica_configured() or request.method not in SAFE_METHODS:
+            return None
+        if not is_product_app_view(view_func) or self.is_sticky(request):
+            return None
+        read_from_replica.set(True)
+        return None
+
+    def set_sticky_cookie(self, request, response):
+        if request.method not in SAFE_METHODS and response.status_code < 400:
+            sticky = settings.DB_REPLICA_STICKY_SECONDS
+            response.set_cookie(STICKY_COOKIE, str(int(time.time()) + sticky), max_age=sticky, httponly=True)
+        return response
+
+    def is_sticky(self, request):
+        try:
+            return int(request.COOKIES.get(STICKY_COOKIE, 0)) > time.time()
+        except ValueError:
+            return False
+
+
+def view_labels(view_func, method):
+    """Метки метрик: класс представления, действие вьюсета (list, retrieve, owners...) и метод."""
+    view_class = get_view_class(view_func)
+    name = view_class.__name__ if view_class else getattr(view_func, '__name__', 'unmatched')
+    action = (getattr(view_func, 'actions', None) or {}).get(method.lower(), '')
+    return name, action, method if method in KNOWN_METHODS else 'OTHER'
+
+
+class MetricsMiddleware:
+    """
+    Собирает по каждому представлению и действию время ответа, число и время
+    SQL-запросов, время сериализации и размер ответа в гистограммы (/metrics)
+    и добавляет заголовок Server-Timing.
+    Сотрудник (is_staff) может добавить к GET-запросу ?profile=1 и получить
+    вместо ответа профиль cProfile этого запроса.
+    SQL считает обёртка record_query соединений (см. signals.py): под ASGI
+    синхронные представления ходят в базу из потока sync_to_async, куда
+    статистика запроса попадает через ContextVar.
+    """
+    sync_capable = True
+    async_capable = True
+    profile_param = 'profile'
+    profile_limit = 40  # Строк в отчёте профилировщика
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        stats = RequestStats()
+        token = current_stats.set(stats)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            current_stats.reset(token)
+        return self.record(request, response, stats, started)
+
+    async def __acall__(self, request):
+        stats = RequestStats()
+        token = current_stats.set(stats)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_stats.reset(token)
+        return self.record(request, response, stats, started)
+
+    def record(self, request, response, stats, started):
+        stats.wall = time.perf_counter() - started
+        stats.size = 0 if response.streaming else len(response.content)
+        # Без process_view (404 маршрутизации, ответ middleware) представление неизвестно
+        labels = request.__dict__.get('_metrics_labels') or view_labels(None, request.method)
+        registry.record(labels, response.status_code, stats)
+        response['Server-Timing'] = stats.server_timing()
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request._metrics_labels = view_labels(view_func, request.method)
+        if self.should_profile(request):
+            return self.profile(request, view_func, view_args, view_kwargs)
+        return None
+
+    def should_profile(self, request):
+        # Только безопасные запросы: ответ профилировщика обходит process_view
+        # следующих middleware, в том числе проверку CSRF
+        return (
+            request.GET.get(self.profile_param) == '1'
+            and request.method in ('GET', 'HEAD')
+            and getattr(request, 'user', None) is not None
+            and request.user.is_staff
+        )
+
+    def profile(self, request, view_func, view_args, view_kwargs):
+        # Профилировщик нужен редко и не загружается при старте воркера
+        import cProfile
+        import pstats
+
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            response = view_func(request, *view_args, **view_kwargs)
+            if hasattr(response, 'render'):
+                response.render()
+        finally:
+            profiler.disable()
+        output = io.StringIO()
+        output.write(f'{request.method} {request.get_full_path()} -> {response.status_code}\n\n')
+        sort = request.GET.get('sort', 'cumulative')
+        if sort not in ('cumulative', 'tottime', 'calls'):
+            sort = 'cumulative'
+        pstats.Stats(profiler, stream=output).strip_dirs().sort_stats(sort).print_stats(self.profile_limit)
+        return HttpResponse(output.getvalue(), content_type='text/plain; charset=utf-8')
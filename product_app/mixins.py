@@ -0,0 +1,625 @@
+import json
+from dataclasses import dataclass, field
+from functools import lru_cache
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db import models
+from django.db.models import Count, Max, Subquery
+from django.core.cache import cache
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_etags, quote_etag
+from rest_framework import serializers, status
+from rest_framework.decorators import action
+from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
+from rest_framework.validators import UniqueTogetherValidator
+
+from .cache import get_versions, get_written_at, make_response_key
+from .db import MAX_ID, atomic_with_retry
+from .db_routers import read_from_replica
+from .models import has_updated_at
+from .signals import bulk_changed
+
+
+@dataclass(frozen=True)
+class QueryPlan:
+    """
+    План загрузки связанных объектов: пути для select_related и prefetch_related,
+    а также тяжёлые колонки, которые сериализатор не читает (defer).
+    """
+    select: tuple = field(default_factory=tuple)
+    prefetch: tuple = field(default_factory=tuple)
+    defer: tuple = field(default_factory=tuple)
+
+    def apply(self, queryset):
+        if self.select:
+            queryset = queryset.select_related(*self.select)
+        if self.prefetch:
+            queryset = queryset.prefetch_related(*self.prefetch)
+        if self.defer:
+            queryset = queryset.defer(*self.defer)
+        return queryset
+
+
+def _walk_source(model, attrs, path, in_prefetch, select, prefetch):
+    """
+    Проходит по цепочке атрибутов source и раскладывает связи по select/prefetch.
+    Возвращает модель, путь и признак prefetch для последней найденной связи.
+    """
+    for attr in attrs:
+        try:
+            model_field = model._meta.get_field(attr)
+        except FieldDoesNotExist:
+            break
+        if not model_field.is_relation or model_field.related_model is None:
+            break
+        path = f'{path}__{attr}' if path else attr
+        # Связи «ко многим» и всё, что под ними, можно загрузить только через prefetch
+        if in_prefetch or model_field.many_to_many or model_field.one_to_many:
+            in_prefetch = True
+            prefetch.add(path)
+        else:
+            select.add(path)
+        model = model_field.related_model
+    return model, path, in_prefetch
+
+
+def _collect(serializer, model, path, in_prefetch, select, prefetch):
+    for serializer_field in serializer.fields.values():
+        if serializer_field.write_only or serializer_field.source == '*':
+            continue
+        attrs = serializer_field.source_attrs
+
+        if isinstance(serializer_field, serializers.ListSerializer):
+            child_model, child_path, child_prefetch = _walk_source(
+                model, attrs, path, in_prefetch, select, prefetch
+            )
+            if child_path != path:
+                _collect(serializer_field.child, child_model, child_path, child_prefetch, select, prefetch)
+        elif isinstance(serializer_field, serializers.BaseSerializer):
+            child_model, child_path, child_prefetch = _walk_source(
+                model, attrs, path, in_prefetch, select, prefetch
+            )
+            if child_path != path:
+                _collect(serializer_field, child_model, child_path, child_prefetch, select, prefetch)
+        elif isinstance(serializer_field, serializers.ManyRelatedField):
+            _walk_source(model, attrs, path, in_prefetch, select, prefetch)
+        elif isinstance(serializer_field, serializers.RelatedField):
+            # PrimaryKeyRelatedField читает <field>_id и не требует JOIN
+            if len(attrs) > 1 or not serializer_field.use_pk_only_optimization():
+                _walk_source(model, attrs, path, in_prefetch, select, prefetch)
+        elif len(attrs) > 1:
+            # Поля вида source='role.name' или 'member.get_full_name'
+            _walk_source(model, attrs[:-1], path, in_prefetch, select, prefetch)
+
+
+def build_query_plan(serializer):
+    """Строит QueryPlan по полям экземпляра сериализатора."""
+    select, prefetch = set(), set()
+    model = serializer.Meta.model
+    _collect(serializer, model, '', False, select, prefetch)
+    # Текстовые колонки, которые не попадут в ответ, не читаем из БД
+    used = {
+        serializer_field.source_attrs[0]
+        for serializer_field in serializer.fields.values()
+        if serializer_field.source != '*'
+    }
+    defer = {
+        model_field.name for model_field in model._meta.concrete_fields
+        if isinstance(model_field, models.TextField) and model_field.name not in used
+    }
+    return QueryPlan(select=tuple(sorted(select)), prefetch=tuple(sorted(prefetch)), defer=tuple(sorted(defer)))
+
+
+@lru_cache(maxsize=None)
+def get_query_plan(serializer_class):
+    """План загрузки для класса сериализатора (вычисляется один раз)."""
+    return build_query_plan(serializer_class())
+
+
+class QueryPlanMixin:
+    """
+    Автоматически применяет select_related/prefetch_related/defer в get_queryset,
+    чтобы вложенные поля сериализатора не порождали запросы на каждую строку.
+    Действия (@action) могут передать собственный план: @action(..., query_plan=QueryPlan(...)).
+    """
+    query_plan = None
+
+    def get_query_plan(self):
+        if self.query_plan is not None:
+            return self.query_plan
+        request = getattr(self, 'request', None)
+        params = request.query_params if request is not None else {}
+        if 'fields' in params or 'expand' in params:
+            # Состав полей задан запросом: план строится по урезанному сериализатору
+            return build_query_plan(self.get_serializer())
+        return get_query_plan(self.get_serializer_class())
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        return self.get_query_plan().apply(queryset)
+
+
+class NDJSONExportMixin:
+    """
+    Действие /export/ для выгрузки всей коллекции в формате NDJSON (одна строка JSON на объект).
+    Строки читаются из БД порциями через .iterator(chunk_size=...), связи «ко многим»
+    подгружаются prefetch-запросами на каждую порцию, а ответ отдаётся потоком,
+    поэтому расход памяти не зависит от размера таблицы.
+    """
+    export_chunk_size_query_param = 'chunk_size'
+
+    def get_export_chunk_size(self):
+        default = settings.REST_FRAMEWORK.get('EXPORT_CHUNK_SIZE', 1000)
+        try:
+            chunk_size = int(self.request.query_params.get(self.export_chunk_size_query_param, default))
+        except ValueError:
+            return default
+        return min(max(chunk_size, 1), default * 10)
+
+    def stream_rows(self, queryset, chunk_size):
+        serializer = self.get_serializer()
+        for obj in queryset.iterator(chunk_size=chunk_size):
+            yield json.dumps(serializer.to_representation(obj), cls=JSONEncoder, ensure_ascii=False) + '\n'
+
+    @action(detail=False, methods=['get'], url_path='export')
+    def export(self, request):
+        """
+        GET: Потоковая выгрузка коллекции в NDJSON с учётом фильтров списка.
+        Например: /api/products/export/?status=1&chunk_size=500
+        """
+        queryset = self.filter_queryset(self.get_queryset()).order_by('pk')
+        response = StreamingHttpResponse(
+            self.stream_rows(queryset, self.get_export_chunk_size()),
+            content_type='application/x-ndjson; charset=utf-8',
+        )
+        response['Content-Disposition'] = f'attachment; filename="{self.basename}s.ndjson"'
+        return response
+
+
+class CachedResponseMixin:
+    """
+    Кэширует данные ответов list/retrieve в кэше Django.
+    Ключ включает версии моделей из cache_models, которые увеличиваются сигналами
+    post_save/post_delete/m2m_changed, поэтому устаревшие ответы просто перестают
+    запрашиваться. ETag строится из того же ключа: если If-None-Match совпадает,
+    возвращается 304 без обращения к БД и сериализации.
+    """
+    cache_models = ()
+    cache_actions = ('list', 'retrieve')
+
+    def get_cache_models(self):
+        return self.cache_models or (self.queryset.model,)
+
+    def get_response_cache_key(self, request):
+        versions = get_versions(self.get_cache_models())
+        # Формат ответа выбирается и по заголовку Accept: JSON и HTML получают разные ETag
+        return make_response_key(
+            self.basename, self.action, request.get_full_path(), request.accepted_renderer.format, *versions
+        )
+
+    def get_response_cache_timeout(self):
+        # Реплика может отставать: прочитанное с неё живёт в кэше не дольше окна
+        # read-your-writes, иначе устаревший ответ закрепится под новой версией
+        if read_from_replica.get():
+            return min(settings.API_CACHE_TIMEOUT, settings.DB_REPLICA_STICKY_SECONDS)
+        return settings.API_CACHE_TIMEOUT
+
+    def cached_response(self, handler, request, *args, **kwargs):
+        key = self.get_response_cache_key(request)
+        etag = quote_etag(key.rsplit(':', 1)[-1])
+        if_none_match = parse_etags(request.headers.get('If-None-Match', ''))
+        if etag in if_none_match or '*' in if_none_match:
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+
+        data = cache.get(key)
+        if data is None:
+            response = handler(request, *args, **kwargs)
+            if response.status_code != status.HTTP_200_OK:
+                return response
+            data = response.data
+            cache.set(key, data, timeout=self.get_response_cache_timeout())
+        return Response(data, headers={'ETag': etag})
+
+    def list(self, request, *args, **kwargs):
+        if 'list' not in self.cache_actions:
+            return super().list(request, *args, **kwargs)
+        return self.cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        if 'retrieve' not in self.cache_actions:
+            return super().retrieve(request, *args, **kwargs)
+        return self.cached_response(super().retrieve, request, *args, **kwargs)
+
+
+class ConditionalGetMixin:
+    """
+    Условные GET-запросы для list/retrieve по полю updated_at.
+    ETag и Last-Modified вычисляются одним агрегирующим запросом MAX(updated_at)
+    и COUNT(*) по отфильтрованному queryset, без сериализации; при совпадении
+    If-None-Match или If-Modified-Since возвращается 304. Last-Modified списка
+    не меньше времени последней записи в таблицу (см. cache.mark_written).
+    conditional_models — модели, данные которых вложены в ответ: для моделей
+    с updated_at учитывается их MAX(updated_at) (по индексу), для остальных —
+    версия из кэша (см. cache.bump_version), которая попадает только в ETag.
+    Совместим с CachedResponseMixin:
+    ставится в базовых классах раньше него и заменяет его ETag своим.
+    """
+    conditional_models = ()
+
+    def get_conditional_validators(self, request, queryset):
+        """Возвращает (etag, last_modified) или None, если объект не найден."""
+        # MAX(updated_at) вложенных моделей считается скалярным подзапросом в том же запросе
+        related = [model for model in self.conditional_models if has_updated_at(model)]
+        versioned = [model for model in self.conditional_models if model not in related]
+        aggregates = {
+            f'related_{index}': Max(Subquery(model.objects.order_by('-updated_at').values('updated_at')[:1]))
+            for index, model in enumerate(related)
+        }
+        state = queryset.order_by().aggregate(
+            last_modified=Max('updated_at'), count=Count('pk'), **aggregates
+        )
+        if self.action == 'retrieve' and not state['count']:
+            return None
+        timestamps = [state.pop('last_modified')]
+        timestamps += [state[key] for key in aggregates]
+        timestamps = [value.timestamp() for value in timestamps if value is not None]
+        if self.action == 'list':
+            # Строка могла выйти из фильтра или быть удалена: MAX(updated_at) тогда
+            # уменьшится, а время последней записи в таблицу — нет
+            timestamps.append(get_written_at(queryset.model))
+        timestamps = [timestamp for timestamp in timestamps if timestamp is not None]
+        last_modified = int(max(timestamps)) if timestamps else None
+        key = make_response_key(
+            self.basename, self.action, request.get_full_path(), request.accepted_renderer.format,
+            state['count'], *timestamps, *get_versions(versioned),
+        )
+        return quote_etag(key.rsplit(':', 1)[-1]), last_modified
+
+    def conditional_response(self, handler, queryset, request, *args, **kwargs):
+        validators = self.get_conditional_validators(request, queryset)
+        if validators is None:
+            return handler(request, *args, **kwargs)
+        etag, last_modified = validators
+        headers = {'ETag': etag}
+        if last_modified is not None:
+            headers['Last-Modified'] = http_date(last_modified)
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is not None and response.status_code == status.HTTP_304_NOT_MODIFIED:
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        if response is not None:
+            return response  # 412 на If-Match/If-Unmodified-Since
+
+        response = handler(request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            for header, value in headers.items():
+                response[header] = value
+        return response
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        return self.conditional_response(super().list, queryset, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        try:
+            queryset = self.filter_queryset(self.get_queryset()).filter(
+                **{self.lookup_field: kwargs[lookup_url_kwarg]}
+            )
+        except (TypeError, ValueError, ValidationError):
+            return super().retrieve(request, *args, **kwargs)  # Некорректный id: 404 из get_object
+        return self.conditional_response(super().retrieve, queryset, request, *args, **kwargs)
+
+
+class RetryOnLockedMixin:
+    """
+    Выполняет запись create/update/destroy в транзакции и повторяет её
+    с экспоненциальной задержкой, если SQLite ответила database is locked
+    (см. db.atomic_with_retry). Для других СУБД это просто транзакция.
+    """
+
+    def perform_create(self, serializer):
+        atomic_with_retry(super().perform_create, serializer)
+
+    def perform_update(self, serializer):
+        atomic_with_retry(super().perform_update, serializer)
+
+    def perform_destroy(self, instance):
+        atomic_with_retry(super().perform_destroy, instance)
+
+
+def parse_pk(model, value):
+    """
+    id из тела запроса, приведённый к типу первичного ключа модели, или None,
+    если он некорректен или выходит за 1..MAX_ID (иначе pk__in упадёт с OverflowError).
+    """
+    if value is None or isinstance(value, (bool, dict, list)):
+        return None
+    try:
+        pk = model._meta.pk.to_python(value)
+    except ValidationError:
+        return None
+    if isinstance(pk, int) and not 1 <= pk <= MAX_ID:
+        return None
+    return pk
+
+
+class PreloadedObjects:
+    """
+    Подменяет queryset поля PrimaryKeyRelatedField объектами, заранее загруженными
+    in_bulk: get(pk=...) ищет в словаре и не обращается к базе.
+    """
+
+    def __init__(self, model, objects):
+        self.model = model
+        self.objects = objects
+
+    def get(self, pk):
+        key = parse_pk(self.model, pk)
+        if key is None:
+            raise ValueError(pk)  # Поле вернёт ошибку incorrect_type
+        try:
+            return self.objects[key]
+        except KeyError:
+            raise self.model.DoesNotExist from None
+
+
+class BulkMixin:
+    """
+    Действие /bulk/ для пакетных операций над списком объектов в одной транзакции:
+    POST — создание (bulk_create), PATCH — частичное обновление (bulk_update),
+    DELETE — удаление по списку id. Ошибки валидации возвращаются по каждому
+    элементу в том же порядке, что и в запросе; при ошибках ничего не записывается.
+    Если задан bulk_upsert_fields, POST работает как upsert по этим уникальным полям.
+    """
+    bulk_batch_size = 500
+    bulk_upsert_fields = None  # Например ('member', 'project') для unique_together
+    bulk_upsert_update_fields = None  # Поля, обновляемые при конфликте
+
+    @action(detail=False, methods=['post', 'patch', 'delete'], url_path='bulk')
+    def bulk(self, request):
+        """
+        POST: Создаёт объекты из списка. Например: [{"project": 1, "name": "Старт"}, ...]
+        PATCH: Обновляет объекты из списка, в каждом элементе обязателен id.
+        DELETE: Удаляет объекты по списку id. Например: [1, 2, 3]
+        """
+        items = request.data
+        if not isinstance(items, list):
+            return Response({'error': 'Ожидается список объектов'}, status=status.HTTP_400_BAD_REQUEST)
+
+        if request.method == 'POST':
+            return self.bulk_create(items)
+        if request.method == 'PATCH':
+            return self.bulk_update(items)
+        return self.bulk_destroy(items)
+
+    def get_bulk_serializer(self, *args, **kwargs):
+        serializer = self.get_serializer(*args, **kwargs)
+        if self.bulk_upsert_fields:
+            # Конфликты уникальности разрешаются upsert'ом, а не ошибкой валидации
+            serializer.validators = [
+                validator for validator in serializer.validators
+                if not isinstance(validator, UniqueTogetherValidator)
+            ]
+        return serializer
+
+    def get_bulk_upsert_update_fields(self, model):
+        fields = list(self.bulk_upsert_update_fields)
+        if has_updated_at(model):
+            fields.append('updated_at')  # При конфликте auto_now сам не обновится
+        return fields
+
+    def bulk_response(self, pks, response_status):
+        queryset = self.get_queryset().filter(pk__in=pks).order_by('pk')
+        serializer = self.get_serializer(queryset, many=True)
+        return Response(serializer.data, status=response_status)
+
+    def preload_related(self, serializers_, items):
+        """
+        Разрешает id связей всех элементов одним in_bulk на поле и подставляет
+        найденные объекты в поля сериализаторов: валидация пакета не делает
+        отдельный запрос на каждую ссылку каждого элемента.
+        """
+        serializer = next((serializer for serializer in serializers_ if serializer is not None), None)
+        if serializer is None:
+            return
+        relations = {}
+        for name, field in serializer.fields.items():
+            related = getattr(field, 'child_relation', field)
+            if not field.read_only and isinstance(related, serializers.PrimaryKeyRelatedField):
+                relations[name] = related.get_queryset()
+        for name, queryset in relations.items():
+            pks = set()
+            for item in items:
+                values = item.get(name) if isinstance(item, dict) else None
+                for value in values if isinstance(values, list) else [values]:
+                    pk = parse_pk(queryset.model, value)
+                    if pk is not None:
+                        pks.add(pk)
+            objects = PreloadedObjects(queryset.model, queryset.in_bulk(pks) if pks else {})
+            for serializer in serializers_:
+                if serializer is not None:
+                    field = serializer.fields[name]
+                    getattr(field, 'child_relation', field).queryset = objects
+
+    def bulk_create(self, items):
+        serializers_ = [self.get_bulk_serializer(data=item) for item in items]
+        self.preload_related(serializers_, items)
+        errors = [{} if serializer.is_valid() else serializer.errors for serializer in serializers_]
+        if any(errors):
+            return Response({'errors': errors}, status=status.HTTP_400_BAD_REQUEST)
+
+        model = self.get_queryset().model
+        objs = [model(**serializer.validated_data) for serializer in serializers_]
+        if self.bulk_upsert_fields:
+            # ON CONFLICT не обновляет одну строку дважды за запрос (PostgreSQL отклонит
+            # весь пакет): из повторов одной пары остаётся последний, как при upsert по очереди
+            attnames = [model._meta.get_field(name).attname for name in self.bulk_upsert_fields]
+            objs = list({tuple(getattr(obj, attname) for attname in attnames): obj for obj in objs}.values())
+        if not objs:
+            return Response([], status=status.HTTP_201_CREATED)
+        created, updated = atomic_with_retry(self.bulk_insert, model, objs)
+        for pks, is_created in ((created, True), (updated, False)):
+            if pks:
+                instances = [obj for obj in objs if obj.pk in pks]
+                bulk_changed.send(sender=model, pks=list(pks), instances=instances, created=is_created)
+        return self.bulk_response(created | updated, status.HTTP_201_CREATED)
+
+    def bulk_insert(self, model, objs):
+        """Записывает объекты и возвращает (id созданных, id обновлённых upsert'ом)."""
+        if not self.bulk_upsert_fields:
+            model.objects.bulk_create(objs, batch_size=self.bulk_batch_size)
+            return {obj.pk for obj in objs}, set()
+        # Уже существующие строки определяем до записи: после upsert их не отличить от новых
+        attnames = [model._meta.get_field(name).attname for name in self.bulk_upsert_fields]
+        existing = self.find_by_unique_fields(model, attnames, objs)
+        model.objects.bulk_create(
+            objs,
+            batch_size=self.bulk_batch_size,
+            update_conflicts=True,
+            unique_fields=self.bulk_upsert_fields,
+            update_fields=self.get_bulk_upsert_update_fields(model),
+        )
+        # При upsert id строк могут не вернуться, поэтому ищем их по уникальным полям
+        pks = self.find_by_unique_fields(model, attnames, objs)
+        for obj in objs:
+            obj.pk = pks[tuple(getattr(obj, attname) for attname in attnames)]
+        updated = set(existing.values())
+        return {obj.pk for obj in objs} - updated, updated
+
+    def find_by_unique_fields(self, model, attnames, objs):
+        """
+        Возвращает {значения уникальных полей: id} для строк, совпадающих с объектами.
+        Ищет пачками по bulk_batch_size: условие field__in по каждому полю выбирает
+        надмножество, точные пары отбираются уже в Python.
+        """
+        keys = list(dict.fromkeys(tuple(getattr(obj, attname) for attname in attnames) for obj in objs))
+        found = {}
+        for start in range(0, len(keys), self.bulk_batch_size):
+            batch = set(keys[start:start + self.bulk_batch_size])
+            lookup = {f'{attname}__in': {key[i] for key in batch} for i, attname in enumerate(attnames)}
+            for *key, pk in model.objects.filter(**lookup).values_list(*attnames, 'pk'):
+                if tuple(key) in batch:
+                    found[tuple(key)] = pk
+        return found
+
+    def bulk_update(self, items):
+        model = self.get_queryset().model
+        ids = [parse_pk(model, item.get('id')) if isinstance(item, dict) else None for item in items]
+        instances = model.objects.in_bulk([pk for pk in ids if pk is not None])
+
+        serializers_, errors = [], []
+        for item, pk in zip(items, ids):
+            if not isinstance(item, dict):
+                error = {'non_field_errors': ['Ожидается объект с полем id']}
+            elif pk is None:
+                error = {'id': ['Некорректный id']}
+            elif pk not in instances:
+                error = {'id': ['Объект не найден']}
+            else:
+                serializers_.append(self.get_bulk_serializer(instances[pk], data=item, partial=True))
+                errors.append(None)
+                continue
+            serializers_.append(None)
+            errors.append(error)
+        self.preload_related(serializers_, items)
+        errors = [
+            error if serializer is None else ({} if serializer.is_valid() else serializer.errors)
+            for serializer, error in zip(serializers_, errors)
+        ]
+        if any(errors):
+            return Response({'errors': errors}, status=status.HTTP_400_BAD_REQUEST)
+
+        fields = set()
+        for serializer in serializers_:
+            for name, value in serializer.validated_data.items():
+                setattr(serializer.instance, name, value)
+                fields.add(name)
+        objs = [serializer.instance for serializer in serializers_]
+        if fields and has_updated_at(model):
+            # bulk_update не вызывает pre_save, поэтому auto_now выставляем сами
+            now = timezone.now()
+            for obj in objs:
+                obj.updated_at = now
+            fields.add('updated_at')
+        if fields:
+            atomic_with_retry(model.objects.bulk_update, objs, sorted(fields), batch_size=self.bulk_batch_size)
+            bulk_changed.send(sender=model, pks=[obj.pk for obj in objs], instances=objs, created=False)
+        return self.bulk_response([obj.pk for obj in objs], status.HTTP_200_OK)
+
+    def bulk_destroy(self, items):
+        model = self.get_queryset().model
+        ids = [parse_pk(model, item.get('id') if isinstance(item, dict) else item) for item in items]
+        errors = [{} if pk is not None else {'id': ['Некорректный id']} for pk in ids]
+        if any(errors):
+            return Response({'errors': errors}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({'deleted': atomic_with_retry(self.bulk_delete, model, ids)})
+
+    def bulk_delete(self, model, ids):
+        deleted = 0
+        for start in range(0, len(ids), self.bulk_batch_size):
+            batch = ids[start:start + self.bulk_batch_size]
+            deleted += model.objects.filter(pk__in=batch).delete()[1].get(model._meta.label, 0)
+        return deleted
+
+
+class MembershipMixin:
+    """
+    Общая логика действий owners/curators/members над M2M-связью с пользователями.
+    Принимает список user_ids (или одиночный user_id), разрешает всех пользователей
+    одним запросом in_bulk и применяет изменение одной записью в M2M:
+    POST — добавить, DELETE — удалить, PUT — заменить весь список.
+    """
+
+    user_ids_field = serializers.ListField(child=serializers.IntegerField(min_value=1, max_value=MAX_ID))
+
+    def get_user_ids(self, request):
+        data = request.data
+        if hasattr(data, 'getlist'):
+            user_ids = data.getlist('user_ids') or data.getlist('user_id')
+        elif isinstance(data, dict):
+            user_ids = data.get('user_ids')
+            if user_ids is None and data.get('user_id') is not None:
+                user_ids = [data.get('user_id')]
+        else:
+            raise serializers.ValidationError({'error': 'Expected an object with user_ids'})
+        if user_ids is None:
+            return None
+        if not isinstance(user_ids, list):
+            raise serializers.ValidationError({'user_ids': ['Expected a list of user ids']})
+        try:
+            user_ids = self.user_ids_field.run_validation(user_ids)
+        except serializers.ValidationError as exc:
+            raise serializers.ValidationError({'user_ids': exc.detail})
+        return list(dict.fromkeys(user_ids))
+
+    def membership_response(self, request, relation_name, role):
+        obj = self.get_object()
+        relation = getattr(obj, relation_name)
+
+        if request.method == 'GET':
+            return Response(list(relation.order_by('id').values('id', 'username')))
+
+        user_ids = self.get_user_ids(request)
+        if user_ids is None or (not user_ids and request.method != 'PUT'):
+            return Response({'error': 'user_ids is required'}, status=status.HTTP_400_BAD_REQUEST)
+
+        users = get_user_model().objects.in_bulk(user_ids)
+        missing = [user_id for user_id in user_ids if user_id not in users]
+        if missing:
+            return Response({'error': 'Users not found', 'user_ids': missing}, status=status.HTTP_404_NOT_FOUND)
+
+        if request.method == 'POST':
+            atomic_with_retry(relation.add, *users.values())
+            message = f'{len(users)} user(s) added as {role}.'
+        elif request.method == 'DELETE':
+            atomic_with_retry(relation.remove, *users.values())
+            message = f'{len(users)} user(s) removed from {role}s.'
+        else:
+            atomic_with_retry(relation.set, users.values())
+            message = f'{role.capitalize()}s replaced with {len(users)} user(s).'
+        return Response({'message': message, 'user_ids': user_ids})
@@ -2,23 +2,25 @@ import os
 import mimetypes
 from django.db import models
 from django.conf import settings
-from datetime import datetime
-from unidecode import unidecode
-from django.core.exceptions import ValidationError
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from .storage import content_hash, logo_storage
 
 
 def upload_to(instance, filename):
     # Получаем расширение файла
-    ext = filename.split('.')[-1]
+    ext = filename.split('.')[-1].lower()
 
-    # Преобразуем имя продукта в ASCII, чтобы избежать русских букв
-    safe_name = unidecode(instance.name)
-
-    # Генерируем имя файла
-    filename = f"{safe_name}_{datetime.now().strftime('%Y%m%d%H%M%S')}.{ext}"
+    # Имя файла — хэш содержимого: одинаковые логотипы продуктов, проектов
+    # и партнёров хранятся в одном экземпляре
+    digest = content_hash(instance.logo.file)
 
     # Возвращаем путь, где будет сохранен файл
-    return os.path.join('logos', filename)
+    return os.path.join('logos', digest[:2], f'{digest}.{ext}')
+
+# MIME-тип по расширению -> формат, который Pillow должен распознать в содержимом
+LOGO_IMAGE_FORMATS = {'image/jpeg': 'JPEG', 'image/png': 'PNG'}
+LOGO_MAX_PIXELS = 25_000_000  # Больше не нужно логотипу и опасно для памяти при создании миниатюр
+
 
 def validate_logo_file(value):
     # Проверяем MIME-тип
@@ -26,6 +28,30 @@ def validate_logo_file(value):
     mime_type, _ = mimetypes.guess_type(value.name)
     if mime_type not in valid_mime_types:
         raise ValidationError(f"Неподдерживаемый тип файла. Допустимы только изображения.")
+    # Уже сохранённый файл проверен при загрузке
+    if getattr(value, '_committed', False):
+        return
+    # Расширение ничего не гарантирует: до создания вариантов проверяем само содержимое
+    try:
+        if mime_type == 'image/svg+xml':
+            if b'<svg' not in value.read(4096).lower():
+                raise ValidationError("Файл не является изображением SVG.")
+            return
+        from PIL import Image  # Pillow нужен только при загрузке логотипа, а не при старте
+
+        try:
+            with Image.open(value) as image:
+                image_format, pixels = image.format, image.width * image.height
+                image.verify()
+        except (OSError, SyntaxError, ValueError, Image.DecompressionBombError):
+            raise ValidationError("Файл повреждён или не является изображением.")
+    finally:
+        value.seek(0)
+    if image_format != LOGO_IMAGE_FORMATS[mime_type]:
+        raise ValidationError("Содержимое файла не соответствует его расширению.")
+    if pixels > LOGO_MAX_PIXELS:
+        raise ValidationError("Слишком большое разрешение изображения.")
+
 
 def validate_logo_size(value):
     # Устанавливаем максимальный размер файла в байтах
@@ -35,6 +61,36 @@ def validate_logo_size(value):
         raise ValidationError(f"Размер файла превышает {max_size_mb} МБ. Загрузите файл меньшего размера.")
 
 
+def updated_at_field():
+    """Отметка изменения строки — одинаковая у всех моделей, которые отдаются API."""
+    return models.DateTimeField(
+        auto_now=True,
+        db_index=True,
+        verbose_name='Изменено',
+        help_text='Обновляется при изменении полей и связей; основа ETag/Last-Modified в API'
+    )
+
+
+def logo_variants_field():
+    """Готовые варианты логотипа (см. logos.py) рядом с полем logo."""
+    return models.JSONField(
+        default=dict,
+        blank=True,
+        editable=False,
+        verbose_name='Варианты логотипа',
+        help_text='Миниатюры и WebP-версии, создаются фоновым обработчиком'
+    )
+
+
+def has_updated_at(model):
+    # Модели с отметкой изменения поддерживают условные GET-запросы в API
+    try:
+        model._meta.get_field('updated_at')
+    except FieldDoesNotExist:
+        return False
+    return True
+
+
 class Sphere(models.Model):
     name = models.CharField(max_length=40, unique=True, verbose_name='Название сферы')
     description = models.TextField(blank=True, null=True, verbose_name='Описание сферы')
@@ -51,13 +107,16 @@ class Partner(models.Model):
     name = models.CharField(max_length=255, verbose_name='Название')
     logo = models.FileField(
         upload_to=upload_to,
+        storage=logo_storage,
         validators=[validate_logo_file, validate_logo_size],
         blank=True,
         null=True,
         verbose_name='Логотип',
         help_text='Загрузите изображение в формате JPEG или PNG размером не более 2 МБ'
     )
+    logo_variants = logo_variants_field()
     url = models.URLField(blank=True, null=True)
+    updated_at = updated_at_field()
 
     def __str__(self):
         return self.name
@@ -65,6 +124,9 @@ class Partner(models.Model):
     class Meta:
         verbose_name = 'Партнёр'
         verbose_name_plural = 'Партнёры'
+        indexes = [
+            models.Index(fields=['name']),  # Поиск и сортировка по названию
+        ]
 
 
 class ProductStatus(models.Model):
@@ -138,12 +200,15 @@ class Product(models.Model):
     )
     logo = models.FileField(
         upload_to=upload_to,
+        storage=logo_storage,
         validators=[validate_logo_file, validate_logo_size],
         blank=True,
         null=True,
         verbose_name='Логотип',
         help_text = 'Загрузите изображение в формате JPEG или PNG размером не более 2 МБ'
     )
+    logo_variants = logo_variants_field()
+    updated_at = updated_at_field()
 
     def get_projects(self):
         """Возвращает список связанных проектов"""
@@ -155,6 +220,11 @@ class Product(models.Model):
     class Meta:
         verbose_name = 'Продукт'
         verbose_name_plural = 'Продукты'
+        indexes = [
+            models.Index(fields=['status', 'created_at']),  # ?status= с диапазоном дат запуска
+            models.Index(fields=['created_at']),  # Фильтр по дате в админке
+            models.Index(fields=['name']),
+        ]
 
 
 class ProjectStatus(models.Model):
@@ -199,6 +269,7 @@ class ProjectRole(models.Model):
         related_name='project_roles',
         verbose_name='Проект'
     )
+    updated_at = updated_at_field()
 
     class Meta:
         verbose_name = 'Роль участника в проекте'
@@ -244,12 +315,15 @@ class Project(models.Model):
     )
     logo = models.FileField(
         upload_to=upload_to,
+        storage=logo_storage,
         validators=[validate_logo_file, validate_logo_size],
         blank=True,
         null=True,
         verbose_name='Логотип',
         help_text='Загрузите изображение в формате JPEG или PNG размером не более 2 МБ'
     )
+    logo_variants = logo_variants_field()
+    updated_at = updated_at_field()
 
     def __str__(self):
         return self.name
@@ -257,6 +331,13 @@ class Project(models.Model):
     class Meta:
         verbose_name = 'Проект'
         verbose_name_plural = 'Проекты'
+        indexes = [
+            models.Index(fields=['product', 'status']),  # ?product_id=&status=
+            models.Index(fields=['status', 'start_date']),  # ?status= с диапазоном дат
+            models.Index(fields=['start_date']),
+            models.Index(fields=['end_date']),
+            models.Index(fields=['name']),
+        ]
 
 
 class ProjectStage(models.Model):
@@ -269,6 +350,7 @@ class ProjectStage(models.Model):
     name = models.CharField(max_length=255, verbose_name='Название этапа')
     start_date = models.DateField(verbose_name='Дата начала этапа', blank=True, null=True)
     end_date = models.DateField(verbose_name='Дата окончания этапа', blank=True, null=True)
+    updated_at = updated_at_field()
 
     def __str__(self):
         return f'{self.name} ({self.project.name})'
@@ -276,5 +358,154 @@ class ProjectStage(models.Model):
     class Meta:
         verbose_name = 'Этап проекта'
         verbose_name_plural = 'Этапы проектов'
+        indexes = [
+            models.Index(fields=['project', 'start_date']),  # ?project= с этапами по порядку
+            models.Index(fields=['end_date']),  # /api/stats/deadlines/
+            models.Index(fields=['start_date', 'end_date']),  # Окно /api/timeline/: start <= to и end >= from
+        ]
+
+
+class SearchDocument(models.Model):
+    """
+    Документ полнотекстового поиска: одна строка на продукт, проект, партнёра или сферу.
+    Поддерживается сигналами, в SQLite индексируется FTS5-таблицей, в PostgreSQL —
+    хранимым столбцом tsvector с GIN-индексом (см. search.py).
+    """
+    kind = models.CharField(max_length=20, verbose_name='Тип объекта')
+    object_id = models.PositiveBigIntegerField(verbose_name='ID объекта')
+    title = models.CharField(max_length=255, verbose_name='Заголовок')
+    body = models.TextField(blank=True, verbose_name='Текст')
+
+    def __str__(self):
+        return f'{self.kind}: {self.title}'
+
+    class Meta:
+        verbose_name = 'Поисковый документ'
+        verbose_name_plural = 'Поисковые документы'
+        unique_together = ('kind', 'object_id')
+
+
+class ProductStats(models.Model):
+    """Материализованная сводка по продукту, обновляется сигналами (см. stats.py)."""
+    product = models.OneToOneField(Product, on_delete=models.CASCADE, related_name='stats', verbose_name='Продукт')
+    project_count = models.PositiveIntegerField(default=0, verbose_name='Проектов')
+    intern_count = models.PositiveIntegerField(default=0, verbose_name='Стажёров')
+    projects_by_status = models.JSONField(default=dict, verbose_name='Проекты по статусам')
+    refreshed_at = models.DateTimeField(auto_now=True, verbose_name='Обновлено')
+
+    def __str__(self):
+        return f'Сводка: {self.product}'
+
+    class Meta:
+        verbose_name = 'Сводка по продукту'
+        verbose_name_plural = 'Сводки по продуктам'
 
 
+class ProjectStats(models.Model):
+    """Материализованная сводка по проекту, обновляется сигналами (см. stats.py)."""
+    project = models.OneToOneField(Project, on_delete=models.CASCADE, related_name='stats', verbose_name='Проект')
+    intern_count = models.PositiveIntegerField(default=0, verbose_name='Стажёров')
+    role_count = models.PositiveIntegerField(default=0, verbose_name='Ролей участников')
+    stage_count = models.PositiveIntegerField(default=0, verbose_name='Этапов')
+    last_stage_end = models.DateField(blank=True, null=True, verbose_name='Окончание последнего этапа')
+    refreshed_at = models.DateTimeField(auto_now=True, verbose_name='Обновлено')
+
+    def __str__(self):
+        return f'Сводка: {self.project}'
+
+    class Meta:
+        verbose_name = 'Сводка по проекту'
+        verbose_name_plural = 'Сводки по проектам'
+
+
+class ProductCard(models.Model):
+    """
+    Карточка продукта для каталога (/api/product-cards/): названия справочников
+    и связей хранятся прямо в строке, поэтому список читается из одной таблицы
+    без JOIN. Обновляется сигналами (см. cards.py).
+    """
+    product = models.OneToOneField(Product, on_delete=models.CASCADE, related_name='card', verbose_name='Продукт')
+    name = models.CharField(max_length=255, verbose_name='Название')
+    logo = models.FileField(storage=logo_storage, blank=True, null=True, editable=False, verbose_name='Логотип')
+    logo_variants = models.JSONField(default=dict, verbose_name='Варианты логотипа')
+    status_name = models.CharField(max_length=100, blank=True, verbose_name='Статус')
+    sales_model_name = models.CharField(max_length=100, blank=True, verbose_name='Модель продаж')
+    spheres = models.JSONField(default=list, verbose_name='Сферы', help_text='Названия сфер')
+    partners = models.JSONField(default=list, verbose_name='Партнеры', help_text='Названия партнеров')
+    project_count = models.PositiveIntegerField(default=0, verbose_name='Проектов')
+    updated_at = models.DateTimeField(auto_now=True, db_index=True, verbose_name='Обновлено')
+
+    def __str__(self):
+        return f'Карточка: {self.name}'
+
+    class Meta:
+        verbose_name = 'Карточка продукта'
+        verbose_name_plural = 'Карточки продуктов'
+
+
+class Membership(models.Model):
+    """
+    Единый индекс участия пользователя: заказчик и куратор продукта, куратор
+    и стажёр проекта, роль в проекте. Портфель пользователя (/api/me/portfolio/)
+    читается одним запросом по индексу user. Обновляется сигналами (см. portfolio.py).
+    """
+    KINDS = [
+        ('product_owner', 'Заказчик продукта'),
+        ('product_curator', 'Куратор продукта'),
+        ('project_curator', 'Куратор проекта'),
+        ('project_member', 'Стажёр проекта'),
+        ('project_role', 'Роль в проекте'),
+    ]
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='memberships', verbose_name='Пользователь'
+    )
+    kind = models.CharField(max_length=20, choices=KINDS, verbose_name='Участие')
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+', verbose_name='Продукт')
+    project = models.ForeignKey(
+        Project, on_delete=models.CASCADE, null=True, blank=True, related_name='+', verbose_name='Проект'
+    )
+    project_role = models.ForeignKey(
+        ProjectRole, on_delete=models.CASCADE, null=True, blank=True, related_name='+',
+        verbose_name='Роль участника'
+    )
+    role = models.ForeignKey(Role, on_delete=models.CASCADE, null=True, blank=True, related_name='+', verbose_name='Роль')
+
+    def __str__(self):
+        return f'{self.user}: {self.get_kind_display()}'
+
+    class Meta:
+        verbose_name = 'Участие пользователя'
+        verbose_name_plural = 'Участие пользователей'
+        indexes = [
+            models.Index(fields=['user', 'product', 'project']),  # Портфель пользователя по порядку
+            models.Index(fields=['kind', 'project', 'user']),  # Удаление при изменении связей проекта
+            models.Index(fields=['kind', 'product', 'user']),
+        ]
+
+
+class ChangeLog(models.Model):
+    """
+    Журнал изменений для инкрементальной синхронизации (/api/changes/).
+    Заполняется сигналами (см. changes.py); id служит монотонным курсором.
+    """
+    ACTIONS = [
+        ('create', 'Создание'),
+        ('update', 'Изменение'),
+        ('delete', 'Удаление'),
+        ('m2m', 'Изменение связей'),
+    ]
+    model = models.CharField(max_length=50, verbose_name='Модель')
+    object_id = models.PositiveBigIntegerField(verbose_name='ID объекта')
+    action = models.CharField(max_length=10, choices=ACTIONS, verbose_name='Действие')
+    field = models.CharField(max_length=50, blank=True, verbose_name='Связь', help_text='Для изменений M2M')
+    changed_at = models.DateTimeField(auto_now_add=True, verbose_name='Время изменения')
+
+    def __str__(self):
+        return f'{self.model} #{self.object_id}: {self.action}'
+
+    class Meta:
+        verbose_name = 'Запись журнала изменений'
+        verbose_name_plural = 'Журнал изменений'
+        indexes = [
+            models.Index(fields=['model', 'id']),  # /api/changes/?model=product&since=
+        ]
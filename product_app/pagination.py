@@ -0,0 +1,24 @@
+from django.conf import settings
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+
+
+class KeysetPagination(CursorPagination):
+    """
+    Курсорная (keyset) пагинация по первичному ключу.
+    Страница выбирается условием WHERE id > <курсор> по индексу, поэтому
+    глубокие страницы стоят столько же, сколько первая, в отличие от OFFSET.
+    Размер страницы задаётся параметром ?page_size= и ограничен MAX_PAGE_SIZE.
+    """
+    ordering = 'id'
+    page_size_query_param = 'page_size'
+
+    @property
+    def max_page_size(self):
+        return settings.REST_FRAMEWORK.get('MAX_PAGE_SIZE', 100)
+
+
+class SearchPagination(PageNumberPagination):
+    """Постраничная выдача ранжированных результатов поиска (LIMIT/OFFSET внутри запроса)."""
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
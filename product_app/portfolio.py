@@ -0,0 +1,106 @@
+from django.db.models import OuterRef, Subquery
+
+from .db import insert_rows
+from .models import Membership, Product, Project, ProjectRole
+
+# Промежуточная таблица M2M -> (вид участия, модель владельца поля)
+MEMBERSHIP_RELATIONS = {
+    Product.owners.through: ('product_owner', Product),
+    Product.curators.through: ('product_curator', Product),
+    Project.curators.through: ('project_curator', Project),
+    Project.members.through: ('project_member', Project),
+}
+
+BATCH_SIZE = 1000
+
+
+def _product_ids(project_ids):
+    return dict(Project.objects.filter(pk__in=project_ids).values_list('pk', 'product_id'))
+
+
+def add_memberships(through, pairs):
+    """Добавляет участие для пар (id продукта или проекта, id пользователя)."""
+    kind, model = MEMBERSHIP_RELATIONS[through]
+    if model is Product:
+        fields = ['user_id', 'kind', 'product_id']
+        rows = [(user_id, kind, pk) for pk, user_id in pairs]
+    else:
+        products = _product_ids({pk for pk, _ in pairs})
+        fields = ['user_id', 'kind', 'product_id', 'project_id']
+        rows = [(user_id, kind, products[pk], pk) for pk, user_id in pairs if pk in products]
+    insert_rows(Membership, fields, rows, batch_size=BATCH_SIZE)
+
+
+def remove_memberships(through, object_ids=None, user_ids=None):
+    """Удаляет участие по объектам и/или пользователям; None означает «все»."""
+    kind, model = MEMBERSHIP_RELATIONS[through]
+    memberships = Membership.objects.filter(kind=kind)
+    if object_ids is not None:
+        memberships = memberships.filter(**{f'{model._meta.model_name}_id__in': object_ids})
+    if user_ids is not None:
+        memberships = memberships.filter(user_id__in=user_ids)
+    memberships.delete()
+
+
+def sync_role_memberships(project_role_ids):
+    """Пересобирает участие по ролям ProjectRole после их создания или изменения."""
+    project_role_ids = set(project_role_ids) - {None}
+    if not project_role_ids:
+        return
+    Membership.objects.filter(project_role_id__in=project_role_ids).delete()
+    Membership.objects.bulk_create([
+        Membership(
+            user_id=user_id, kind='project_role', product_id=product_id, project_id=project_id,
+            project_role_id=pk, role_id=role_id,
+        )
+        for pk, user_id, project_id, product_id, role_id in ProjectRole.objects.filter(
+            pk__in=project_role_ids,
+        ).values_list('pk', 'member_id', 'project_id', 'project__product_id', 'role_id')
+    ], batch_size=BATCH_SIZE)
+
+
+def move_project_memberships(project_ids):
+    """Переносит участие в проектах вслед за сменой продукта проекта одним UPDATE."""
+    Membership.objects.filter(project_id__in=project_ids).update(
+        product_id=Subquery(Project.objects.filter(pk=OuterRef('project_id')).values('product_id'))
+    )
+
+
+def rebuild_memberships():
+    """Полная пересборка индекса из связей M2M и ролей."""
+    # Одним DELETE: обычный delete() загружает строки ради сигналов, а индекс ничьи сигналы не ждут
+    Membership.objects.all()._raw_delete(Membership.objects.db)
+    for through, (kind, model) in MEMBERSHIP_RELATIONS.items():
+        pairs = list(through.objects.order_by('pk').values_list(f'{model._meta.model_name}_id', 'user_id'))
+        for start in range(0, len(pairs), BATCH_SIZE):
+            add_memberships(through, pairs[start:start + BATCH_SIZE])
+    role_ids = list(ProjectRole.objects.order_by('pk').values_list('pk', flat=True))
+    for start in range(0, len(role_ids), BATCH_SIZE):
+        sync_role_memberships(role_ids[start:start + BATCH_SIZE])
+
+
+def user_portfolio(user_id):
+    """
+    Продукты и проекты пользователя с его ролями одним запросом по индексу
+    (user, product, project). Продукты, которых пользователь касается только
+    через проекты, попадают в список с пустыми ролями.
+    """
+    memberships = (
+        Membership.objects.filter(user_id=user_id)
+        .order_by('product_id', 'project_id', 'kind')
+        .values_list('kind', 'product_id', 'product__name', 'project_id', 'project__name', 'role__name')
+    )
+    products, projects = {}, {}
+    for kind, product_id, product_name, project_id, project_name, role_name in memberships:
+        product = products.setdefault(product_id, {'id': product_id, 'name': product_name, 'roles': []})
+        if project_id is None:
+            product['roles'].append(kind.split('_', 1)[1])
+            continue
+        project = projects.setdefault(project_id, {
+            'id': project_id, 'name': project_name, 'product': product_id, 'roles': [], 'project_role': None,
+        })
+        if kind == 'project_role':
+            project['project_role'] = role_name
+        else:
+            project['roles'].append(kind.split('_', 1)[1])
+    return {'products': list(products.values()), 'projects': list(projects.values())}
@@ -0,0 +1,112 @@
+import hashlib
+import json
+import threading
+from pathlib import Path
+
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import quote_etag
+from django.utils.module_loading import import_string
+from django.views import View
+
+# Формат (?format=) -> тип содержимого, как у SpectacularAPIView
+SCHEMA_FORMATS = {
+    'yaml': 'application/vnd.oai.openapi; charset=utf-8',
+    'json': 'application/vnd.oai.openapi+json; charset=utf-8',
+}
+
+_schemas = {}  # формат -> (содержимое, ETag), на время жизни процесса
+_lock = threading.RLock()
+
+
+def generate_schema():
+    """Строит схему OpenAPI обходом всех вьюсетов и сериализаторов (сотни миллисекунд)."""
+    # Генератор drf_spectacular загружается только при сборке схемы
+    from drf_spectacular.generators import SchemaGenerator
+
+    return SchemaGenerator().get_schema(request=None, public=True)
+
+
+def render_schema(schema, schema_format='json'):
+    from drf_spectacular.renderers import OpenApiJsonRenderer, OpenApiYamlRenderer
+
+    renderer = OpenApiYamlRenderer() if schema_format == 'yaml' else OpenApiJsonRenderer()
+    return renderer.render(schema, renderer_context={})
+
+
+def schema_etag(content):
+    """Сильный ETag по содержимому: версия артефакта меняется только вместе со схемой."""
+    return quote_etag(hashlib.sha256(content).hexdigest()[:32])
+
+
+def write_schema(path=None):
+    """Строит схему, сохраняет её в JSON-файл (по умолчанию OPENAPI_SCHEMA_FILE) и возвращает содержимое."""
+    content = render_schema(generate_schema())
+    path = Path(path or settings.OPENAPI_SCHEMA_FILE)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(content)
+    reset_schema_cache()
+    return content
+
+
+def reset_schema_cache():
+    with _lock:
+        _schemas.clear()
+
+
+def get_schema(schema_format='json'):
+    """
+    Возвращает (содержимое, ETag) схемы. При первом обращении процесс читает
+    готовый артефакт OPENAPI_SCHEMA_FILE, а если он не задан или не собран —
+    строит схему сам; дальше ответ отдаётся из памяти.
+    """
+    if schema_format not in _schemas:
+        with _lock:
+            if schema_format not in _schemas:
+                if schema_format == 'json':
+                    path = Path(settings.OPENAPI_SCHEMA_FILE) if settings.OPENAPI_SCHEMA_FILE else None
+                    content = path.read_bytes() if path and path.is_file() else render_schema(generate_schema())
+                else:
+                    content = render_schema(json.loads(get_schema('json')[0]), schema_format)
+                _schemas[schema_format] = content, schema_etag(content)
+    return _schemas[schema_format]
+
+
+class SchemaView(View):
+    """
+    GET: схема OpenAPI из собранного артефакта (см. manage.py build_openapi_schema)
+    в YAML или JSON (?format=json или Accept: application/json). Повторный запрос
+    с If-None-Match получает 304.
+    """
+
+    def get(self, request):
+        accepts_json = 'json' in request.headers.get('Accept', '')
+        schema_format = request.GET.get('format') or ('json' if accepts_json else 'yaml')
+        if schema_format not in SCHEMA_FORMATS:
+            return HttpResponse(status=404)
+        content, etag = get_schema(schema_format)
+        response = get_conditional_response(request, etag=etag) or HttpResponse(
+            content, content_type=SCHEMA_FORMATS[schema_format]
+        )
+        response.headers['ETag'] = etag
+        # Клиент каждый раз сверяет ETag, поэтому после деплоя сразу получает новую схему
+        patch_cache_control(response, public=True, no_cache=True)
+        patch_vary_headers(response, ['Accept'])
+        return response
+
+
+def lazy_view(view_path, **initkwargs):
+    """
+    Представление, класс которого импортируется при первом запросе, а не при
+    загрузке URLconf: страницы документации drf_spectacular не замедляют старт воркера.
+    """
+    view = None
+
+    def dispatch(request, *args, **kwargs):
+        nonlocal view
+        if view is None:
+            view = import_string(view_path).as_view(**initkwargs)
+        return view(request, *args, **kwargs)
+
+    return dispatch
@@ -0,0 +1,233 @@
+import re
+
+from django.db import connection
+from unidecode import unidecode
+
+from .models import Partner, Product, Project, SearchDocument, Sphere
+
+# Модель -> (тип документа, поле заголовка, поля текста)
+SEARCH_SOURCES = {
+    Product: ('product', 'name', ('description',)),
+    Project: ('project', 'name', ('description', 'principles')),
+    Partner: ('partner', 'name', ()),
+    Sphere: ('sphere', 'name', ()),
+}
+
+FTS_TABLE = 'product_app_search_fts'
+DOCUMENT_TABLE = SearchDocument._meta.db_table
+
+# Внешняя FTS5-таблица над SearchDocument, синхронизируемая триггерами
+SQLITE_SCHEMA = [
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        title, body, content='{DOCUMENT_TABLE}', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON {DOCUMENT_TABLE} BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, title, body) VALUES (new.id, new.title, new.body);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON {DOCUMENT_TABLE} BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, body) VALUES ('delete', old.id, old.title, old.body);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE ON {DOCUMENT_TABLE} BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, body) VALUES ('delete', old.id, old.title, old.body);
+        INSERT INTO {FTS_TABLE}(rowid, title, body) VALUES (new.id, new.title, new.body);
+    END
+    """,
+]
+
+
+# Хранимый tsvector с весами (заголовок — A, текст — B) и GIN-индекс по нему.
+# Генерируемый столбец PostgreSQL пересчитывает сам при каждой записи документа,
+# поэтому index_object/index_objects и массовые bulk_create его не заполняют
+POSTGRESQL_SCHEMA = [
+    f"""
+    ALTER TABLE {DOCUMENT_TABLE} ADD COLUMN IF NOT EXISTS document tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('simple', title), 'A') || setweight(to_tsvector('simple', body), 'B')
+    ) STORED
+    """,
+    f"CREATE INDEX IF NOT EXISTS {DOCUMENT_TABLE}_document_gin ON {DOCUMENT_TABLE} USING gin (document)",
+]
+
+SEARCH_SCHEMAS = {'sqlite': SQLITE_SCHEMA, 'postgresql': POSTGRESQL_SCHEMA}
+
+
+def ensure_search_schema(using_connection=connection):
+    """Создаёт FTS5-таблицу с триггерами (SQLite) или столбец tsvector с GIN-индексом (PostgreSQL)."""
+    statements = SEARCH_SCHEMAS.get(using_connection.vendor, [])
+    with using_connection.cursor() as cursor:
+        for statement in statements:
+            cursor.execute(statement)
+
+
+def transliterate(text):
+    """Добавляет к тексту латинскую транслитерацию, чтобы запрос 'produkt' находил 'продукт'."""
+    ascii_text = unidecode(text)
+    return text if ascii_text == text else f'{text} {ascii_text}'
+
+
+def build_document(instance):
+    kind, title_field, body_fields = SEARCH_SOURCES[type(instance)]
+    title = getattr(instance, title_field) or ''
+    body = ' '.join(filter(None, [title] + [getattr(instance, name) for name in body_fields]))
+    return kind, title, transliterate(body)
+
+
+def index_object(instance):
+    kind, title, body = build_document(instance)
+    SearchDocument.objects.update_or_create(
+        kind=kind, object_id=instance.pk, defaults={'title': title, 'body': body}
+    )
+
+
+def index_objects(instances):
+    """Индексирует пачку объектов одной модели: удаление старых документов и один INSERT."""
+    instances = [instance for instance in instances if instance.pk is not None]
+    if not instances:
+        return
+    kind = SEARCH_SOURCES[type(instances[0])][0]
+    SearchDocument.objects.filter(kind=kind, object_id__in=[instance.pk for instance in instances]).delete()
+    documents = []
+    for instance in instances:
+        _, title, body = build_document(instance)
+        documents.append(SearchDocument(kind=kind, object_id=instance.pk, title=title, body=body))
+    SearchDocument.objects.bulk_create(documents)
+
+
+def remove_object(instance):
+    kind = SEARCH_SOURCES[type(instance)][0]
+    SearchDocument.objects.filter(kind=kind, object_id=instance.pk).delete()
+
+
+def rebuild_index(batch_size=1000):
+    """Полностью перестраивает поисковый индекс по текущим данным."""
+    SearchDocument.objects.all().delete()
+    for model, (kind, title_field, body_fields) in SEARCH_SOURCES.items():
+        queryset = model.objects.only('pk', title_field, *body_fields).order_by('pk')
+        documents = []
+        for instance in queryset.iterator(chunk_size=batch_size):
+            _, title, body = build_document(instance)
+            documents.append(SearchDocument(kind=kind, object_id=instance.pk, title=title, body=body))
+            if len(documents) >= batch_size:
+                SearchDocument.objects.bulk_create(documents)
+                documents = []
+        SearchDocument.objects.bulk_create(documents)
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+
+
+def query_terms(query):
+    """Разбивает запрос на слова; для каждого слова — сам текст и его транслитерация."""
+    terms = []
+    for word in re.findall(r'\w+', query.lower()):
+        variants = dict.fromkeys([word, re.sub(r'\W', '', unidecode(word).lower())])
+        terms.append([variant for variant in variants if variant])
+    return terms
+
+
+class SearchResults:
+    """
+    Ленивая выборка результатов поиска с поддержкой count() и срезов,
+    чтобы стандартная пагинация DRF выполняла LIMIT/OFFSET в самом запросе.
+    """
+
+    def __init__(self, query):
+        self.terms = query_terms(query)
+        self._count = None
+
+    def count(self):
+        if self._count is None:
+            self._count = self._execute(count=True) if self.terms else 0
+        return self._count
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, item):
+        if not isinstance(item, slice):
+            raise TypeError('SearchResults поддерживает только срезы')
+        if not self.terms:
+            return []
+        start = item.start or 0
+        return self._execute(limit=item.stop - start, offset=start)
+
+    def _execute(self, count=False, limit=None, offset=0):
+        if connection.vendor == 'sqlite':
+            return self._execute_sqlite(count, limit, offset)
+        if connection.vendor == 'postgresql':
+            return self._execute_postgresql(count, limit, offset)
+        return self._execute_fallback(count, limit, offset)
+
+    def _execute_sqlite(self, count, limit, offset):
+        match = ' AND '.join(
+            '(' + ' OR '.join(f'"{variant}"*' for variant in variants) + ')' for variants in self.terms
+        )
+        with connection.cursor() as cursor:
+            if count:
+                cursor.execute(f'SELECT COUNT(*) FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s', [match])
+                return cursor.fetchone()[0]
+            # bm25: меньше — релевантнее; совпадение в заголовке весит больше
+            cursor.execute(
+                f"""
+                SELECT d.kind, d.object_id, d.title, bm25({FTS_TABLE}, 10.0, 1.0) AS rank
+                FROM {FTS_TABLE} JOIN {DOCUMENT_TABLE} d ON d.id = {FTS_TABLE}.rowid
+                WHERE {FTS_TABLE} MATCH %s
+                ORDER BY rank LIMIT %s OFFSET %s
+                """,
+                [match, limit, offset],
+            )
+            return [
+                {'type': kind, 'id': object_id, 'title': title, 'rank': round(-rank, 4)}
+                for kind, object_id, title, rank in cursor.fetchall()
+            ]
+
+    def _execute_postgresql(self, count, limit, offset):
+        raw_query = ' & '.join(
+            '(' + ' | '.join(f'{variant}:*' for variant in variants) + ')' for variants in self.terms
+        )
+        with connection.cursor() as cursor:
+            # Условие и ранжирование читают хранимый столбец document по GIN-индексу,
+            # а не строят tsvector каждой строки заново
+            if count:
+                cursor.execute(
+                    f"SELECT COUNT(*) FROM {DOCUMENT_TABLE} WHERE document @@ to_tsquery('simple', %s)",
+                    [raw_query],
+                )
+                return cursor.fetchone()[0]
+            cursor.execute(
+                f"""
+                SELECT kind, object_id, title, ts_rank(document, query) AS rank
+                FROM {DOCUMENT_TABLE}, to_tsquery('simple', %s) AS query
+                WHERE document @@ query
+                ORDER BY rank DESC LIMIT %s OFFSET %s
+                """,
+                [raw_query, limit, offset],
+            )
+            return [
+                {'type': kind, 'id': object_id, 'title': title, 'rank': round(rank, 4)}
+                for kind, object_id, title, rank in cursor.fetchall()
+            ]
+
+    def _execute_fallback(self, count, limit, offset):
+        queryset = SearchDocument.objects.all()
+        for variants in self.terms:
+            condition = None
+            for variant in variants:
+                lookup = SearchDocument.objects.filter(body__icontains=variant)
+                condition = lookup if condition is None else condition | lookup
+            queryset = queryset & condition
+        if count:
+            return queryset.count()
+        return [
+            {'type': kind, 'id': object_id, 'title': title, 'rank': 0}
+            for kind, object_id, title in queryset.order_by('title').values_list('kind', 'object_id', 'title')[
+                offset:offset + limit]
+        ]
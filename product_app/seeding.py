@@ -0,0 +1,165 @@
+import random
+from datetime import date, timedelta
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from unidecode import unidecode
+
+from .cache import bump_version
+from .cards import rebuild_cards
+from .db import insert_rows
+from .portfolio import rebuild_memberships
+from .models import (
+    Partner, Product, ProductStatus, Project, ProjectRole, ProjectStage, ProjectStatus, Role, SalesModel, Sphere,
+)
+from .search import rebuild_index
+from .stats import rebuild_stats
+
+User = get_user_model()
+
+FEMALE_NAMES = ('Анна', 'Мария', 'Елена', 'Ольга', 'Дарья', 'Алиса', 'Ксения', 'Виктория')
+MALE_NAMES = ('Иван', 'Алексей', 'Дмитрий', 'Сергей', 'Михаил', 'Никита', 'Артём', 'Павел')
+LAST_NAMES = (
+    'Иванов', 'Смирнов', 'Кузнецов', 'Попов', 'Соколов', 'Лебедев', 'Козлов', 'Новиков',
+    'Морозов', 'Волков', 'Соловьёв', 'Васильев', 'Зайцев', 'Павлов', 'Семёнов', 'Голубев',
+)
+PRODUCT_ADJECTIVES = (
+    'Умный', 'Цифровой', 'Открытый', 'Быстрый', 'Единый', 'Облачный', 'Городской', 'Школьный',
+)
+PRODUCT_NOUNS = (
+    'склад', 'помощник', 'кабинет', 'маркетплейс', 'трекер', 'портал', 'навигатор', 'конструктор',
+)
+PROJECT_KINDS = (
+    'Мобильное приложение', 'Веб-интерфейс', 'Интеграция с CRM', 'Аналитическая панель',
+    'Чат-бот', 'Платёжный модуль', 'Рекомендательная система', 'Личный кабинет',
+)
+STAGE_NAMES = ('Исследование', 'Прототип', 'Разработка', 'Тестирование', 'Запуск', 'Поддержка')
+PARTNER_NAMES = ('Технопарк', 'Инновационный центр', 'Университет', 'Акселератор', 'Фонд', 'Банк')
+CITIES = ('Москва', 'Казань', 'Новосибирск', 'Томск', 'Самара', 'Пермь', 'Иннополис', 'Екатеринбург')
+
+SPHERES = ('Образование', 'Здравоохранение', 'Финансы', 'Логистика', 'Ритейл', 'Госуслуги', 'Туризм')
+PRODUCT_STATUSES = ('Идея', 'Разработка', 'Пилот', 'Запущен', 'Закрыт')
+PROJECT_STATUSES = ('Планирование', 'В работе', 'На паузе', 'Завершён')
+SALES_MODELS = ('B2B', 'B2C', 'B2G', 'C2C')
+ROLES = ('Бекендер', 'Фронтендер', 'Дизайнер', 'Аналитик', 'Тестировщик', 'Менеджер')
+
+BATCH_SIZE = 1000
+
+
+def lookup(model, names):
+    """Справочник: существующие записи переиспользуются, недостающие создаются."""
+    existing = {obj.name: obj for obj in model.objects.filter(name__in=names)}
+    model.objects.bulk_create([model(name=name) for name in names if name not in existing])
+    return list(model.objects.filter(name__in=names))
+
+
+def add_m2m(model, field_name, pairs):
+    """Строки промежуточной таблицы M2M для пар (id владельца, id связанного объекта); дубли пропускаются."""
+    field = model._meta.get_field(field_name)
+    fields = [f'{field.m2m_field_name()}_id', f'{field.m2m_reverse_field_name()}_id']
+    insert_rows(field.remote_field.through, fields, pairs, ignore_conflicts=True, batch_size=BATCH_SIZE)
+
+
+def seed_portfolio(products=100, projects=3, stages=4, interns=5, users=200, seed=None):
+    """
+    Генерирует реалистичный портфель пакетными вставками: продукты со сферами,
+    партнёрами и заказчиками, проекты с этапами, ролями и стажёрами.
+    Сигналы при bulk_create не срабатывают, поэтому поисковый индекс, сводки,
+    карточки и индекс участия перестраиваются в конце целиком. Возвращает число созданных строк по моделям.
+    """
+    rng = random.Random(seed)
+    with transaction.atomic():
+        spheres = lookup(Sphere, SPHERES)
+        product_statuses = lookup(ProductStatus, PRODUCT_STATUSES)
+        project_statuses = lookup(ProjectStatus, PROJECT_STATUSES)
+        sales_models = lookup(SalesModel, SALES_MODELS)
+        roles = lookup(Role, ROLES)
+
+        offset = User.objects.count()
+        people = []
+        for index in range(users):
+            last = rng.choice(LAST_NAMES)
+            if rng.random() < 0.5:
+                first, last = rng.choice(FEMALE_NAMES), last + 'а'
+            else:
+                first = rng.choice(MALE_NAMES)
+            username = f'{unidecode(last).lower()}.{unidecode(first).lower()}{offset + index}'.replace("'", '')
+            people.append(User(username=username, first_name=first, last_name=last))
+        people = User.objects.bulk_create(people, batch_size=BATCH_SIZE)
+
+        partner_objs = Partner.objects.bulk_create([
+            Partner(name=f'{rng.choice(PARTNER_NAMES)} «{rng.choice(CITIES)}-{index + 1}»')
+            for index in range(max(products // 5, 1))
+        ], batch_size=BATCH_SIZE)
+
+        start = date.today() - timedelta(days=3 * 365)
+        product_objs = Product.objects.bulk_create([
+            Product(
+                name=f'{rng.choice(PRODUCT_ADJECTIVES)} {rng.choice(PRODUCT_NOUNS)} {index + 1}',
+                description=f'Сервис для {rng.choice(SPHERES).lower()}: {rng.choice(PROJECT_KINDS).lower()}.',
+                created_at=start + timedelta(days=rng.randint(0, 3 * 365)),
+                status=rng.choice(product_statuses),
+                sales_model=rng.choice(sales_models),
+            )
+            for index in range(products)
+        ], batch_size=BATCH_SIZE)
+
+        project_objs = Project.objects.bulk_create([
+            Project(
+                name=f'{rng.choice(PROJECT_KINDS)} — {product.name}',
+                product=product,
+                description=f'Команда стажёров делает «{product.name}».',
+                status=rng.choice(project_statuses),
+                start_date=product.created_at + timedelta(days=rng.randint(0, 60)),
+                end_date=product.created_at + timedelta(days=rng.randint(120, 480)),
+            )
+            for product in product_objs for _ in range(projects)
+        ], batch_size=BATCH_SIZE)
+
+        stage_objs = ProjectStage.objects.bulk_create([
+            ProjectStage(
+                project=project,
+                name=STAGE_NAMES[index % len(STAGE_NAMES)],
+                start_date=project.start_date + timedelta(days=30 * index),
+                end_date=project.start_date + timedelta(days=30 * index + 29),
+            )
+            for project in project_objs for index in range(stages)
+        ], batch_size=BATCH_SIZE)
+
+        user_ids = [user.pk for user in people]
+        add_m2m(Product, 'spheres', [
+            (product.pk, sphere.pk) for product in product_objs for sphere in rng.sample(spheres, 2)
+        ])
+        add_m2m(Product, 'partners', [
+            (product.pk, rng.choice(partner_objs).pk) for product in product_objs
+        ])
+        add_m2m(Product, 'owners', [
+            (product.pk, user_id) for product in product_objs for user_id in rng.sample(user_ids, 2)
+        ])
+        add_m2m(Product, 'curators', [(product.pk, rng.choice(user_ids)) for product in product_objs])
+
+        members = {project.pk: rng.sample(user_ids, min(interns, len(user_ids))) for project in project_objs}
+        add_m2m(Project, 'members', [
+            (project_id, user_id) for project_id, team in members.items() for user_id in team
+        ])
+        add_m2m(Project, 'curators', [(project.pk, rng.choice(user_ids)) for project in project_objs])
+        role_objs = ProjectRole.objects.bulk_create([
+            ProjectRole(project_id=project_id, member_id=user_id, role=rng.choice(roles))
+            for project_id, team in members.items() for user_id in team
+        ], batch_size=BATCH_SIZE)
+
+        rebuild_index()
+        rebuild_stats()
+        rebuild_cards()
+        rebuild_memberships()
+
+    for model in (User, Sphere, Partner, Product, Project, ProjectStage, ProjectRole):
+        bump_version(model)
+    return {
+        'users': len(people),
+        'partners': len(partner_objs),
+        'products': len(product_objs),
+        'projects': len(project_objs),
+        'stages': len(stage_objs),
+        'project_roles': len(role_objs),
+    }
@@ -1,96 +1,230 @@
 from django.contrib.auth import get_user_model
 from rest_framework import serializers
-from .models import *
+from rest_framework.permissions import SAFE_METHODS
+from .models import (
+    ChangeLog, Partner, Product, ProductCard, ProductStats, ProductStatus, Project, ProjectRole, ProjectStage,
+    ProjectStats, ProjectStatus, Role, SalesModel, Sphere,
+)
+from .metrics import time_serialization
+from .storage import logo_storage
 from django.conf import settings
 
 User = get_user_model()
 
+
+class LogoVariantsField(serializers.ReadOnlyField):
+    """URL миниатюр и WebP-версий логотипа: {"thumb": ..., "thumb_webp": ..., "medium": ...}."""
+
+    def to_representation(self, value):
+        request = self.context.get('request')
+        urls = {}
+        for variant, path in (value or {}).items():
+            if variant == 'source':
+                continue
+            url = logo_storage.url(path)
+            urls[variant] = request.build_absolute_uri(url) if request else url
+        return urls
+
+
+class TimedSerializerMixin:
+    """Учитывает время сериализации в метриках запроса (заголовок Server-Timing, /metrics)."""
+
+    def to_representation(self, instance):
+        with time_serialization():
+            return super().to_representation(instance)
+
+
+class DynamicFieldsMixin:
+    """
+    Управление составом ответа через параметры запроса (только для чтения):
+    ?fields=id,name,logo — вернуть только перечисленные поля;
+    ?expand=owners,spheres — развернуть перечисленные связи из Meta.expandable_fields,
+    остальные такие связи возвращаются списком id. Без ?expand= связи отдаются как раньше.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get('request')
+        if request is None or request.method not in SAFE_METHODS:
+            return
+
+        expand = request.query_params.get('expand')
+        if expand is not None:
+            expand = set(filter(None, expand.split(',')))
+            for name, serializer_class in getattr(self.Meta, 'expandable_fields', {}).items():
+                if name not in self.fields:
+                    continue
+                field = self.fields[name]
+                many = isinstance(field, (serializers.ListSerializer, serializers.ManyRelatedField))
+                if name in expand:
+                    if not isinstance(field, serializers.BaseSerializer):
+                        self.fields[name] = serializer_class(many=many, read_only=True)
+                elif isinstance(field, serializers.BaseSerializer):
+                    self.fields[name] = serializers.PrimaryKeyRelatedField(many=many, read_only=True)
+
+        fields = request.query_params.get('fields')
+        if fields:
+            allowed = set(fields.split(','))
+            for name in list(self.fields):
+                if name not in allowed:
+                    self.fields.pop(name)
+
+
 class UserSerializer(serializers.ModelSerializer):
     class Meta:
         model = User
         fields = ['id', 'username', 'email']
 
 
-class SphereSerializer(serializers.ModelSerializer):
+class SphereSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Sphere
         fields = ['id', 'name', 'description']
 
 
-class PartnerSerializer(serializers.ModelSerializer):
+class PartnerSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    logo_variants = LogoVariantsField()
+
     class Meta:
         model = Partner
-        fields = ['id', 'name', 'logo', 'url']
+        fields = ['id', 'name', 'logo', 'logo_variants', 'url', 'updated_at']
 
 
-class ProductSerializer(serializers.ModelSerializer):
+class ProductSerializer(TimedSerializerMixin, DynamicFieldsMixin, serializers.ModelSerializer):
     owners = UserSerializer(many=True, read_only=True)
     curators = UserSerializer(many=True, read_only=True)
     partners = PartnerSerializer(many=True, read_only=True)
     spheres = SphereSerializer(many=True, read_only=True)
+    logo_variants = LogoVariantsField()
 
     class Meta:
         model = Product
         fields = [
             'id', 'name', 'description', 'created_at', 'status', 'owners', 'curators',
-            'partners', 'spheres', 'sales_model', 'logo'
+            'partners', 'spheres', 'sales_model', 'logo', 'logo_variants', 'updated_at'
         ]
+        expandable_fields = {
+            'owners': UserSerializer,
+            'curators': UserSerializer,
+            'partners': PartnerSerializer,
+            'spheres': SphereSerializer,
+        }
 
 
-class ProjectSerializer(serializers.ModelSerializer):
+class ProjectSerializer(TimedSerializerMixin, DynamicFieldsMixin, serializers.ModelSerializer):
     product = serializers.PrimaryKeyRelatedField(queryset=Product.objects.all())  # ID продукта
     members = UserSerializer(many=True, read_only=True)
     curators = UserSerializer(many=True, read_only=True)
     partners = PartnerSerializer(many=True, read_only=True)
+    logo_variants = LogoVariantsField()
 
     class Meta:
         model = Project
         fields = [
             'id', 'name', 'product', 'description', 'start_date', 'end_date',
-            'status', 'curators', 'members', 'partners'
+            'status', 'curators', 'members', 'partners', 'logo', 'logo_variants', 'updated_at'
         ]
+        expandable_fields = {
+            'curators': UserSerializer,
+            'members': UserSerializer,
+            'partners': PartnerSerializer,
+        }
 
 
-class ProductStatusSerializer(serializers.ModelSerializer):
+class ProductStatusSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = ProductStatus
         fields = ['id', 'name', 'description']
 
 
-class ProjectStageSerializer(serializers.ModelSerializer):
+class ProjectStageSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = ProjectStage
-        fields = ['id', 'project', 'name', 'start_date', 'end_date']
+        fields = ['id', 'project', 'name', 'start_date', 'end_date', 'updated_at']
         read_only_fields = ['id']  # Поле `id` будет доступно только для чтения
 
 
-class SalesModelSerializer(serializers.ModelSerializer):
+class SalesModelSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = SalesModel
         fields = ['id', 'name', 'description']  # Поля, которые будут сериализованы
         read_only_fields = ['id']  # Поле id доступно только для чтения
 
 
-class ProjectStatusSerializer(serializers.ModelSerializer):
+class ProjectStatusSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = ProjectStatus
         fields = ['id', 'name', 'description']
         read_only_fields = ['id']
 
 
-class RoleSerializer(serializers.ModelSerializer):
+class RoleSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Role
         fields = ['id', 'name']
 
 
-class ProjectRoleSerializer(serializers.ModelSerializer):
+class ProjectRoleSerializer(TimedSerializerMixin, DynamicFieldsMixin, serializers.ModelSerializer):
     member_name = serializers.CharField(source='member.get_full_name', read_only=True)
     role_name = serializers.CharField(source='role.name', read_only=True)
     project_name = serializers.CharField(source='project.name', read_only=True)
 
     class Meta:
         model = ProjectRole
-        fields = ['id', 'member', 'member_name', 'role', 'role_name', 'project', 'project_name']
+        fields = ['id', 'member', 'member_name', 'role', 'role_name', 'project', 'project_name', 'updated_at']
+        expandable_fields = {
+            'member': UserSerializer,  # ?expand=member вернёт объект участника вместо id
+            'role': RoleSerializer,
+        }
+
+
+class SearchResultSerializer(serializers.Serializer):
+    type = serializers.CharField(read_only=True)  # product, project, partner или sphere
+    id = serializers.IntegerField(read_only=True)
+    title = serializers.CharField(read_only=True)
+    rank = serializers.FloatField(read_only=True)
+
+
+class ProductStatsSerializer(serializers.ModelSerializer):
+    product_name = serializers.CharField(source='product.name', read_only=True)
+
+    class Meta:
+        model = ProductStats
+        fields = ['product', 'product_name', 'project_count', 'intern_count', 'projects_by_status', 'refreshed_at']
+
+
+class ProjectStatsSerializer(serializers.ModelSerializer):
+    project_name = serializers.CharField(source='project.name', read_only=True)
+    product = serializers.IntegerField(source='project.product_id', read_only=True)
+
+    class Meta:
+        model = ProjectStats
+        fields = [
+            'project', 'project_name', 'product', 'intern_count', 'role_count', 'stage_count',
+            'last_stage_end', 'refreshed_at',
+        ]
+
+
+class ProductCardSerializer(serializers.ModelSerializer):
+    logo_variants = LogoVariantsField()
+
+    class Meta:
+        model = ProductCard
+        fields = [
+            'product', 'name', 'logo', 'logo_variants', 'status_name', 'sales_model_name', 'spheres', 'partners',
+            'project_count', 'updated_at',
+        ]
 
 
+class StageDeadlineSerializer(serializers.ModelSerializer):
+    project_name = serializers.CharField(source='project.name', read_only=True)
+
+    class Meta:
+        model = ProjectStage
+        fields = ['id', 'name', 'project', 'project_name', 'end_date']
+
+
+class ChangeLogSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ChangeLog
+        fields = ['id', 'model', 'object_id', 'action', 'field', 'changed_at']
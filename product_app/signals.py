@@ -0,0 +1,325 @@
+from django.contrib.auth import get_user_model
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.db.models.signals import m2m_changed, post_delete, post_init, post_migrate, post_save, pre_delete
+from django.dispatch import Signal, receiver
+from django.utils import timezone
+
+from .cache import bump_version, mark_written
+from .cards import CARD_SOURCES, products_using, schedule_card_refresh
+from .changes import is_logged, log_changes
+from .logos import LOGO_MODELS, schedule_logo_processing
+from .metrics import record_query
+from .models import Product, Project, ProjectRole, ProjectStage, ProjectStatus, has_updated_at
+from .portfolio import (
+    MEMBERSHIP_RELATIONS, add_memberships, move_project_memberships, remove_memberships, sync_role_memberships,
+)
+from .search import SEARCH_SOURCES, ensure_search_schema, index_object, index_objects, remove_object
+from .stats import schedule_stats_refresh
+
+User = get_user_model()
+
+# Пакетные bulk_create/bulk_update не отправляют post_save, поэтому BulkMixin
+# сообщает об изменённых строках этим сигналом: sender — модель, pks — id строк,
+# instances — записанные объекты, created — True, если строки только созданы
+bulk_changed = Signal()
+
+
+def _is_tracked(model):
+    return model._meta.app_label == 'product_app' or model is User
+
+
+@receiver(post_save, dispatch_uid='product_app_cache_post_save')
+def invalidate_on_save(sender, update_fields=None, **kwargs):
+    # Обновление last_login при входе не меняет данные API
+    if update_fields and set(update_fields) == {'last_login'}:
+        return
+    if _is_tracked(sender):
+        bump_version(sender)
+
+
+@receiver(post_delete, dispatch_uid='product_app_cache_post_delete')
+def invalidate_on_delete(sender, **kwargs):
+    if _is_tracked(sender):
+        bump_version(sender)
+
+
+@receiver(m2m_changed, dispatch_uid='product_app_cache_m2m_changed')
+def invalidate_on_m2m_change(sender, instance, action, model, **kwargs):
+    if not action.startswith('post_'):
+        return
+    # Изменение связи затрагивает обе стороны: например, Product и User для owners
+    for changed in (type(instance), model):
+        if _is_tracked(changed):
+            bump_version(changed)
+
+
+@receiver(post_save, dispatch_uid='product_app_search_post_save')
+def update_search_index(sender, instance, raw=False, **kwargs):
+    if sender in SEARCH_SOURCES and not raw:
+        index_object(instance)
+
+
+@receiver(bulk_changed, dispatch_uid='product_app_search_bulk_changed')
+def update_search_index_on_bulk_change(sender, instances=(), **kwargs):
+    if sender in SEARCH_SOURCES:
+        index_objects(instances)
+
+
+@receiver(post_delete, dispatch_uid='product_app_search_post_delete')
+def remove_from_search_index(sender, instance, **kwargs):
+    if sender in SEARCH_SOURCES:
+        remove_object(instance)
+
+
+@receiver(post_migrate, dispatch_uid='product_app_search_post_migrate')
+def create_search_schema(sender, using, **kwargs):
+    # FTS5-таблицу и генерируемый tsvector нельзя описать моделью, поэтому создаём их после миграций
+    if sender.name == 'product_app':
+        ensure_search_schema(connections[using])
+
+
+@receiver(post_save, dispatch_uid='product_app_logo_post_save')
+def process_logo_upload(sender, instance, raw=False, **kwargs):
+    if sender not in LOGO_MODELS or raw:
+        return
+    if instance.logo:
+        # Новый файл: миниатюры создаются в фоне, ответ не ждёт обработки
+        if instance.logo_variants.get('source') != instance.logo.name:
+            schedule_logo_processing(instance.logo.name)
+    elif instance.logo_variants:
+        sender.objects.filter(pk=instance.pk).update(logo_variants={})
+
+
+@receiver(bulk_changed, dispatch_uid='product_app_cache_bulk_changed')
+def invalidate_on_bulk_change(sender, **kwargs):
+    bump_version(sender)
+
+
+@receiver(connection_created, dispatch_uid='product_app_metrics_connection_created')
+def count_queries(sender, connection, **kwargs):
+    # Постоянная обёртка работает в любом потоке, в том числе в sync_to_async под ASGI
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+@receiver(post_init, sender=Project, dispatch_uid='product_app_stats_post_init')
+def remember_project_product(sender, instance, **kwargs):
+    # Исходный продукт нужен, чтобы при переносе проекта пересчитать обе сводки
+    instance._stats_product_id = instance.__dict__.get('product_id')
+
+
+@receiver(post_save, dispatch_uid='product_app_stats_post_save')
+@receiver(post_delete, dispatch_uid='product_app_stats_post_delete')
+def refresh_stats_on_change(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    if sender is Product:
+        if kwargs.get('created'):
+            schedule_stats_refresh(product_ids=[instance.pk])
+    elif sender is Project:
+        schedule_stats_refresh(
+            product_ids=[instance.product_id, instance._stats_product_id],
+            project_ids=[instance.pk],
+        )
+    elif sender in (ProjectStage, ProjectRole):
+        schedule_stats_refresh(project_ids=[instance.project_id])
+
+
+@receiver(post_save, sender=ProjectStatus, dispatch_uid='product_app_stats_status_post_save')
+@receiver(pre_delete, sender=ProjectStatus, dispatch_uid='product_app_stats_status_pre_delete')
+def refresh_stats_on_status_change(sender, instance, raw=False, created=False, **kwargs):
+    # projects_by_status хранит названия статусов. Проекты ищем до удаления:
+    # SET_NULL обнуляет их статус одним UPDATE, без сигналов проектов
+    if raw or created:
+        return
+    product_ids = Project.objects.filter(status=instance).values_list('product_id', flat=True).distinct()
+    schedule_stats_refresh(product_ids=list(product_ids))
+
+
+@receiver(m2m_changed, sender=Project.members.through, dispatch_uid='product_app_stats_members_changed')
+def refresh_stats_on_members_change(sender, instance, action, reverse, pk_set, **kwargs):
+    if reverse:
+        # Со стороны пользователя: user.projects_as_member.add(...)
+        if action == 'pre_clear':
+            instance._stats_project_ids = list(instance.projects_as_member.values_list('pk', flat=True))
+            return
+        if not action.startswith('post_'):
+            return
+        project_ids = pk_set if pk_set is not None else instance.__dict__.pop('_stats_project_ids', [])
+    elif action.startswith('post_'):
+        project_ids = [instance.pk]
+    else:
+        return
+    product_ids = Project.objects.filter(pk__in=project_ids).values_list('product_id', flat=True)
+    schedule_stats_refresh(product_ids=list(product_ids), project_ids=project_ids)
+
+
+@receiver(bulk_changed, dispatch_uid='product_app_stats_bulk_changed')
+def refresh_stats_on_bulk_change(sender, pks, instances=(), **kwargs):
+    if sender is Project:
+        product_ids = {obj.product_id for obj in instances}
+        product_ids.update(getattr(obj, '_stats_product_id', None) for obj in instances)
+        schedule_stats_refresh(product_ids=product_ids, project_ids=pks)
+    elif sender in (ProjectStage, ProjectRole):
+        schedule_stats_refresh(project_ids={obj.project_id for obj in instances})
+
+
+@receiver(post_save, dispatch_uid='product_app_updated_at_post_save')
+@receiver(post_delete, dispatch_uid='product_app_updated_at_post_delete')
+@receiver(bulk_changed, dispatch_uid='product_app_updated_at_bulk_changed')
+def remember_write(sender, **kwargs):
+    if _is_tracked(sender) and has_updated_at(sender):
+        mark_written(sender)
+
+
+def _through_values(through, model, pks, other_model):
+    """id объектов other_model, связанных через through с объектами model из pks."""
+    source = next(f.attname for f in through._meta.fields if f.is_relation and f.related_model is model)
+    target = next(f.attname for f in through._meta.fields if f.is_relation and f.related_model is other_model)
+    return through.objects.filter(**{f'{source}__in': pks}).values_list(target, flat=True)
+
+
+@receiver(m2m_changed, dispatch_uid='product_app_m2m_pre_clear')
+def remember_cleared(sender, instance, action, model, **kwargs):
+    # После очистки уже не узнать, какие объекты были связаны
+    if action == 'pre_clear' and (has_updated_at(model) or is_logged(model)):
+        instance._cleared_pks = list(_through_values(sender, type(instance), [instance.pk], model))
+
+
+def _changed_pks(instance, pk_set):
+    return pk_set if pk_set is not None else getattr(instance, '_cleared_pks', [])
+
+
+@receiver(m2m_changed, dispatch_uid='product_app_updated_at_m2m_changed')
+def touch_on_m2m_change(sender, instance, action, model, pk_set, **kwargs):
+    # Изменение связи меняет представление обеих сторон, но save() не вызывается
+    if not action.startswith('post_'):
+        return
+    now = timezone.now()
+    owner = type(instance)
+    if has_updated_at(owner):
+        owner.objects.filter(pk=instance.pk).update(updated_at=now)
+        mark_written(owner)
+    if has_updated_at(model):
+        pks = _changed_pks(instance, pk_set)
+        if pks:
+            model.objects.filter(pk__in=pks).update(updated_at=now)
+            mark_written(model)
+
+
+@receiver(post_save, dispatch_uid='product_app_changelog_post_save')
+def log_save(sender, instance, created=False, **kwargs):
+    if is_logged(sender):
+        log_changes(sender, [instance.pk], 'create' if created else 'update')
+
+
+@receiver(post_delete, dispatch_uid='product_app_changelog_post_delete')
+def log_delete(sender, instance, **kwargs):
+    if is_logged(sender):
+        log_changes(sender, [instance.pk], 'delete')
+
+
+@receiver(m2m_changed, dispatch_uid='product_app_changelog_m2m_changed')
+def log_m2m_change(sender, instance, action, reverse, model, pk_set, **kwargs):
+    if not action.startswith('post_'):
+        return
+    # Записываем изменение на стороне модели, которой принадлежит поле (product.owners)
+    if reverse:
+        owner, pks = model, _changed_pks(instance, pk_set)
+    else:
+        owner, pks = type(instance), [instance.pk]
+    if is_logged(owner):
+        field = next(f.name for f in owner._meta.many_to_many if f.remote_field.through is sender)
+        log_changes(owner, pks, 'm2m', field)
+
+
+@receiver(bulk_changed, dispatch_uid='product_app_changelog_bulk_changed')
+def log_bulk_change(sender, pks, created=False, **kwargs):
+    if is_logged(sender):
+        log_changes(sender, pks, 'create' if created else 'update')
+
+
+@receiver(post_save, dispatch_uid='product_app_cards_post_save')
+@receiver(post_delete, dispatch_uid='product_app_cards_post_delete')
+def refresh_cards_on_change(sender, instance, raw=False, created=False, **kwargs):
+    if raw:
+        return
+    if sender is Product:
+        if kwargs['signal'] is post_save:
+            schedule_card_refresh([instance.pk])
+    elif sender is Project:
+        schedule_card_refresh([instance.product_id, instance._stats_product_id])
+    elif sender in CARD_SOURCES and kwargs['signal'] is post_save and not created:
+        schedule_card_refresh(list(products_using(sender, [instance.pk])))
+
+
+@receiver(pre_delete, dispatch_uid='product_app_cards_pre_delete')
+def refresh_cards_on_source_delete(sender, instance, **kwargs):
+    # После удаления сферы или статуса связи с продуктами уже не найти
+    if sender in CARD_SOURCES:
+        schedule_card_refresh(list(products_using(sender, [instance.pk])))
+
+
+@receiver(m2m_changed, sender=Product.spheres.through, dispatch_uid='product_app_cards_spheres_changed')
+@receiver(m2m_changed, sender=Product.partners.through, dispatch_uid='product_app_cards_partners_changed')
+def refresh_cards_on_m2m_change(sender, instance, action, reverse, pk_set, **kwargs):
+    if action.startswith('post_'):
+        schedule_card_refresh(_changed_pks(instance, pk_set) if reverse else [instance.pk])
+
+
+@receiver(bulk_changed, dispatch_uid='product_app_cards_bulk_changed')
+def refresh_cards_on_bulk_change(sender, pks, instances=(), **kwargs):
+    if sender is Product:
+        schedule_card_refresh(pks)
+    elif sender is Project:
+        product_ids = {obj.product_id for obj in instances}
+        product_ids.update(getattr(obj, '_stats_product_id', None) for obj in instances)
+        schedule_card_refresh(product_ids)
+
+
+@receiver(m2m_changed, dispatch_uid='product_app_membership_m2m_changed')
+def index_memberships(sender, instance, action, reverse, pk_set, **kwargs):
+    if sender not in MEMBERSHIP_RELATIONS:
+        return
+    # Со стороны пользователя (user.projects_as_member) instance — пользователь, pk_set — объекты
+    if action == 'post_add':
+        pairs = [(pk, instance.pk) for pk in pk_set] if reverse else [(instance.pk, pk) for pk in pk_set]
+        add_memberships(sender, pairs)
+    elif action == 'post_remove':
+        if reverse:
+            remove_memberships(sender, object_ids=pk_set, user_ids=[instance.pk])
+        else:
+            remove_memberships(sender, object_ids=[instance.pk], user_ids=pk_set)
+    elif action == 'post_clear':
+        if reverse:
+            remove_memberships(sender, user_ids=[instance.pk])
+        else:
+            remove_memberships(sender, object_ids=[instance.pk])
+
+
+@receiver(post_save, dispatch_uid='product_app_membership_post_save')
+def index_memberships_on_save(sender, instance, raw=False, created=False, **kwargs):
+    # Удаление ролей, проектов и пользователей убирает участие каскадом
+    if raw:
+        return
+    if sender is ProjectRole:
+        sync_role_memberships([instance.pk])
+    elif sender is Project and not created and instance.product_id != instance._stats_product_id:
+        move_project_memberships([instance.pk])
+
+
+@receiver(bulk_changed, dispatch_uid='product_app_membership_bulk_changed')
+def index_memberships_on_bulk_change(sender, pks, instances=(), created=False, **kwargs):
+    if sender is ProjectRole:
+        sync_role_memberships(pks)
+    elif sender is Project and not created:
+        move_project_memberships([
+            obj.pk for obj in instances if obj.product_id != getattr(obj, '_stats_product_id', obj.product_id)
+        ])
+
+
+@receiver(post_save, sender=Project, dispatch_uid='product_app_project_saved')
+def remember_saved_product(sender, instance, **kwargs):
+    # Объявлен последним: обработчики выше ещё видят прежний продукт перенесённого проекта
+    instance._stats_product_id = instance.product_id
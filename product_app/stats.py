@@ -0,0 +1,124 @@
+import threading
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Count, IntegerField, Max, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from .models import Product, ProductStats, Project, ProjectRole, ProjectStage, ProjectStats
+
+NO_STATUS = 'Без статуса'
+
+_pending = threading.local()
+
+
+def _count(queryset, field):
+    """Коррелированный подзапрос COUNT(*) вместо JOIN, чтобы счётчики не перемножались."""
+    subquery = (
+        queryset.filter(**{field: OuterRef('pk')})
+        .order_by()
+        .values(field)
+        .annotate(total=Count('*'))
+        .values('total')
+    )
+    return Coalesce(Subquery(subquery, output_field=IntegerField()), Value(0))
+
+
+def refresh_product_stats(product_ids):
+    """Пересчитывает сводки указанных продуктов тремя агрегирующими запросами."""
+    product_ids = set(product_ids) - {None}
+    if not product_ids:
+        return
+    members = Project.members.through.objects.filter(project__product_id__in=product_ids)
+    intern_counts = dict(
+        members.values('project__product_id')
+        .annotate(total=Count('user_id', distinct=True))
+        .values_list('project__product_id', 'total')
+    )
+    by_status = defaultdict(dict)
+    for product_id, status_name, total in (
+        Project.objects.filter(product_id__in=product_ids)
+        .values('product_id', 'status__name')
+        .annotate(total=Count('id'))
+        .values_list('product_id', 'status__name', 'total')
+    ):
+        by_status[product_id][status_name or NO_STATUS] = total
+
+    existing = set(Product.objects.filter(pk__in=product_ids).values_list('pk', flat=True))
+    ProductStats.objects.bulk_create(
+        [
+            ProductStats(
+                product_id=product_id,
+                project_count=sum(by_status[product_id].values()),
+                intern_count=intern_counts.get(product_id, 0),
+                projects_by_status=by_status[product_id],
+            )
+            for product_id in existing
+        ],
+        update_conflicts=True,
+        unique_fields=['product'],
+        update_fields=['project_count', 'intern_count', 'projects_by_status', 'refreshed_at'],
+    )
+
+
+def refresh_project_stats(project_ids):
+    """Пересчитывает сводки указанных проектов одним запросом с подзапросами-счётчиками."""
+    project_ids = set(project_ids) - {None}
+    if not project_ids:
+        return
+    rows = Project.objects.filter(pk__in=project_ids).annotate(
+        intern_count=_count(Project.members.through.objects.all(), 'project'),
+        role_count=_count(ProjectRole.objects.all(), 'project'),
+        stage_count=_count(ProjectStage.objects.all(), 'project'),
+        last_stage_end=Subquery(
+            ProjectStage.objects.filter(project=OuterRef('pk'))
+            .order_by()
+            .values('project')
+            .annotate(last=Max('end_date'))
+            .values('last')
+        ),
+    ).values_list('pk', 'intern_count', 'role_count', 'stage_count', 'last_stage_end')
+    ProjectStats.objects.bulk_create(
+        [
+            ProjectStats(
+                project_id=project_id,
+                intern_count=intern_count,
+                role_count=role_count,
+                stage_count=stage_count,
+                last_stage_end=last_stage_end,
+            )
+            for project_id, intern_count, role_count, stage_count, last_stage_end in rows
+        ],
+        update_conflicts=True,
+        unique_fields=['project'],
+        update_fields=['intern_count', 'role_count', 'stage_count', 'last_stage_end', 'refreshed_at'],
+    )
+
+
+def rebuild_stats(batch_size=1000):
+    """Полный пересчёт сводок по всем продуктам и проектам."""
+    for model, refresh in ((Product, refresh_product_stats), (Project, refresh_project_stats)):
+        ids = list(model.objects.values_list('pk', flat=True).order_by('pk'))
+        for start in range(0, len(ids), batch_size):
+            refresh(ids[start:start + batch_size])
+
+
+def _flush_pending():
+    product_ids, project_ids = getattr(_pending, 'ids', (set(), set()))
+    _pending.ids = (set(), set())
+    refresh_project_stats(project_ids)
+    refresh_product_stats(product_ids)
+
+
+def schedule_stats_refresh(product_ids=(), project_ids=()):
+    """
+    Откладывает пересчёт сводок до фиксации транзакции. Идентификаторы копятся
+    в общем наборе потока, поэтому пакетная операция пересчитывает каждую
+    сводку один раз: первый обработчик on_commit забирает весь набор,
+    остальные ничего не делают.
+    """
+    if not hasattr(_pending, 'ids'):
+        _pending.ids = (set(), set())
+    _pending.ids[0].update(product_ids)
+    _pending.ids[1].update(project_ids)
+    transaction.on_commit(_flush_pending)
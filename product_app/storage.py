@@ -0,0 +1,38 @@
+import hashlib
+
+from django.core.files.storage import FileSystemStorage
+
+
+class FileAlreadyStored(Exception):
+    """Файл с таким содержимым (а значит и именем) уже сохранён."""
+
+
+def content_hash(file):
+    """SHA-256 содержимого файла; позиция чтения возвращается в начало."""
+    hasher = hashlib.sha256()
+    for chunk in file.chunks():
+        hasher.update(chunk)
+    file.seek(0)
+    return hasher.hexdigest()
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    Хранилище, в котором имя файла определяется хэшем содержимого.
+    Повторная загрузка того же логотипа (в продукт, проект или партнёра)
+    не создаёт копию, а возвращает имя уже сохранённого файла.
+    """
+
+    def get_available_name(self, name, max_length=None):
+        if self.exists(name):
+            raise FileAlreadyStored(name)
+        return super().get_available_name(name, max_length=max_length)
+
+    def save(self, name, content, max_length=None):
+        try:
+            return super().save(name, content, max_length=max_length)
+        except FileAlreadyStored as exc:
+            return str(exc)
+
+
+logo_storage = ContentAddressedStorage()
@@ -1,3 +1,962 @@
-from django.test import TestCase
+import json
+import os
+import tempfile
+from datetime import date, datetime
+from io import BytesIO, StringIO
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync, iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import OperationalError, connection, transaction
+from django.db.utils import ConnectionHandler
+from django.db.models import Count
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase as DjangoTestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from openpyxl import Workbook
+from PIL import Image
+from rest_framework.test import APIClient
+
+from Product_portfolio.settings import database_config
+
+from .importing import ImportFileError, PortfolioImporter, read_rows
+from .cache import get_versions
+from .db import atomic_with_retry
+from .db_routers import PrimaryReplicaRouter, read_from_replica
+from .models import (
+    ChangeLog, Membership, Partner, Product, ProductStats, ProductStatus, Project, ProjectRole, ProjectStage,
+    ProjectStatus, Role, SearchDocument, Sphere,
+)
+from .middleware import MetricsMiddleware, ReplicaRoutingMiddleware
+from .schema import reset_schema_cache
+from .seeding import seed_portfolio
+from .storage import logo_storage
+from .views import ProductViewSet
+
+User = get_user_model()
+
+
+class TestCase(DjangoTestCase):
+    """
+    Версии кэша поднимаются после фиксации транзакции, а тест TestCase её не фиксирует:
+    каждый тест начинает с пустого кэша, чтобы не получить ответы предыдущих тестов.
+    """
+
+    def _pre_setup(self):
+        super()._pre_setup()
+        cache.clear()
+
+
+class QueryCountTests(TestCase):
+    """Количество SQL-запросов на списках не должно зависеть от числа строк."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.users = [User.objects.create(username=f'user{i}') for i in range(3)]
+        self.sphere = Sphere.objects.create(name='Образование')
+        self.partner = Partner.objects.create(name='Партнёр')
+        self.role = Role.objects.create(name='Бекендер')
+
+    def create_product(self, index):
+        # Версии кэша поднимаются при фиксации, иначе списки отдавались бы из кэша
+        with self.captureOnCommitCallbacks(execute=True):
+            return self._create_product(index)
+
+    def _create_product(self, index):
+        product = Product.objects.create(name=f'Продукт {index}')
+        product.owners.set(self.users)
+        product.curators.set(self.users[:1])
+        product.partners.add(self.partner)
+        product.spheres.add(self.sphere)
+        project = Project.objects.create(name=f'Проект {index}', product=product)
+        project.curators.set(self.users[:1])
+        project.members.set(self.users)
+        project.partners.add(self.partner)
+        ProjectStage.objects.create(project=project, name='Старт')
+        ProjectRole.objects.create(member=self.users[index % len(self.users)], role=self.role, project=project)
+        return product
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(context.captured_queries)
+
+    def assertConstantQueries(self, url):
+        self.create_product(0)
+        few = self.count_queries(url)
+        for index in range(1, 10):
+            self.create_product(index)
+        many = self.count_queries(url)
+        self.assertEqual(few, many)
+
+    def test_products_list(self):
+        self.assertConstantQueries('/api/products/')
+
+    def test_projects_list(self):
+        self.assertConstantQueries('/api/projects/')
+
+    def test_project_roles_list(self):
+        self.assertConstantQueries('/api/project-roles/')
+
+    def test_sparse_fieldsets_skip_joins(self):
+        self.create_product(0)
+        # Плюс один агрегирующий запрос для ETag/Last-Modified (ConditionalGetMixin)
+        self.assertEqual(self.count_queries('/api/products/?fields=id,name,logo'), 2)
+        self.assertEqual(self.count_queries('/api/projects/?fields=id,name&expand='), 2)
+        self.assertEqual(self.count_queries('/api/project-roles/?fields=id,role_name'), 2)
+
+    def test_product_detail_and_actions(self):
+        product = self.create_product(0)
+        self.assertEqual(self.count_queries(f'/api/products/{product.pk}/'), 6)
+        self.assertEqual(self.count_queries(f'/api/products/{product.pk}/owners/'), 2)
+
+    def test_conditional_get(self):
+        product = self.create_product(0)
+        for url in ('/api/products/', f'/api/products/{product.pk}/', '/api/project-roles/'):
+            response = self.client.get(url)
+            etag, last_modified = response['ETag'], response['Last-Modified']
+            with CaptureQueriesContext(connection) as context:
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 304)
+            self.assertEqual(len(context.captured_queries), 1)
+            response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+            self.assertEqual(response.status_code, 304)
+
+        etag = self.client.get('/api/products/')['ETag']
+        product.owners.remove(self.users[0])
+        self.assertEqual(self.client.get('/api/products/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+        etag = self.client.get('/api/products/')['ETag']
+        self.partner.name = 'Новое название'
+        self.partner.save()
+        self.assertEqual(self.client.get('/api/products/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_last_modified_when_row_leaves_filter(self):
+        active, closed = ProductStatus.objects.create(name='Активный'), ProductStatus.objects.create(name='Закрыт')
+        first = Product.objects.create(name='Первый', status=active)
+        second = Product.objects.create(name='Второй', status=active)
+        Product.objects.filter(pk=first.pk).update(updated_at='2024-01-01T00:00:00Z')
+        Product.objects.filter(pk=second.pk).update(updated_at='2024-06-01T00:00:00Z')
+        Partner.objects.update(updated_at='2024-01-01T00:00:00Z')  # Вложенные партнёры тоже участвуют в Last-Modified
+        url = f'/api/products/?status={active.pk}'
+        last_modified = self.client.get(url)['Last-Modified']
+
+        # Без учёта времени записи MAX(updated_at) откатился бы к первому продукту, и клиент получил бы 304
+        with self.captureOnCommitCallbacks(execute=True):
+            second.status = closed
+            second.save()
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row['id'] for row in response.json()['results']], [first.pk])
+        self.assertEqual(self.client.get(url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']).status_code, 304)
+
+    def test_async_views_match_sync(self):
+        product = self.create_product(0)
+        for path in ('products/', 'projects/', f'products/{product.pk}/', 'project-stages/'):
+            expected = self.client.get(f'/api/{path}').json()
+            response = async_to_sync(self.async_client.get)(f'/api/async/{path}')
+            self.assertEqual(response.status_code, 200)
+            data = response.json()
+            self.assertEqual(data.get('results', data), expected.get('results', expected))
+
+
+class PaginationTests(TestCase):
+    """Курсорная пагинация: страницы по условию на id без OFFSET и ограниченный размер страницы."""
+
+    def test_keyset_pages(self):
+        products = [Product.objects.create(name=f'Продукт {index}') for index in range(5)]
+        first = self.client.get('/api/products/?page_size=2&fields=id').json()
+        self.assertEqual([row['id'] for row in first['results']], [product.pk for product in products[:2]])
+        self.assertIsNone(first['previous'])
+
+        with CaptureQueriesContext(connection) as queries:
+            second = self.client.get(first['next']).json()
+        self.assertEqual([row['id'] for row in second['results']], [product.pk for product in products[2:4]])
+        # Страница выбирается с LIMIT page_size + 1, лишняя строка показывает, есть ли следующая
+        page_sql = next(query['sql'] for query in queries.captured_queries if ' LIMIT 3' in query['sql'])
+        self.assertIn(f'"id" > {products[1].pk}', page_sql)
+        self.assertNotIn('OFFSET', page_sql)
+
+        with override_settings(REST_FRAMEWORK={**settings.REST_FRAMEWORK, 'MAX_PAGE_SIZE': 3}):
+            self.assertEqual(len(self.client.get('/api/products/?page_size=1000').json()['results']), 3)
+
+
+class ExportTests(TestCase):
+    """Выгрузка /export/ отдаёт NDJSON потоком, учитывает фильтры и подгружает связи порциями."""
+
+    def export(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+            self.assertTrue(response.streaming)
+            lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson; charset=utf-8')
+        return [json.loads(line) for line in lines], len(queries)
+
+    def test_export_streams_rows(self):
+        user = User.objects.create(username='intern')
+        status = ProjectStatus.objects.create(name='В работе')
+        product = Product.objects.create(name='Продукт')
+        for index in range(8):
+            project_status = status if index % 2 else None
+            Project.objects.create(name=f'Проект {index}', product=product, status=project_status).members.add(user)
+
+        rows, small = self.export(f'/api/projects/export/?status={status.pk}&chunk_size=100')
+        self.assertEqual([row['name'] for row in rows], ['Проект 1', 'Проект 3', 'Проект 5', 'Проект 7'])
+        self.assertEqual(rows[0]['members'][0]['username'], 'intern')
+        rows, large = self.export('/api/projects/export/?chunk_size=100')
+        self.assertEqual(len(rows), 8)
+        # Связи подгружаются prefetch-запросом на порцию, а не на строку
+        self.assertEqual(small, large)
+        self.assertGreater(self.export('/api/projects/export/?chunk_size=2')[1], large)
+
+
+def image_bytes(image_format='PNG', size=(800, 400)):
+    buffer = BytesIO()
+    Image.new('RGB', size, 'red').save(buffer, image_format)
+    return buffer.getvalue()
+
+
+@override_settings(LOGO_PROCESSING_ASYNC=False)
+class LogoTests(TestCase):
+    """Логотипы проверяются по содержимому, хранятся по хэшу и получают миниатюры после фиксации."""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        media = override_settings(MEDIA_ROOT=directory.name)
+        media.enable()
+        self.addCleanup(media.disable)
+
+    def test_validation_checks_content(self):
+        Partner(name='Банк', logo=SimpleUploadedFile('logo.png', image_bytes())).full_clean()
+        Partner(name='Банк', logo=SimpleUploadedFile('logo.svg', b'<svg xmlns="http://www.w3.org/2000/svg"/>')).full_clean()
+        for name, content in (
+            ('logo.png', b'not an image'),
+            ('logo.jpg', image_bytes('PNG')),
+            ('logo.png', image_bytes('PNG')[:100]),
+            ('logo.svg', b'<html></html>'),
+            ('logo.gif', image_bytes('GIF')),
+        ):
+            with self.assertRaises(ValidationError, msg=name) as context:
+                Partner(name='Банк', logo=SimpleUploadedFile(name, content)).full_clean()
+            self.assertIn('logo', context.exception.message_dict)
+
+    def test_variants_and_dedup(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            product = Product.objects.create(name='Кошелёк', logo=SimpleUploadedFile('a.png', image_bytes()))
+            partner = Partner.objects.create(name='Банк', logo=SimpleUploadedFile('b.png', image_bytes()))
+        product.refresh_from_db()
+        partner.refresh_from_db()
+        # Одинаковое содержимое хранится одним файлом с именем по хэшу
+        self.assertEqual(product.logo.name, partner.logo.name)
+        self.assertEqual(set(product.logo_variants), {'source', 'thumb', 'thumb_webp', 'medium', 'medium_webp'})
+        with logo_storage.open(product.logo_variants['thumb_webp']) as file:
+            self.assertEqual(Image.open(file).size, (200, 100))
+        data = self.client.get(f'/api/products/{product.pk}/').json()
+        self.assertTrue(data['logo_variants']['thumb'].endswith('.png'))
+        self.assertEqual(set(data['logo_variants']), {'thumb', 'thumb_webp', 'medium', 'medium_webp'})
+
+
+@override_settings(DB_WRITE_RETRY_DELAY=0)
+class SQLiteTuningTests(TransactionTestCase):
+    """Режим производительности SQLite и повтор записи при database is locked."""
+
+    def test_tuned_connection(self):
+        with tempfile.TemporaryDirectory() as directory, mock.patch.dict(os.environ, {'SQLITE_TUNING': 'True'}):
+            handler = ConnectionHandler({'default': database_config('DB_', os.path.join(directory, 'tuned.sqlite3'))})
+            try:
+                with handler['default'].cursor() as cursor:
+                    cursor.execute('PRAGMA journal_mode')
+                    self.assertEqual(cursor.fetchone()[0], 'wal')
+                    cursor.execute('PRAGMA synchronous')
+                    self.assertEqual(cursor.fetchone()[0], 1)  # NORMAL
+            finally:
+                handler.close_all()
+
+    def test_locked_write_is_retried(self):
+        attempts = []
+
+        def perform_create(view, serializer):
+            attempts.append(serializer.validated_data['name'])
+            if len(attempts) == 1:
+                raise OperationalError('database is locked')
+            serializer.save()
+
+        with mock.patch('rest_framework.mixins.CreateModelMixin.perform_create', perform_create):
+            response = APIClient().post('/api/spheres/', {'name': 'Финансы'}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(attempts, ['Финансы', 'Финансы'])
+        self.assertEqual(Sphere.objects.get().name, 'Финансы')
+
+        def locked():
+            raise OperationalError('database is locked')
+
+        # Внутри внешней транзакции повтор невозможен: ошибка пробрасывается сразу
+        with transaction.atomic(), self.assertRaises(OperationalError):
+            atomic_with_retry(locked)
+
+
+class AdminQueryBudgetTests(TestCase):
+    """Число запросов страниц админки не должно расти с числом строк и пользователей."""
+
+    def setUp(self):
+        self.admin = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        self.client.force_login(self.admin)
+        self.role = Role.objects.create(name='Бекендер')
+        self.product = Product.objects.create(name='Продукт')
+        self.project = Project.objects.create(name='Проект', product=self.product)
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(context.captured_queries)
+
+    def add_rows(self, count):
+        for index in range(count):
+            user = User.objects.create(username=f'intern{self.project.stages.count()}_{index}')
+            product = Product.objects.create(name=f'Продукт {user.pk}')
+            Project.objects.create(name=f'Проект {user.pk}', product=product)
+            ProjectStage.objects.create(project=self.project, name=f'Этап {user.pk}')
+            ProjectRole.objects.create(member=user, role=self.role, project=self.project)
+            self.project.members.add(user)
+
+    def assertBudget(self, url):
+        self.add_rows(2)
+        self.count_queries(url)  # Прогрев кэша ContentType
+        few = self.count_queries(url)
+        self.add_rows(8)
+        self.assertEqual(self.count_queries(url), few)
+
+    def test_product_changelist(self):
+        self.assertBudget('/admin/product_app/product/')
+
+    def test_project_changelist(self):
+        self.assertBudget('/admin/product_app/project/')
+
+    def test_project_change_view(self):
+        self.assertBudget(f'/admin/product_app/project/{self.project.pk}/change/')
+
+    def test_product_change_view(self):
+        self.assertBudget(f'/admin/product_app/product/{self.product.pk}/change/')
+
+
+class PortfolioStatsTests(TestCase):
+    """Сводки пересчитываются сигналами после фиксации транзакции."""
+
+    def test_rollups_follow_changes(self):
+        users = [User.objects.create(username=f'intern{i}') for i in range(3)]
+        status = ProjectStatus.objects.create(name='В работе')
+        with self.captureOnCommitCallbacks(execute=True):
+            product = Product.objects.create(name='Продукт')
+            other = Product.objects.create(name='Другой продукт')
+            project = Project.objects.create(name='Проект', product=product, status=status)
+            Project.objects.create(name='Черновик', product=product)
+            project.members.set(users)
+            ProjectStage.objects.create(project=project, name='Старт')
+        product_stats = ProductStats.objects.get(product=product)
+        self.assertEqual(product_stats.project_count, 2)
+        self.assertEqual(product_stats.intern_count, 3)
+        self.assertEqual(product_stats.projects_by_status, {'В работе': 1, 'Без статуса': 1})
+        self.assertEqual((project.stats.intern_count, project.stats.stage_count), (3, 1))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            project.product = other
+            project.save()
+        self.assertEqual(ProductStats.objects.get(product=product).project_count, 1)
+        self.assertEqual(ProductStats.objects.get(product=other).intern_count, 3)
+
+        response = APIClient().get('/api/stats/')
+        self.assertEqual(response.data['projects'], 2)
+        self.assertEqual(response.data['projects_by_status'], {'В работе': 1, 'Без статуса': 1})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            status.name = 'Запущен'
+            status.save()
+        self.assertEqual(ProductStats.objects.get(product=other).projects_by_status, {'Запущен': 1})
+        with self.captureOnCommitCallbacks(execute=True):
+            status.delete()
+        self.assertEqual(ProductStats.objects.get(product=other).projects_by_status, {'Без статуса': 1})
+        self.assertEqual(APIClient().get('/api/stats/').data['projects_by_status'], {'Без статуса': 2})
+
+
+@override_settings(CHANGES_SETTLE_SECONDS=0)
+class ChangeFeedTests(TestCase):
+    """Лента изменений отдаёт только записи после курсора, включая связи и удаления."""
+
+    def read(self, since, **params):
+        response = APIClient().get('/api/changes/', {'since': since, **params})
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_feed_follows_cursor(self):
+        user = User.objects.create(username='owner')
+        product = Product.objects.create(name='Продукт')
+        cursor = self.read(0)['cursor']
+
+        product.owners.add(user)
+        user.projects_as_member.add(Project.objects.create(name='Проект', product=product))
+        product.delete()
+        data = self.read(cursor, model='product,project')
+        changes = [(row['model'], row['action'], row['field']) for row in data['changes']]
+        self.assertEqual(changes, [
+            ('product', 'm2m', 'owners'),
+            ('project', 'create', ''),
+            ('project', 'm2m', 'members'),
+            ('project', 'delete', ''),
+            ('product', 'delete', ''),
+        ])
+        self.assertEqual(self.read(data['cursor'])['changes'], [])
+
+        page = self.read(cursor, limit=2)
+        self.assertTrue(page['has_more'])
+        self.assertEqual(len(page['changes']), 2)
+
+
+class BulkTests(TestCase):
+    """Пакетные операции /bulk/: upsert больших пакетов, число запросов и проверка id."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.project = Project.objects.create(name='Проект', product=Product.objects.create(name='Продукт'))
+        self.role = Role.objects.create(name='Бекендер')
+
+    def test_upsert_separates_created_and_updated(self):
+        users = User.objects.bulk_create(User(username=f'user{i}') for i in range(1200))
+        existing = ProjectRole.objects.create(member=users[0], role=self.role, project=self.project)
+        other_role = Role.objects.create(name='Фронтендер')
+        items = [{'member': user.pk, 'role': other_role.pk, 'project': self.project.pk} for user in users]
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post('/api/project-roles/bulk/', items, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(response.data), 1200)
+        # Связи разрешаются одним in_bulk на поле: запросы растут с числом пачек, а не элементов
+        self.assertLess(len(queries), 60)
+        existing.refresh_from_db()
+        self.assertEqual(existing.role, other_role)
+
+        actions = dict(
+            ChangeLog.objects.filter(model='projectrole').values_list('action').annotate(Count('id'))
+        )
+        self.assertEqual(actions, {'create': 1200, 'update': 1})
+
+    def test_duplicate_pairs_in_upsert(self):
+        user = User.objects.create(username='user')
+        other_role = Role.objects.create(name='Фронтендер')
+        items = [
+            {'member': user.pk, 'role': role.pk, 'project': self.project.pk} for role in (self.role, other_role)
+        ]
+        response = self.client.post('/api/project-roles/bulk/', items, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(response.data), 1)
+        self.assertEqual(ProjectRole.objects.get(member=user, project=self.project).role, other_role)
+
+    def test_invalid_ids(self):
+        stage = ProjectStage.objects.create(project=self.project, name='Старт')
+        url = '/api/project-stages/bulk/'
+
+        response = self.client.delete(url, ['abc', stage.pk], format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['errors'][1], {})
+        response = self.client.patch(url, [stage.pk, {'id': 'abc'}, {'id': stage.pk + 1}], format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([list(error) for error in response.data['errors']], [['non_field_errors'], ['id'], ['id']])
+        response = self.client.post(url, [{'project': 'abc', 'name': 'Финиш'}], format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('project', response.data['errors'][0])
+
+        # id шире BIGINT — ошибка элемента, а не OverflowError в pk__in
+        huge = 10 ** 20
+        response = self.client.delete(url, [huge], format='json')
+        self.assertEqual(response.status_code, 400)
+        response = self.client.patch(url, [{'id': huge, 'name': 'Запуск'}], format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(list(response.data['errors'][0]), ['id'])
+        response = self.client.post(url, [{'project': huge, 'name': 'Финиш'}], format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('project', response.data['errors'][0])
+        response = self.client.post(
+            '/api/project-roles/bulk/', [{'member': huge, 'role': self.role.pk, 'project': self.project.pk}],
+            format='json',
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('member', response.data['errors'][0])
+
+        response = self.client.patch(url, [{'id': str(stage.pk), 'name': 'Запуск'}], format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data[0]['name'], 'Запуск')
+        response = self.client.delete(url, [str(stage.pk)], format='json')
+        self.assertEqual(response.data, {'deleted': 1})
+
+
+@mock.patch('product_app.db_routers.replica_configured', return_value=True)
+@mock.patch('product_app.middleware.replica_configured', return_value=True)
+class ReplicaRoutingTests(TestCase):
+    """Чтения API идут на реплику и в синхронной, и в асинхронной цепочке middleware."""
+
+    def test_async_chain(self, *mocks):
+        view, seen = ProductViewSet.as_view({'get': 'list'}), []
+
+        async def get_response(request):
+            # Так асинхронный обработчик Django вызывает синхронный process_view
+            await sync_to_async(middleware.process_view)(request, view, (), {})
+            seen.append(PrimaryReplicaRouter().db_for_read(Product))
+            return HttpResponse()
+
+        middleware = ReplicaRoutingMiddleware(get_response)
+        self.assertTrue(iscoroutinefunction(middleware))
+        async_to_sync(middleware)(RequestFactory().get('/api/products/'))
+        self.assertEqual(seen, ['replica'])
+        self.assertFalse(read_from_replica.get())
+
+    def test_sync_chain(self, *mocks):
+        view, seen = ProductViewSet.as_view({'get': 'list'}), []
+
+        def get_response(request):
+            middleware.process_view(request, view, (), {})
+            seen.append(PrimaryReplicaRouter().db_for_read(Product))
+            return HttpResponse()
+
+        middleware = ReplicaRoutingMiddleware(get_response)
+        self.assertFalse(iscoroutinefunction(middleware))
+        middleware(RequestFactory().get('/api/products/'))
+        response = middleware(RequestFactory().post('/api/products/'))
+        self.assertEqual(seen, ['replica', 'default'])
+        self.assertIn('db_primary_until', response.cookies)
+        self.assertFalse(read_from_replica.get())
+
+
+class SearchTests(TestCase):
+    """Полнотекстовый поиск SQLite (FTS5): ранжирование, транслитерация и постраничная выдача."""
+
+    def search(self, **params):
+        response = self.client.get('/api/search/', params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_title_match_ranks_first(self):
+        Product.objects.create(name='Платформа', description='Обучение стажёров в школе')
+        Product.objects.create(name='Обучение')
+        for name in ('Склад', 'Касса', 'Витрина'):
+            Product.objects.create(name=name)  # Иначе слово есть во всех документах и bm25 ранжирует их одинаково нулём
+        results = self.search(q='обучение')['results']
+        self.assertEqual([row['title'] for row in results], ['Обучение', 'Платформа'])
+        self.assertGreater(results[0]['rank'], results[1]['rank'])
+
+    def test_transliteration(self):
+        sphere = Sphere.objects.create(name='Кловери')
+        results = self.search(q='kloveri')['results']
+        self.assertEqual(results, [{'type': 'sphere', 'id': sphere.pk, 'title': 'Кловери', 'rank': results[0]['rank']}])
+        self.assertEqual(self.search(q='клов')['count'], 1)
+        self.assertEqual(self.client.get('/api/search/').status_code, 400)
+
+    def test_pagination(self):
+        for index in range(25):
+            Partner.objects.create(name=f'Партнёр {index}')
+        first = self.search(q='партнёр')
+        self.assertEqual((first['count'], len(first['results'])), (25, 20))
+        second = self.search(q='партнёр', page=2)
+        self.assertEqual(len(second['results']), 5)
+        titles = {row['title'] for row in first['results'] + second['results']}
+        self.assertEqual(len(titles), 25)
+
+
+class MetricsTests(TestCase):
+    """Middleware метрик подписывает ответ Server-Timing и копит гистограммы по действиям."""
+
+    def test_server_timing_and_metrics(self):
+        Product.objects.create(name='Продукт')
+        response = self.client.get('/api/products/')
+        self.assertRegex(response['Server-Timing'], r'^app;dur=[\d.]+, db;dur=[\d.]+;desc="\d+ queries", serialize')
+        metrics = self.client.get('/metrics').content.decode()
+        self.assertIn(
+            'http_request_duration_seconds_count{view="ProductViewSet",action="list",method="GET"}', metrics
+        )
+
+    def test_asgi_counts_queries(self):
+        async def get_response(request):
+            return HttpResponse()
+
+        self.assertTrue(iscoroutinefunction(MetricsMiddleware(get_response)))
+        Product.objects.create(name='Продукт')
+        # Под ASGI представление ходит в базу из потока sync_to_async
+        response = async_to_sync(self.async_client.get)('/api/products/')
+        self.assertEqual(response.status_code, 200)
+        self.assertRegex(response['Server-Timing'], r'db;dur=[\d.]+;desc="[1-9]\d* queries"')
+
+    def test_profile_is_staff_only(self):
+        self.assertNotIn(b'function calls', self.client.get('/api/products/?profile=1').content)
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'password'))
+        self.assertIn(b'function calls', self.client.get('/api/products/?profile=1').content)
+
+
+class SeedPortfolioTests(TestCase):
+    """Синтетический портфель заполняет связи, индекс и сводки без сигналов."""
+
+    def test_seed_portfolio(self):
+        counts = seed_portfolio(products=5, projects=2, stages=3, interns=2, users=10, seed=1)
+        self.assertEqual((counts['projects'], counts['stages'], counts['project_roles']), (10, 30, 20))
+        self.assertEqual(ProductStats.objects.filter(project_count=2).count(), 5)
+        self.assertEqual(Project.members.through.objects.count(), 20)
+        self.assertEqual(len(self.client.get('/api/products/').json()['results']), 5)
+
+
+class ProductCardTests(TestCase):
+    """Карточки каталога следуют за продуктом, справочниками и проектами и читаются без JOIN."""
+
+    def card(self, product):
+        return self.client.get(f'/api/product-cards/{product.pk}/').json()
+
+    def test_card_follows_changes(self):
+        status = ProductStatus.objects.create(name='Пилот')
+        sphere = Sphere.objects.create(name='Финансы')
+        product = Product.objects.create(name='Кошелёк', status=status)
+        other = Product.objects.create(name='Склад')
+        with self.captureOnCommitCallbacks(execute=True):
+            product.spheres.add(sphere)
+            Partner.objects.create(name='Банк').products_as_partner.add(product)
+            project = Project.objects.create(name='Приложение', product=product)
+        card = self.card(product)
+        self.assertEqual(
+            (card['status_name'], card['spheres'], card['partners'], card['project_count']),
+            ('Пилот', ['Финансы'], ['Банк'], 1),
+        )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            sphere.name = 'Финтех'
+            sphere.save()
+            status.delete()
+            project.product = other
+            project.save()
+        card = self.card(product)
+        self.assertEqual((card['status_name'], card['spheres'], card['project_count']), ('', ['Финтех'], 0))
+        self.assertEqual(self.card(other)['project_count'], 1)
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(len(self.client.get('/api/product-cards/').json()['results']), 2)
+        self.assertTrue(all('JOIN' not in query['sql'] for query in queries.captured_queries))
+
+
+class ListFilterTests(TestCase):
+    """Фильтры списков компилируются в один запрос с EXISTS и не дублируют строки."""
+
+    def ids(self, url):
+        return [row['id'] for row in self.client.get(url).json()['results']]
+
+    def test_compound_filters_and_ordering(self):
+        intern = User.objects.create(username='intern')
+        finance, retail = Sphere.objects.create(name='Финансы'), Sphere.objects.create(name='Ритейл')
+        wallet = Product.objects.create(name='Кошелёк', created_at='2024-03-01')
+        wallet.spheres.add(finance, retail)
+        shop = Product.objects.create(name='Магазин', created_at='2024-06-01')
+        shop.spheres.add(retail)
+        early = Project.objects.create(name='Бот', product=wallet, end_date='2025-02-01')
+        late = Project.objects.create(name='Касса', product=wallet, end_date='2025-09-01')
+        other = Project.objects.create(name='Витрина', product=shop, end_date='2025-03-01')
+        for project in (early, late, other):
+            project.members.add(intern)
+
+        self.assertEqual(self.ids(f'/api/products/?sphere={finance.pk},{retail.pk}'), [wallet.pk, shop.pk])
+        self.assertEqual(self.ids('/api/products/?created_at__gte=2024-05-01'), [shop.pk])
+        self.assertEqual(self.ids('/api/products/?ordering=-name'), [shop.pk, wallet.pk])
+        with CaptureQueriesContext(connection) as queries:
+            ids = self.ids(
+                f'/api/projects/?sphere={finance.pk}&member={intern.pk}'
+                f'&end_date__gte=2025-01-01&end_date__lte=2025-03-31&fields=id'
+            )
+        self.assertEqual(ids, [early.pk])
+        self.assertIn('EXISTS', queries.captured_queries[-1]['sql'])
+        self.assertEqual(self.ids('/api/projects/?ordering=-name&fields=id'), [late.pk, other.pk, early.pk])
+        self.assertEqual(self.client.get('/api/projects/?member=abc').status_code, 400)
+
+    def test_out_of_range_ids(self):
+        for url in (
+            '/api/products/?status=99999999999999999999',
+            '/api/products/?owner=1,99999999999999999999',
+            '/api/projects/?sphere=0',
+            '/api/projects/?member=-1',
+        ):
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 400, url)
+
+    def test_paging_across_null_dates(self):
+        product = Product.objects.create(name='Продукт')
+        projects = [
+            Project.objects.create(name=f'Проект {i}', product=product, start_date=None if i % 2 else '2025-01-01')
+            for i in range(5)
+        ]
+        # Поле с NULL не входит в ordering_fields: сортировка игнорируется, курсоры остаются рабочими
+        url, ids = '/api/projects/?ordering=start_date&page_size=2&fields=id', []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            ids += [row['id'] for row in response.json()['results']]
+            url = response.json()['next']
+        self.assertEqual(ids, [project.pk for project in projects])
+
+
+class TimelineTests(TestCase):
+    """Таймлайн отдаёт этапы окна столбцами одним запросом и помечает конфликты."""
+
+    def test_timeline_columns_and_flags(self):
+        product = Product.objects.create(name='Продукт')
+        project = Project.objects.create(
+            name='Проект', product=product, start_date='2025-01-01', end_date='2025-06-30'
+        )
+        design = ProjectStage.objects.create(
+            project=project, name='Дизайн', start_date='2025-01-01', end_date='2025-02-15'
+        )
+        build = ProjectStage.objects.create(
+            project=project, name='Разработка', start_date='2025-02-01', end_date='2025-07-31'
+        )
+        ProjectStage.objects.create(project=project, name='Поддержка', start_date='2026-01-01', end_date='2026-03-01')
+
+        with CaptureQueriesContext(connection) as queries:
+            data = self.client.get('/api/timeline/?from=2025-01-01&to=2025-12-31').json()
+        self.assertEqual(len(queries), 1)
+        self.assertEqual(data['products'], {'id': [product.pk], 'name': ['Продукт']})
+        self.assertEqual(data['projects']['id'], [project.pk])
+        stages = data['stages']
+        self.assertEqual(stages['id'], [design.pk, build.pk])
+        self.assertEqual(stages['project'], [project.pk, project.pk])
+        self.assertEqual(stages['overlaps'], [True, True])
+        self.assertEqual(stages['outside_project'], [False, True])
+        self.assertFalse(data['truncated'])
+        self.assertEqual(self.client.get('/api/timeline/?from=2025-12-31&to=2025-01-01').status_code, 400)
+
+    def test_out_of_range_ids(self):
+        for param in ('product', 'project'):
+            response = self.client.get(f'/api/timeline/?{param}=99999999999999999999')
+            self.assertEqual(response.status_code, 400)
+            self.assertIn(param, response.json())
+
+
+class MembershipTests(TestCase):
+    """Действия owners/curators/members проверяют тело запроса и id пользователей."""
+
+    def test_user_ids_validation(self):
+        user = User.objects.create(username='owner')
+        url = f'/api/products/{Product.objects.create(name="Продукт").pk}/owners/'
+        client = APIClient()
+
+        for body in ([user.pk], {'user_ids': [user.pk, 'abc']}, {'user_ids': [True]}, {'user_ids': [2 ** 70]}):
+            self.assertEqual(client.post(url, body, format='json').status_code, 400, body)
+        self.assertEqual(client.post(url, {'user_ids': 5}, format='json').status_code, 400)
+        self.assertEqual(client.post(url, {}, format='json').status_code, 400)
+        self.assertEqual(client.post(url, {'user_ids': [user.pk + 1]}, format='json').status_code, 404)
+
+        response = client.post(url, {'user_ids': [user.pk, str(user.pk)]}, format='json')
+        self.assertEqual(response.data['user_ids'], [user.pk])
+        self.assertEqual(client.put(url, {'user_ids': []}, format='json').status_code, 200)
+        self.assertEqual(client.get(url).data, [])
+
+
+class PortfolioTests(TestCase):
+    """Индекс участия следует за связями и ролями; портфель читается одним запросом."""
+
+    def test_portfolio_follows_memberships(self):
+        user = User.objects.create(username='intern')
+        role = Role.objects.create(name='Дизайнер')
+        product, other = Product.objects.create(name='Продукт'), Product.objects.create(name='Другой')
+        project = Project.objects.create(name='Проект', product=product)
+        product.owners.add(user)
+        user.projects_as_member.add(project)
+        project.curators.add(user)
+        ProjectRole.objects.create(member=user, project=project, role=role)
+
+        with CaptureQueriesContext(connection) as queries:
+            data = self.client.get(f'/api/users/{user.pk}/portfolio/').json()
+        self.assertEqual(len(queries), 1)
+        self.assertEqual(data['products'], [{'id': product.pk, 'name': 'Продукт', 'roles': ['owner']}])
+        self.assertEqual(data['projects'], [{
+            'id': project.pk, 'name': 'Проект', 'product': product.pk,
+            'roles': ['curator', 'member'], 'project_role': 'Дизайнер',
+        }])
+
+        project.product = other
+        project.save()
+        project.curators.remove(user)
+        user.products_as_owner.clear()
+        self.client.force_login(user)
+        data = self.client.get('/api/me/portfolio/').json()
+        self.assertEqual(data['products'], [{'id': other.pk, 'name': 'Другой', 'roles': []}])
+        self.assertEqual(data['projects'][0]['roles'], ['member'])
+
+        project.members.clear()
+        ProjectRole.objects.all().delete()
+        self.assertEqual(self.client.get('/api/me/portfolio/').json()['projects'], [])
+        self.client.logout()
+        self.assertEqual(self.client.get('/api/me/portfolio/').status_code, 403)
+        self.assertEqual(self.client.get('/api/users/999/portfolio/').status_code, 404)
+        self.assertEqual(self.client.get('/api/users/99999999999999999999/portfolio/').status_code, 404)
+
+
+class ImportTests(TestCase):
+    """Импорт CSV и XLSX: справочники по названиям, связи и роли пачками, отчёт об ошибках по строкам."""
+
+    def setUp(self):
+        self.user = User.objects.create(username='ivanov')
+        Partner.objects.create(name='Партнёр')
+
+    def run_import(self, kind, content, dry_run=False):
+        errors = []
+        importer = PortfolioImporter(kind, dry_run=dry_run, on_error=lambda line, message: errors.append(line))
+        with self.captureOnCommitCallbacks(execute=True):
+            created, _ = importer.run(read_rows(BytesIO(content.encode()), f'{kind}.csv'))
+        return created, errors
+
+    def test_import_products_and_projects(self):
+        products = (
+            'name,created_at,status,spheres,partners,owners\n'
+            'Продукт,01.02.2025,Пилот,Финансы; Ритейл,Партнёр,ivanov\n'
+            'Без даты,31-31-2025,,,,\n'
+            'Чужой,,,,,petrov\n'
+        )
+        self.assertEqual(self.run_import('products', products, dry_run=True), (1, [3, 4]))
+        self.assertFalse(Product.objects.exists())
+
+        self.assertEqual(self.run_import('products', products), (1, [3, 4]))
+        product = Product.objects.get()
+        self.assertEqual(product.status.name, 'Пилот')
+        self.assertEqual(product.card.spheres, ['Ритейл', 'Финансы'])
+        self.assertEqual(product.card.partners, ['Партнёр'])
+
+        projects = 'name,product,start_date,end_date,members\nПроект,Продукт,2025-03-01,2025-06-01,ivanov:Дизайнер\n'
+        self.assertEqual(self.run_import('projects', projects), (1, []))
+        project = Project.objects.get()
+        self.assertEqual(list(project.members.all()), [self.user])
+        self.assertEqual(project.project_roles.get().role.name, 'Дизайнер')
+        self.assertEqual(
+            sorted(Membership.objects.filter(user=self.user).values_list('kind', flat=True)),
+            ['product_owner', 'project_member', 'project_role'],
+        )
+        self.assertTrue(SearchDocument.objects.filter(kind='project', object_id=project.pk).exists())
+
+    def test_import_xlsx(self):
+        workbook = Workbook()
+        workbook.active.title = 'Сводка'
+        workbook.active.append(['name'])
+        workbook.active.append(['Не продукт'])
+        sheet = workbook.create_sheet('products')
+        sheet.append(['Name', 'created_at', 'status', 'owners'])
+        sheet.append(['Кошелёк', datetime(2025, 2, 1, 12, 30), 'Пилот', 'ivanov'])
+        sheet.append([None, None, None, None])  # Пустая строка пропускается
+        sheet.append(['Склад', '31.03.2025', None, None])
+        content = BytesIO()
+        workbook.save(content)
+
+        importer = PortfolioImporter('products')
+        with self.captureOnCommitCallbacks(execute=True):
+            created, _ = importer.run(read_rows(BytesIO(content.getvalue()), 'products.xlsx', sheet='products'))
+        self.assertEqual(created, 2)
+        self.assertEqual(
+            list(Product.objects.order_by('name').values_list('name', 'created_at')),
+            [('Кошелёк', date(2025, 2, 1)), ('Склад', date(2025, 3, 31))],
+        )
+        self.assertEqual(list(Product.objects.get(name='Кошелёк').owners.all()), [self.user])
+        # Листа с таким именем нет — читается первый
+        rows = list(read_rows(BytesIO(content.getvalue()), 'products.xlsx', sheet='projects'))
+        self.assertEqual(rows, [(2, {'name': 'Не продукт'})])
+        with self.assertRaises(ImportFileError):
+            list(read_rows(BytesIO(b'name\n'), 'products.xlsx'))
+
+    def test_rejected_rows_create_no_lookups(self):
+        products = (
+            'name,status,sales_model,spheres,owners\n'
+            'Кошелёк,Пилот,Подписка,Финансы,ivanov\n'
+            'Склад,Черновик,Лицензия,Логистика; Финансы,petrov\n'
+            'Касса,Пилот,,Ритейл,ivanov\n'
+        )
+        self.assertEqual(self.run_import('products', products), (2, [3]))
+        self.assertEqual(list(ProductStatus.objects.values_list('name', flat=True)), ['Пилот'])
+        self.assertEqual(sorted(Sphere.objects.values_list('name', flat=True)), ['Ритейл', 'Финансы'])
+        self.assertEqual(Product.objects.get(name='Касса').status.name, 'Пилот')
+        self.assertEqual(list(Product.objects.get(name='Кошелёк').spheres.values_list('name', flat=True)), ['Финансы'])
+
+    def test_admin_import(self):
+        admin_user = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        self.client.force_login(admin_user)
+        self.assertContains(self.client.get('/admin/product_app/partner/'), 'import/')
+        upload = SimpleUploadedFile('partners.csv', 'name,url\nНовый,https://example.com\nПлохой,адрес\n'.encode())
+        response = self.client.post('/admin/product_app/partner/import/', {'file': upload})
+        self.assertContains(response, 'url: некорректный адрес')
+        self.assertTrue(Partner.objects.filter(name='Новый').exists())
+
+
+class SchemaTests(TestCase):
+    """Схема OpenAPI собирается один раз и отдаётся из памяти с сильным ETag."""
+
+    def setUp(self):
+        reset_schema_cache()
+        self.addCleanup(reset_schema_cache)
+
+    def test_schema_etag(self):
+        response = self.client.get('/api/schema/', HTTP_ACCEPT='application/json')
+        self.assertEqual(response['Content-Type'], 'application/vnd.oai.openapi+json; charset=utf-8')
+        self.assertIn('/api/products/', response.json()['paths'])
+        etag = response['ETag']
+        self.assertFalse(etag.startswith('W/'))
+        self.assertEqual(self.client.get('/api/schema/?format=json', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        yaml_response = self.client.get('/api/schema/')
+        self.assertTrue(yaml_response.content.startswith(b'openapi:'))
+        self.assertNotEqual(yaml_response['ETag'], etag)
+        self.assertEqual(self.client.get('/api/docs/').status_code, 200)
+
+    def test_views_without_serializer_are_described(self):
+        schema = self.client.get('/api/schema/?format=json').json()
+        components = schema['components']['schemas']
+        for path, component in (
+            ('/api/stats/', 'StatsSummary'), ('/api/timeline/', 'Timeline'),
+            ('/api/users/{id}/portfolio/', 'UserPortfolio'), ('/api/me/portfolio/', 'UserPortfolio'),
+        ):
+            content = schema['paths'][path]['get']['responses']['200']['content']['application/json']
+            self.assertEqual(content['schema']['$ref'], f'#/components/schemas/{component}')
+        self.assertIn('overlaps', components['TimelineStages']['properties'])
+
+    def test_build_command(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'openapi.json')
+            with override_settings(OPENAPI_SCHEMA_FILE=path):
+                call_command('build_openapi_schema', stdout=StringIO())
+                call_command('build_openapi_schema', '--check', stdout=StringIO())
+                with open(path, 'rb') as file:
+                    content = file.read()
+                self.assertEqual(self.client.get('/api/schema/?format=json').content, content)
+                with open(path, 'wb') as file:
+                    file.write(b'{}')
+                with self.assertRaises(CommandError):
+                    call_command('build_openapi_schema', '--check', stdout=StringIO())
+
+
+class ResponseCacheTests(TestCase):
+    """Версия кэша поднимается только после фиксации записи, и следующее чтение видит новые данные."""
+
+    def test_write_then_cached_read(self):
+        sphere = Sphere.objects.create(name='Старое')
+        self.assertEqual(self.client.get('/api/spheres/').json()['results'][0]['name'], 'Старое')
+        self.assertEqual(self.client.get(f'/api/spheres/{sphere.pk}/').json()['name'], 'Старое')
+        version = get_versions([Sphere])
+        with self.captureOnCommitCallbacks(execute=True):
+            sphere.name = 'Новое'
+            sphere.save()
+            # До фиксации версия прежняя: параллельный GET не закэширует старые строки под новой
+            self.assertEqual(get_versions([Sphere]), version)
+        self.assertNotEqual(get_versions([Sphere]), version)
+        self.assertEqual(self.client.get('/api/spheres/').json()['results'][0]['name'], 'Новое')
+        self.assertEqual(self.client.get(f'/api/spheres/{sphere.pk}/').json()['name'], 'Новое')
+
+    def test_etag_depends_on_renderer(self):
+        Sphere.objects.create(name='Образование')
+        etag = self.client.get('/api/spheres/', HTTP_ACCEPT='application/json')['ETag']
+        self.assertEqual(self.client.get('/api/spheres/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        response = self.client.get('/api/spheres/', HTTP_ACCEPT='text/html', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/html; charset=utf-8')
+        self.assertNotEqual(response['ETag'], etag)
@@ -0,0 +1,78 @@
+from django.db.models import BooleanField, Case, Exists, F, OuterRef, Q, Value, When
+
+from .models import ProjectStage
+
+# Колонки ответа: группа -> имена столбцов
+PRODUCT_COLUMNS = ('id', 'name')
+PROJECT_COLUMNS = ('id', 'product', 'name', 'start_date', 'end_date')
+STAGE_COLUMNS = ('id', 'project', 'name', 'start_date', 'end_date', 'overlaps', 'outside_project')
+
+
+def _flag(condition):
+    # CASE вместо голого условия: сравнение с NULL-датой проекта даёт False, а не NULL
+    return Case(When(condition, then=Value(True)), default=Value(False), output_field=BooleanField())
+
+
+def timeline_stages(start, end, product_ids=None, project_ids=None):
+    """
+    Этапы, пересекающиеся с окном [start, end], вместе с продуктом и проектом
+    в порядке продукт -> проект -> начало этапа. Флаги считаются в том же запросе:
+    overlaps — этап пересекается с другим этапом того же проекта (EXISTS по индексу
+    project, start_date), outside_project — этап выходит за даты проекта.
+    """
+    overlapping = (
+        ProjectStage.objects.filter(
+            project=OuterRef('project'),
+            start_date__lte=OuterRef('end_date'),
+            end_date__gte=OuterRef('start_date'),
+        )
+        .exclude(pk=OuterRef('pk'))
+    )
+    stages = ProjectStage.objects.filter(start_date__lte=end, end_date__gte=start)
+    if product_ids:
+        stages = stages.filter(project__product_id__in=product_ids)
+    if project_ids:
+        stages = stages.filter(project_id__in=project_ids)
+    return (
+        stages.annotate(
+            overlaps=Exists(overlapping),
+            outside_project=_flag(
+                Q(project__start_date__gt=F('start_date')) | Q(project__end_date__lt=F('end_date'))
+            ),
+        )
+        .order_by('project__product_id', 'project_id', 'start_date', 'id')
+        .values_list(
+            'project__product_id', 'project__product__name',
+            'project_id', 'project__name', 'project__start_date', 'project__end_date',
+            'id', 'name', 'start_date', 'end_date', 'overlaps', 'outside_project',
+        )
+    )
+
+
+def build_timeline(rows):
+    """
+    Раскладывает строки timeline_stages в столбцы: {"products": {"id": [...], "name": [...]}, ...}.
+    Строки отсортированы по продукту и проекту, поэтому каждый продукт и проект
+    попадает в свои столбцы один раз; этапы и проекты ссылаются на родителя по id.
+    """
+    products = {column: [] for column in PRODUCT_COLUMNS}
+    projects = {column: [] for column in PROJECT_COLUMNS}
+    stages = {column: [] for column in STAGE_COLUMNS}
+    last_product = last_project = None
+    for (
+        product_id, product_name, project_id, project_name, project_start, project_end,
+        *stage,
+    ) in rows:
+        if product_id != last_product:
+            last_product = product_id
+            products['id'].append(product_id)
+            products['name'].append(product_name)
+        if project_id != last_project:
+            last_project = project_id
+            project = (project_id, product_id, project_name, project_start, project_end)
+            for column, value in zip(PROJECT_COLUMNS, project):
+                projects[column].append(value)
+        stage_id, *values = stage
+        for column, value in zip(STAGE_COLUMNS, (stage_id, project_id, *values)):
+            stages[column].append(value)
+    return {'products': products, 'projects': projects, 'stages': stages}
@@ -1,6 +1,15 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import *
+from .async_views import (
+    AsyncPartnerView, AsyncProductStatusView, AsyncProductView, AsyncProjectStageView, AsyncProjectStatusView,
+    AsyncProjectView, AsyncRoleView, AsyncSalesModelView, AsyncSphereView,
+)
+from .views import (
+    ChangeFeedView, MyPortfolioView, PartnerViewSet, ProductCardViewSet, ProductStatsViewSet, ProductStatusViewSet,
+    ProductViewSet, ProjectRoleViewSet, ProjectStageViewSet, ProjectStatsViewSet, ProjectStatusViewSet,
+    ProjectViewSet, RoleViewSet, SalesModelViewSet, SearchView, SphereViewSet, StageDeadlinesView, StatsSummaryView,
+    TimelineView, UserPortfolioView,
+)
 
 
 router = DefaultRouter()
@@ -14,8 +23,39 @@ router.register(r'sales-models', SalesModelViewSet, basename='sales-model')
 router.register(r'project-stages', ProjectStageViewSet, basename='project-stages')
 router.register(r'roles', RoleViewSet, basename='role')
 router.register(r'project-roles', ProjectRoleViewSet, basename='project-role')
+router.register(r'stats/products', ProductStatsViewSet, basename='product-stats')
+router.register(r'stats/projects', ProjectStatsViewSet, basename='project-stats')
+router.register(r'product-cards', ProductCardViewSet, basename='product-card')
+
+# Асинхронные эндпоинты только для чтения: /api/async/products/, /api/async/products/1/
+async_read_views = {
+    'products': AsyncProductView,
+    'projects': AsyncProjectView,
+    'project-stages': AsyncProjectStageView,
+    'partners': AsyncPartnerView,
+    'spheres': AsyncSphereView,
+    'product-statuses': AsyncProductStatusView,
+    'project-statuses': AsyncProjectStatusView,
+    'sales-models': AsyncSalesModelView,
+    'roles': AsyncRoleView,
+}
+async_urlpatterns = []
+for prefix, view_class in async_read_views.items():
+    view = view_class.as_view()
+    async_urlpatterns += [
+        path(f'{prefix}/', view, name=f'async-{prefix}-list'),
+        path(f'{prefix}/<int:pk>/', view, name=f'async-{prefix}-detail'),
+    ]
 
 
 urlpatterns = [
+    path('search/', SearchView.as_view(), name='search'),
+    path('stats/', StatsSummaryView.as_view(), name='stats-summary'),
+    path('stats/deadlines/', StageDeadlinesView.as_view(), name='stats-deadlines'),
+    path('timeline/', TimelineView.as_view(), name='timeline'),
+    path('changes/', ChangeFeedView.as_view(), name='changes'),
+    path('me/portfolio/', MyPortfolioView.as_view(), name='my-portfolio'),
+    path('users/<int:pk>/portfolio/', UserPortfolioView.as_view(), name='user-portfolio'),
+    path('async/', include(async_urlpatterns)),
     path('', include(router.urls)),
 ]
\ No newline at end of file
@@ -1,203 +1,422 @@
+from datetime import timedelta
+
 from django.conf import settings
-from rest_framework import status
+from django.contrib.auth import get_user_model
+from django.db.models import Count, Q, Sum
+from django.http import Http404, HttpResponse
+from django.utils import timezone
+from drf_spectacular.utils import extend_schema, inline_serializer
+from rest_framework import serializers, status
 from rest_framework.decorators import action
+from rest_framework.generics import GenericAPIView, get_object_or_404
+from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
-from rest_framework.viewsets import ModelViewSet
-from .models import *
-from .serializers import *
-
-User = settings.AUTH_USER_MODEL  # Получаем модель пользователя через settings.AUTH_USER_MODEL
-
-
-class ProductViewSet(ModelViewSet):
+from rest_framework.viewsets import ModelViewSet, ReadOnlyModelViewSet
+from .mixins import (
+    BulkMixin, CachedResponseMixin, ConditionalGetMixin, MembershipMixin, NDJSONExportMixin, QueryPlan,
+    QueryPlanMixin, RetryOnLockedMixin,
+)
+from .models import (
+    Partner, Product, ProductCard, ProductStats, ProductStatus, Project, ProjectRole, ProjectStage, ProjectStats,
+    ProjectStatus, Role, SalesModel, Sphere,
+)
+from .changes import read_changes
+from .db import MAX_ID
+from .filters import parse_date, parse_ids
+from .metrics import registry
+from .pagination import SearchPagination
+from .portfolio import user_portfolio
+from .search import SearchResults
+from .timeline import build_timeline, timeline_stages
+from .serializers import (
+    ChangeLogSerializer, PartnerSerializer, ProductCardSerializer, ProductSerializer, ProductStatsSerializer,
+    ProductStatusSerializer, ProjectRoleSerializer, ProjectSerializer, ProjectStageSerializer,
+    ProjectStatsSerializer, ProjectStatusSerializer, RoleSerializer, SalesModelSerializer, SearchResultSerializer,
+    SphereSerializer, StageDeadlineSerializer,
+)
+
+User = get_user_model()  # Модель пользователя из settings.AUTH_USER_MODEL
+
+
+class ProductViewSet(
+    ConditionalGetMixin, CachedResponseMixin, MembershipMixin, NDJSONExportMixin, QueryPlanMixin,
+    RetryOnLockedMixin, ModelViewSet,
+):
     queryset = Product.objects.all()
     serializer_class = ProductSerializer
-
-    def get_queryset(self):
-        """
-        Добавляем возможность фильтрации по статусу через параметр запроса.
-        Например: /api/products/?status=active
-        """
-        queryset = super().get_queryset()
-        status = self.request.query_params.get('status')
-        if status:
-            queryset = queryset.filter(status=status)
-        return queryset
-
-    @action(detail=True, methods=['get', 'post'], url_path='owners')
+    cache_models = (Product, User, Partner, Sphere)  # Модели, входящие в ответ
+    conditional_models = (User, Partner, Sphere)  # Вложенные в ответ модели для ETag
+
+    # Фильтры списка (id через запятую) и сортировка, например:
+    # /api/products/?sphere=1,2&owner=5&created_at__gte=2024-01-01&ordering=-created_at
+    filter_params = {
+        'status': 'status',
+        'sales_model': 'sales_model',
+        'sphere': 'spheres',
+        'partner': 'partners',
+        'owner': 'owners',
+        'curator': 'curators',
+    }
+    date_range_fields = ('created_at',)
+    # Только NOT NULL поля: курсор по NULL не строится (значение на границе страницы стало бы "None")
+    ordering_fields = ('id', 'name', 'updated_at')
+
+    @action(detail=True, methods=['get', 'post', 'put', 'delete'], url_path='owners', query_plan=QueryPlan())
     def owners(self, request, pk=None):
         """
         GET: Возвращает список заказчиков продукта.
-        POST: Добавляет заказчика к продукту.
+        POST: Добавляет заказчиков к продукту. Например: {"user_ids": [1, 2, 3]}
+        PUT: Заменяет список заказчиков продукта.
+        DELETE: Удаляет заказчиков из продукта.
         """
-        product = self.get_object()
-
-        if request.method == 'GET':
-            owners = product.owners.all()
-            data = [{'id': owner.id, 'username': owner.username} for owner in owners]
-            return Response(data)
-
-        if request.method == 'POST':
-            user_id = request.data.get('user_id')
-            if not user_id:
-                return Response({'error': 'user_id is required'}, status=status.HTTP_400_BAD_REQUEST)
-
-            try:
-                # Используем модель пользователя через settings.AUTH_USER_MODEL
-                user = User.objects.get(id=user_id)
-                product.owners.add(user)
-                return Response({'message': f'User {user.username} added as owner.'})
-            except User.DoesNotExist:
-                return Response({'error': 'User not found'}, status=status.HTTP_404_NOT_FOUND)
-
-    @action(detail=True, methods=['get', 'post'], url_path='curators')
+        return self.membership_response(request, 'owners', 'owner')
+
+    @action(detail=True, methods=['get', 'post', 'put', 'delete'], url_path='curators', query_plan=QueryPlan())
     def curators(self, request, pk=None):
         """
         GET: Возвращает список кураторов продукта.
-        POST: Добавляет куратора к продукту.
+        POST: Добавляет кураторов к продукту. Например: {"user_ids": [1, 2, 3]}
+        PUT: Заменяет список кураторов продукта.
+        DELETE: Удаляет кураторов из продукта.
         """
-        product = self.get_object()
+        return self.membership_response(request, 'curators', 'curator')
 
-        if request.method == 'GET':
-            curators = product.curators.all()
-            data = [{'id': curator.id, 'username': curator.username} for curator in curators]
-            return Response(data)
 
-        if request.method == 'POST':
-            user_id = request.data.get('user_id')
-            if not user_id:
-                return Response({'error': 'user_id is required'}, status=status.HTTP_400_BAD_REQUEST)
-
-            try:
-                # Используем модель пользователя через settings.AUTH_USER_MODEL
-                user = User.objects.get(id=user_id)
-                product.curators.add(user)
-                return Response({'message': f'User {user.username} added as curator.'})
-            except User.DoesNotExist:
-                return Response({'error': 'User not found'}, status=status.HTTP_404_NOT_FOUND)
-
-
-class ProjectViewSet(ModelViewSet):
+class ProjectViewSet(
+    ConditionalGetMixin, BulkMixin, MembershipMixin, NDJSONExportMixin, QueryPlanMixin, RetryOnLockedMixin,
+    ModelViewSet,
+):
     queryset = Project.objects.all()
     serializer_class = ProjectSerializer
-
-    def get_queryset(self):
-        """
-        Добавляем возможность фильтрации по статусу и продукту.
-        Например: /api/projects/?status=in_progress&product_id=1
-        """
-        queryset = super().get_queryset()
-        status = self.request.query_params.get('status')
-        product_id = self.request.query_params.get('product_id')
-        if status:
-            queryset = queryset.filter(status=status)
-        if product_id:
-            queryset = queryset.filter(product_id=product_id)
-        return queryset
-
-    @action(detail=True, methods=['get', 'post'], url_path='curators')
+    conditional_models = (User, Partner)
+
+    # Например, активные проекты сферы 3 со стажёром 7, заканчивающиеся в этом квартале:
+    # /api/projects/?status=2&sphere=3&member=7&end_date__gte=2025-01-01&end_date__lte=2025-03-31
+    filter_params = {
+        'status': 'status',
+        'product_id': 'product',
+        'sphere': 'product__spheres',
+        'partner': 'partners',
+        'member': 'members',
+        'curator': 'curators',
+    }
+    date_range_fields = ('start_date', 'end_date')
+    ordering_fields = ('id', 'name', 'updated_at')  # Только NOT NULL поля, см. ProductViewSet
+
+    @action(detail=True, methods=['get', 'post', 'put', 'delete'], url_path='curators', query_plan=QueryPlan())
     def curators(self, request, pk=None):
         """
-        GET: Возвращает список кураторов продукта.
-        POST: Добавляет куратора к продукту.
+        GET: Возвращает список кураторов проекта.
+        POST: Добавляет кураторов к проекту. Например: {"user_ids": [1, 2, 3]}
+        PUT: Заменяет список кураторов проекта.
+        DELETE: Удаляет кураторов из проекта.
         """
-        product = self.get_object()
-
-        if request.method == 'GET':
-            curators = product.curators.all()
-            data = [{'id': curator.id, 'username': curator.username} for curator in curators]
-            return Response(data)
-
-        if request.method == 'POST':
-            user_id = request.data.get('user_id')
-            if not user_id:
-                return Response({'error': 'user_id is required'}, status=status.HTTP_400_BAD_REQUEST)
-
-            try:
-                # Используем модель пользователя через settings.AUTH_USER_MODEL
-                user = User.objects.get(id=user_id)
-                product.curators.add(user)
-                return Response({'message': f'User {user.username} added as curator.'})
-            except User.DoesNotExist:
-                return Response({'error': 'User not found'}, status=status.HTTP_404_NOT_FOUND)
-
-    @action(detail=True, methods=['get', 'post'], url_path='members')
+        return self.membership_response(request, 'curators', 'curator')
+
+    @action(detail=True, methods=['get', 'post', 'put', 'delete'], url_path='members', query_plan=QueryPlan())
     def members(self, request, pk=None):
         """
         GET: Возвращает список стажеров проекта.
-        POST: Добавляет стажера в проект.
+        POST: Добавляет стажеров в проект. Например: {"user_ids": [1, 2, 3]}
+        PUT: Заменяет список стажеров проекта.
+        DELETE: Удаляет стажеров из проекта.
         """
-        project = self.get_object()
-
-        if request.method == 'GET':
-            members = project.members.all()
-            data = [{'id': member.id, 'username': member.username} for member in members]
-            return Response(data)
-
-        if request.method == 'POST':
-            user_id = request.data.get('user_id')
-            if not user_id:
-                return Response({'error': 'user_id is required'}, status=status.HTTP_400_BAD_REQUEST)
-
-            try:
-                # Используем модель пользователя через settings.AUTH_USER_MODEL
-                user = User.objects.get(id=user_id)
-                project.members.add(user)
-                return Response({'message': f'User {user.username} added as member.'})
-            except User.DoesNotExist:
-                return Response({'error': 'User not found'}, status=status.HTTP_404_NOT_FOUND)
+        return self.membership_response(request, 'members', 'member')
 
 
-class PartnerViewSet(ModelViewSet):
+class PartnerViewSet(ConditionalGetMixin, RetryOnLockedMixin, ModelViewSet):
     queryset = Partner.objects.all()
     serializer_class = PartnerSerializer
 
 
-class SphereViewSet(ModelViewSet):
+class SphereViewSet(CachedResponseMixin, RetryOnLockedMixin, ModelViewSet):
     queryset = Sphere.objects.all()
     serializer_class = SphereSerializer
 
 
-class ProductStatusViewSet(ModelViewSet):
+class ProductStatusViewSet(CachedResponseMixin, RetryOnLockedMixin, ModelViewSet):
     queryset = ProductStatus.objects.all()
     serializer_class = ProductStatusSerializer
 
 
-class ProjectStageViewSet(ModelViewSet):
+class ProjectStageViewSet(ConditionalGetMixin, BulkMixin, RetryOnLockedMixin, ModelViewSet):
     queryset = ProjectStage.objects.all()
     serializer_class = ProjectStageSerializer
+    # Фильтрация по проекту и срокам, например: ?project=1&end_date__lte=2025-06-30
+    filter_params = {'project': 'project'}
+    date_range_fields = ('start_date', 'end_date')
+    ordering_fields = ('id', 'name', 'updated_at')
 
-    # Фильтрация по проекту через query params (например, `?project=1`)
-    def get_queryset(self):
-        queryset = super().get_queryset()
-        project_id = self.request.query_params.get('project')
-        if project_id:
-            queryset = queryset.filter(project_id=project_id)
-        return queryset
 
-
-class SalesModelViewSet(ModelViewSet):
+class SalesModelViewSet(CachedResponseMixin, RetryOnLockedMixin, ModelViewSet):
     queryset = SalesModel.objects.all()  # Все объекты модели SalesModel
     serializer_class = SalesModelSerializer
 
 
-class ProjectStatusViewSet(ModelViewSet):
+class ProjectStatusViewSet(CachedResponseMixin, RetryOnLockedMixin, ModelViewSet):
     queryset = ProjectStatus.objects.all()  # Все объекты модели ProjectStatus
     serializer_class = ProjectStatusSerializer
 
 
-class RoleViewSet(ModelViewSet):
+class RoleViewSet(CachedResponseMixin, RetryOnLockedMixin, ModelViewSet):
     queryset = Role.objects.all()
     serializer_class = RoleSerializer
 
 
-class ProjectRoleViewSet(ModelViewSet):
-    queryset = ProjectRole.objects.select_related('member', 'role', 'project').all()
+class ProjectRoleViewSet(ConditionalGetMixin, BulkMixin, QueryPlanMixin, RetryOnLockedMixin, ModelViewSet):
+    queryset = ProjectRole.objects.all()
     serializer_class = ProjectRoleSerializer
+    conditional_models = (User, Role, Project)  # member_name, role_name, project_name
+    # Пара участник-проект уникальна: повторная загрузка обновляет роль
+    bulk_upsert_fields = ('member', 'project')
+    bulk_upsert_update_fields = ('role',)
+    filter_params = {'project_id': 'project', 'member': 'member', 'role': 'role'}
+
+
+class SearchView(GenericAPIView):
+    """
+    GET: Полнотекстовый поиск по продуктам, проектам, партнёрам и сферам.
+    Учитывает транслитерацию: /api/search/?q=kloveri найдёт «Кловери».
+    Например: /api/search/?q=обучение&page=2
+    """
+    serializer_class = SearchResultSerializer
+    pagination_class = SearchPagination
+
+    def get(self, request):
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            return Response({'error': 'q is required'}, status=status.HTTP_400_BAD_REQUEST)
+        page = self.paginate_queryset(SearchResults(query))
+        return self.get_paginated_response(self.get_serializer(page, many=True).data)
+
+
+class ProductStatsViewSet(ReadOnlyModelViewSet):
+    """Готовые сводки по продуктам: число проектов, стажёров и проекты по статусам."""
+    queryset = ProductStats.objects.select_related('product')
+    serializer_class = ProductStatsSerializer
+
+
+class ProjectStatsViewSet(ReadOnlyModelViewSet):
+    """Готовые сводки по проектам. Например: /api/stats/projects/?product_id=1"""
+    queryset = ProjectStats.objects.select_related('project')
+    serializer_class = ProjectStatsSerializer
 
     def get_queryset(self):
-        # Можно фильтровать данные по параметрам, например, проекту
-        project_id = self.request.query_params.get('project_id')
-        if project_id:
-            return self.queryset.filter(project_id=project_id)
-        return self.queryset
+        queryset = super().get_queryset()
+        product_id = self.request.query_params.get('product_id')
+        if product_id:
+            queryset = queryset.filter(project__product_id=product_id)
+        return queryset
+
+
+class ProductCardViewSet(ConditionalGetMixin, ReadOnlyModelViewSet):
+    """
+    Каталог продуктов из денормализованных карточек: одна таблица без JOIN,
+    поэтому время ответа не растёт вместе с таблицами связей.
+    Карточка выбирается по id продукта: /api/product-cards/1/
+    """
+    queryset = ProductCard.objects.all()
+    serializer_class = ProductCardSerializer
+    lookup_field = 'product'
+
+
+class StatsSummaryView(GenericAPIView):
+    """
+    GET: Общая сводка портфеля для дашборда. Считается по материализованным
+    таблицам ProductStats и ProjectStats двумя агрегирующими запросами.
+    """
+
+    @extend_schema(responses=inline_serializer('StatsSummary', {
+        'products': serializers.IntegerField(),
+        'products_without_projects': serializers.IntegerField(),
+        'projects': serializers.IntegerField(),
+        'project_memberships': serializers.IntegerField(),
+        'projects_without_stages': serializers.IntegerField(),
+        'projects_with_upcoming_stages': serializers.IntegerField(),
+        'projects_by_status': serializers.DictField(child=serializers.IntegerField()),  # название -> проектов
+    }))
+    def get(self, request):
+        today = timezone.localdate()
+        summary = ProductStats.objects.aggregate(
+            products=Count('id'),
+            products_without_projects=Count('id', filter=Q(project_count=0)),
+            projects=Sum('project_count', default=0),
+        )
+        summary.update(ProjectStats.objects.aggregate(
+            project_memberships=Sum('intern_count', default=0),
+            projects_without_stages=Count('id', filter=Q(stage_count=0)),
+            projects_with_upcoming_stages=Count('id', filter=Q(last_stage_end__gte=today)),
+        ))
+        by_status = {}
+        for distribution in ProductStats.objects.values_list('projects_by_status', flat=True):
+            for name, total in distribution.items():
+                by_status[name] = by_status.get(name, 0) + total
+        summary['projects_by_status'] = by_status
+        return Response(summary)
+
+
+class StageDeadlinesView(GenericAPIView):
+    """
+    GET: Ближайшие сроки окончания этапов. Например: /api/stats/deadlines/?days=14
+    """
+    serializer_class = StageDeadlineSerializer
+    pagination_class = None
+    max_days = 365
+    limit = 100
+
+    def get(self, request):
+        try:
+            days = min(int(request.query_params.get('days', 30)), self.max_days)
+        except ValueError:
+            return Response({'error': 'days must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+        today = timezone.localdate()
+        stages = (
+            ProjectStage.objects.select_related('project')
+            .only('name', 'end_date', 'project__name')
+            .filter(end_date__gte=today, end_date__lte=today + timedelta(days=days))
+            .order_by('end_date', 'id')[:self.limit]
+        )
+        return Response(self.get_serializer(stages, many=True).data)
+
+
+class TimelineView(GenericAPIView):
+    """
+    GET: Этапы проектов для диаграммы Ганта одним запросом.
+    Например: /api/timeline/?from=2025-01-01&to=2025-12-31&product=1,2&project=5
+    Без from/to окно — месяц назад и полгода вперёд. Ответ — столбцы
+    products, projects и stages; у этапов есть флаги overlaps (пересекается
+    с другим этапом проекта) и outside_project (выходит за даты проекта).
+    """
+    pagination_class = None
+    max_stages = 20000
+    default_days_before = 30
+    default_days_after = 180
+
+    # Каждая группа — объект столбцов одинаковой длины, i-й элемент столбцов описывает i-ю строку
+    @extend_schema(responses=inline_serializer('Timeline', {
+        'from': serializers.DateField(),
+        'to': serializers.DateField(),
+        'products': inline_serializer('TimelineProducts', {
+            'id': serializers.ListField(child=serializers.IntegerField()),
+            'name': serializers.ListField(child=serializers.CharField()),
+        }),
+        'projects': inline_serializer('TimelineProjects', {
+            'id': serializers.ListField(child=serializers.IntegerField()),
+            'product': serializers.ListField(child=serializers.IntegerField()),
+            'name': serializers.ListField(child=serializers.CharField()),
+            'start_date': serializers.ListField(child=serializers.DateField(allow_null=True)),
+            'end_date': serializers.ListField(child=serializers.DateField(allow_null=True)),
+        }),
+        'stages': inline_serializer('TimelineStages', {
+            'id': serializers.ListField(child=serializers.IntegerField()),
+            'project': serializers.ListField(child=serializers.IntegerField()),
+            'name': serializers.ListField(child=serializers.CharField()),
+            'start_date': serializers.ListField(child=serializers.DateField()),
+            'end_date': serializers.ListField(child=serializers.DateField()),
+            'overlaps': serializers.ListField(child=serializers.BooleanField()),
+            'outside_project': serializers.ListField(child=serializers.BooleanField()),
+        }),
+        'truncated': serializers.BooleanField(),  # Этапов больше max_stages, вернулась только часть
+    }))
+    def get(self, request):
+        params = request.query_params
+        today = timezone.localdate()
+        start = parse_date('from', params['from']) if params.get('from') else (
+            today - timedelta(days=self.default_days_before)
+        )
+        end = parse_date('to', params['to']) if params.get('to') else today + timedelta(days=self.default_days_after)
+        if start > end:
+            return Response({'error': 'from must not be after to'}, status=status.HTTP_400_BAD_REQUEST)
+        rows = list(timeline_stages(
+            start, end,
+            product_ids=parse_ids('product', params.get('product', '')),
+            project_ids=parse_ids('project', params.get('project', '')),
+        )[:self.max_stages + 1])
+        timeline = build_timeline(rows[:self.max_stages])
+        return Response({'from': start, 'to': end, **timeline, 'truncated': len(rows) > self.max_stages})
+
+
+class UserPortfolioView(GenericAPIView):
+    """
+    GET: Продукты и проекты пользователя с его ролями. Например: /api/users/5/portfolio/
+    Ответ: {"user": 5, "products": [{"id", "name", "roles": ["owner", "curator"]}],
+    "projects": [{"id", "name", "product", "roles": ["member"], "project_role": "Дизайнер"}]}.
+    Читается из индекса Membership одним запросом, без обхода связей M2M.
+    """
+    pagination_class = None
+
+    def get_user_id(self, request, pk):
+        # <int:pk> пропускает любое число, а id шире BIGINT уронил бы запрос OverflowError
+        if not 1 <= pk <= MAX_ID:
+            raise Http404
+        return pk
+
+    # Наследуется MyPortfolioView вместе с методом get
+    @extend_schema(responses=inline_serializer('UserPortfolio', {
+        'user': serializers.IntegerField(),
+        'products': inline_serializer('PortfolioProduct', {
+            'id': serializers.IntegerField(),
+            'name': serializers.CharField(),
+            'roles': serializers.ListField(child=serializers.ChoiceField(['owner', 'curator'])),
+        }, many=True),
+        'projects': inline_serializer('PortfolioProject', {
+            'id': serializers.IntegerField(),
+            'name': serializers.CharField(),
+            'product': serializers.IntegerField(),
+            'roles': serializers.ListField(child=serializers.ChoiceField(['curator', 'member'])),
+            'project_role': serializers.CharField(allow_null=True),
+        }, many=True),
+    }))
+    def get(self, request, pk=None):
+        user_id = self.get_user_id(request, pk)
+        portfolio = user_portfolio(user_id)
+        if not portfolio['products']:
+            get_object_or_404(User, pk=user_id)  # Пустой портфель или несуществующий пользователь
+        return Response({'user': user_id, **portfolio})
+
+
+class MyPortfolioView(UserPortfolioView):
+    """GET: Портфель текущего пользователя: /api/me/portfolio/"""
+    permission_classes = [IsAuthenticated]
+
+    def get_user_id(self, request, pk):
+        return request.user.pk
+
+
+class ChangeFeedView(GenericAPIView):
+    """
+    GET: Лента изменений для инкрементальной синхронизации.
+    Например: /api/changes/?since=0&limit=500&model=product,project
+    Ответ: {"changes": [...], "cursor": 42, "has_more": false}. Следующая порция
+    запрашивается с ?since=<cursor>; action=delete означает, что объект удалён.
+    """
+    serializer_class = ChangeLogSerializer
+    pagination_class = None
+    default_limit = 500
+    max_limit = 5000
+
+    def get(self, request):
+        try:
+            since = int(request.query_params.get('since', 0))
+            limit = int(request.query_params.get('limit', self.default_limit))
+        except ValueError:
+            return Response({'error': 'since and limit must be integers'}, status=status.HTTP_400_BAD_REQUEST)
+        limit = min(max(limit, 1), self.max_limit)
+        models = [name for name in request.query_params.get('model', '').split(',') if name]
+        changes, has_more = read_changes(since, limit, models)
+        return Response({
+            'changes': self.get_serializer(changes, many=True).data,
+            'cursor': changes[-1].id if changes else since,
+            'has_more': has_more,
+        })
+
+
+def metrics(request):
+    """
+    GET: Метрики процесса в текстовом формате Prometheus.
+    Если задан METRICS_TOKEN, нужен заголовок Authorization: Bearer <токен>.
+    """
+    token = settings.METRICS_TOKEN
+    if token and request.headers.get('Authorization') != f'Bearer {token}':
+        return HttpResponse(status=401)
+    return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')